@@ -0,0 +1,102 @@
+"""Measure the import time of the acept modules.
+
+Each module is imported in a new Python process, so that the modules imported by earlier measurements are not cached.
+Besides the import time, the heavy dependencies imported together with the module are recorded, e.g. to check that a
+module does not import pandas or geopandas on import, see :py:mod:`acept.lazy_imports`.
+
+The results are saved in the same format as the results of ``run_benchmarks.py``, so they can be compared with
+``run_benchmarks.py compare`` as well.
+
+.. code-block:: console
+
+    $ source venv/bin/activate
+    $ python benchmarks/import_time.py
+    $ python benchmarks/import_time.py --modules acept.plz_shape acept.examples.main_example --repeat 10
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from run_benchmarks import BENCHMARKS_DIR, RESULTS_DIR, git_commit, machine_info, _format_result
+
+ACEPT_MODULES = ["acept.acept_utils", "acept.artifact_store", "acept.bbd_plz_preprocessing",
+                 "acept.buildings_information", "acept.cop_profiles", "acept.demand_profiles",
+                 "acept.dwd_try_data_handling", "acept.instrumentation", "acept.pipeline", "acept.plz_shape",
+                 "acept.pv_cap_api", "acept.pv_cap_factor_profiles", "acept.temperature_profiles", "acept.uhp_csv_io",
+                 "acept.uhp_input_formatting", "acept.weather_profile_api", "acept.examples.main_example"]
+"""Modules whose import time is measured by default."""
+HEAVY_DEPENDENCIES = ["numpy", "pandas", "geopandas", "shapely", "pyproj", "xarray", "rioxarray", "gsee", "pvlib",
+                      "cartopy", "psutil", "tqdm", "requests", "yaml", "UrbanHeatPro"]
+"""Dependencies that are recorded if they are imported together with a module."""
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+import_time = time.perf_counter() - start
+print(json.dumps({{"import_time": import_time,
+                  "imported": [name for name in {heavy_dependencies!r} if name in sys.modules]}}))
+"""
+
+
+def measure_import_time(module: str, repeat: int = 5) -> dict:
+    """
+    Measures the import time of a module in new Python processes.
+
+    :param module: Name of the module.
+    :param repeat: Number of measurements.
+    :return: Dictionary with the module, the status (``ok``, ``skipped`` or ``error``), the import times in seconds
+        with their minimum and median, and the heavy dependencies imported with the module.
+    """
+    result = {"benchmark": f"import {module}", "scale": 1, "unit": "import"}
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.join(BENCHMARKS_DIR, "..", "src"), os.environ.get("PYTHONPATH", "")]))
+    script = _IMPORT_SCRIPT.format(module=module, heavy_dependencies=HEAVY_DEPENDENCIES)
+    times = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=environment)
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "unknown error"
+            status = "skipped" if error.startswith("ModuleNotFoundError") else "error"
+            result.update(status=status, reason=error)
+            return result
+        measurement = json.loads(process.stdout.strip().splitlines()[-1])
+        times.append(measurement["import_time"])
+    result.update(status="ok", times=times, min=min(times), median=statistics.median(times),
+                  imported=measurement["imported"])
+    return result
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--modules", nargs="+", default=ACEPT_MODULES, help="modules to import (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per module (default: %(default)s)")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="directory for the results (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    started = datetime.now(timezone.utc)
+    results = []
+    for module in args.modules:
+        result = measure_import_time(module, args.repeat)
+        imported = f"  imports: {', '.join(result['imported']) or '-'}" if result["status"] == "ok" else ""
+        print(_format_result(result) + imported, flush=True)
+        results.append(result)
+
+    commit = git_commit()
+    report = {"created": started.isoformat(), **commit, "machine": machine_info(), "repeat": args.repeat,
+              "results": results}
+    os.makedirs(args.output_dir, exist_ok=True)
+    commit_name = (commit["commit"] or "nogit")[:10] + ("-dirty" if commit["dirty"] else "")
+    file_path = os.path.join(args.output_dir, f"{started.strftime('%Y%m%dT%H%M%S')}_{commit_name}_import_time.json")
+    with open(file_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print("Results saved to", file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""Run the acept benchmarks on synthetic data and store the results as JSON.
+
+Each benchmark is run for each scale, i.e. the number of buildings or the number of DWD TRY grid cells, and the wall
+time of each repetition is recorded. The results are saved with the git commit and information about the machine in
+the ``benchmarks/results`` directory, so that the results of different commits can be compared offline.
+Benchmarks whose dependencies are not installed are skipped.
+
+To run the benchmarks and compare the results with an earlier run use the following commands with the venv activated:
+
+.. code-block:: console
+
+    $ source venv/bin/activate
+    $ python benchmarks/run_benchmarks.py run --scales 1000 10000 100000
+    $ python benchmarks/run_benchmarks.py compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+"""Directory of the benchmarks."""
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+"""Default directory for the benchmark results."""
+DEFAULT_SCALES = (1000, 10000, 100000)
+"""Default scales of the benchmarks."""
+BENCHMARK_YEAR = 2011
+"""Year of the synthetic DWD TRY data."""
+ENSEMBLE_YEARS = [2011, 2012]
+"""Years of the synthetic DWD TRY data of the multi-year benchmarks."""
+
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "src"))
+
+import synthetic_data  # noqa: E402
+
+
+class Benchmark:
+    """
+    Benchmark of a single function of acept.
+    """
+
+    def __init__(self, name: str, setup: Callable[[int, str], Callable[[], object]], unit: str,
+                 max_scale: int | None = None):
+        """
+        Constructor for the Benchmark class.
+
+        :param name: Name of the benchmark.
+        :param setup: Function that creates the input data for a scale in a working directory and returns the function
+            to time. Imports of acept modules and optional dependencies are done in the setup, so that missing
+            dependencies only skip the benchmark.
+        :param unit: Unit of the scale, e.g. ``buildings`` or ``grid_cells``.
+        :param max_scale: Largest scale the benchmark is run for, because of its run time or memory usage. None for no
+            limit.
+        """
+        self.name = name
+        self.setup = setup
+        self.unit = unit
+        self.max_scale = max_scale
+
+
+def _grid_size(grid_cells: int) -> int:
+    """
+    Number of grid cells in X and Y direction of a square grid with about the given number of grid cells.
+
+    :param grid_cells: Number of grid cells.
+    :return: Number of grid cells in X and Y direction.
+    """
+    return max(2, int(round(np.sqrt(grid_cells))))
+
+
+def _area_shape_for_grid(grid_size: int) -> gpd.GeoDataFrame:
+    """
+    Area shape covering about a quarter of a synthetic DWD TRY grid.
+
+    :param grid_size: Number of grid cells in X and Y direction.
+    :return: GeoDataFrame with the area shape.
+    """
+    return synthetic_data.synthetic_area_shape(size=grid_size * synthetic_data.DWD_GRID_RESOLUTION / 2)
+
+
+def setup_read_dwd_netcdf_file(grid_cells: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.dwd_try_data_handling.read_dwd_netcdf_file` for a bz2 compressed temperature file.
+
+    :param grid_cells: Number of DWD TRY grid cells.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.dwd_try_data_handling import read_dwd_netcdf_file
+
+    paths = synthetic_data.write_synthetic_dwd_try_files(work_dir, [BENCHMARK_YEAR], [1], features=("temperature",),
+                                                         grid_size=_grid_size(grid_cells))
+
+    def run():
+        with synthetic_data.patched_dwd_try_paths(paths):
+            # load the values, xarray reads them lazily
+            return read_dwd_netcdf_file("temperature", BENCHMARK_YEAR, 1, debug=False).load()
+
+    return run
+
+
+def setup_clip(grid_cells: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of clipping the combined DWD TRY data of a month to an area shape.
+
+    :param grid_cells: Number of DWD TRY grid cells.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.dwd_try_data_handling import read_dwd_netcdf_file, preprocess_combined_dwd_try_dataset
+
+    grid_size = _grid_size(grid_cells)
+    paths = synthetic_data.write_synthetic_dwd_try_files(work_dir, [BENCHMARK_YEAR], [1],
+                                                         features=("combined_try_uncompressed",), grid_size=grid_size)
+    with synthetic_data.patched_dwd_try_paths(paths):
+        wd_data = read_dwd_netcdf_file("combined_try_uncompressed", BENCHMARK_YEAR, 1, debug=False).load()
+    wd_data = preprocess_combined_dwd_try_dataset(wd_data, debug=False)
+    selected_shape = _area_shape_for_grid(grid_size).to_crs(epsg=3034)
+
+    def run():
+        return wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs, all_touched=True)
+
+    return run
+
+
+def setup_temperature_reduction(grid_cells: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of averaging the clipped temperature of a month over the area.
+
+    :param grid_cells: Number of DWD TRY grid cells.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    clip = setup_clip(grid_cells, work_dir)
+    wd_clipped = clip()
+
+    def run():
+        return wd_clipped.mean(("X", "Y")).temperature.to_pandas()
+
+    return run
+
+
+def setup_pv_builder(number_of_buildings: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.pv_cap_factor_profiles.build_pv_capacity_for_selected_year_with_combined_data`.
+
+    :param number_of_buildings: Number of buildings.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.pv_cap_factor_profiles import build_pv_capacity_for_selected_year_with_combined_data
+
+    paths = synthetic_data.write_synthetic_dwd_try_files(work_dir, [BENCHMARK_YEAR],
+                                                         features=("combined_try_uncompressed",))
+    buildings = synthetic_data.synthetic_buildings(number_of_buildings)
+    selected_shape = synthetic_data.synthetic_area_shape(size=10000)
+
+    def run():
+        output_dir = tempfile.mkdtemp(prefix="pv_capacity_", dir=work_dir)
+        with synthetic_data.patched_dwd_try_paths(paths):
+            return build_pv_capacity_for_selected_year_with_combined_data(
+                selected_shape.copy(), buildings.copy(), year=BENCHMARK_YEAR, uncompressed=True, debug=False,
+                output_dir=output_dir)
+
+    return run
+
+
+def _setup_temperature_years(grid_cells: int, work_dir: str, ensemble: bool) -> Callable[[], object]:
+    """
+    Benchmark of the temperature profiles of the years :py:const:`ENSEMBLE_YEARS` from the combined DWD TRY data, with
+    :py:func:`acept.ensemble_profiles.compute_weather_ensemble` or year by year with
+    :py:func:`acept.temperature_profiles.compute_temperature_profiles_for_selected_years`.
+
+    :param grid_cells: Number of DWD TRY grid cells.
+    :param work_dir: Working directory for the input and output files.
+    :param ensemble: If True, the ensemble is computed.
+    :return: The function to time.
+    """
+    from acept.ensemble_profiles import compute_weather_ensemble
+    from acept.temperature_profiles import compute_temperature_profiles_for_selected_years
+
+    grid_size = _grid_size(grid_cells)
+    paths = synthetic_data.write_synthetic_dwd_try_files(work_dir, ENSEMBLE_YEARS,
+                                                         features=("combined_try_uncompressed",), grid_size=grid_size)
+    selected_shape = _area_shape_for_grid(grid_size)
+
+    def run():
+        with synthetic_data.patched_dwd_try_paths(paths):
+            if ensemble:
+                return compute_weather_ensemble(selected_shape, year_start=ENSEMBLE_YEARS[0],
+                                                year_end=ENSEMBLE_YEARS[-1], debug=False)
+            return compute_temperature_profiles_for_selected_years(
+                "benchmark", selected_shape, ENSEMBLE_YEARS[0], ENSEMBLE_YEARS[-1],
+                weather_source="combined_try_uncompressed", debug=False)
+
+    return run
+
+
+def setup_temperature_years(grid_cells: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of the temperature profiles of several years computed year by year, see
+    :py:func:`_setup_temperature_years`.
+    """
+    return _setup_temperature_years(grid_cells, work_dir, ensemble=False)
+
+
+def setup_temperature_ensemble(grid_cells: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of the temperature profiles of several years computed as ensemble, see
+    :py:func:`_setup_temperature_years`.
+    """
+    return _setup_temperature_years(grid_cells, work_dir, ensemble=True)
+
+
+def setup_calculate_free_walls(number_of_buildings: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.buildings_information.calculate_free_walls`.
+
+    :param number_of_buildings: Number of buildings.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.buildings_information import calculate_free_walls
+
+    buildings = synthetic_data.synthetic_buildings(number_of_buildings)
+
+    def run():
+        return calculate_free_walls(buildings)
+
+    return run
+
+
+def setup_calculate_cop_tve(number_of_buildings: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.cop_profiles.calculate_cop_tve` for a year of hourly demand.
+
+    :param number_of_buildings: Number of buildings.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.cop_profiles import build_cop_df, calculate_cop_tve
+
+    buildings = synthetic_data.synthetic_buildings(number_of_buildings)
+    buildings["year_class"] = np.searchsorted(synthetic_data.CONSTRUCTION_CLASSES, buildings["constructi"])
+    buildings = buildings.rename(columns={"building_t": "building_type"})
+    space_heat, water_heat = synthetic_data.synthetic_heat_demand(buildings)
+    hours = np.arange(len(space_heat))
+    ambient_temperature = 9 + 10 * np.cos((hours / 24 - 200) / 365 * 2 * np.pi)
+    cop_df = build_cop_df(pd.Series(ambient_temperature))
+
+    def run():
+        return calculate_cop_tve(cop_df, buildings, space_heat, water_heat)
+
+    return run
+
+
+def _uhp_buildings_table(number_of_buildings: int) -> pd.DataFrame:
+    """
+    Synthetic buildings with the fields of the UHP building input.
+
+    :param number_of_buildings: Number of buildings.
+    :return: DataFrame with the fields :py:const:`acept.uhp_csv_io.UHP_BUILDING_COLUMNS`.
+    """
+    from acept.buildings_information import calculate_missing_uhp_building_fields
+    from acept.uhp_csv_io import format_enriched_buildings_for_uhp
+
+    buildings, _ = calculate_missing_uhp_building_fields(synthetic_data.synthetic_buildings(number_of_buildings),
+                                                         debug=False)
+    return format_enriched_buildings_for_uhp(buildings)
+
+
+def setup_uhp_csv_write(number_of_buildings: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.uhp_csv_io.write_geopandas_to_uhp_csv` for the UHP building input.
+
+    :param number_of_buildings: Number of buildings.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.uhp_csv_io import write_geopandas_to_uhp_csv
+
+    buildings = _uhp_buildings_table(number_of_buildings)
+    header = buildings.columns.to_list()
+    units = ["-"] * len(header)
+
+    def run():
+        return write_geopandas_to_uhp_csv(os.path.join(work_dir, "buildings.csv"), buildings, header, units)
+
+    return run
+
+
+def setup_uhp_csv_read(number_of_buildings: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.uhp_csv_io.read_uhp_csv_to_dataframe` for the UHP building input.
+
+    :param number_of_buildings: Number of buildings.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.uhp_csv_io import read_uhp_csv_to_dataframe
+
+    write = setup_uhp_csv_write(number_of_buildings, work_dir)
+    csv_path = write()
+
+    def run():
+        return read_uhp_csv_to_dataframe(csv_path, additional_info=1, use_sidecar=False)
+
+    return run
+
+
+def setup_uhp_sidecar_read(number_of_buildings: int, work_dir: str) -> Callable[[], object]:
+    """
+    Benchmark of :py:func:`acept.uhp_csv_io.read_uhp_csv_to_dataframe` for the UHP building input with an up-to-date
+    binary sidecar, see :py:func:`acept.uhp_csv_io.write_uhp_sidecar`.
+
+    :param number_of_buildings: Number of buildings.
+    :param work_dir: Working directory for the input and output files.
+    :return: The function to time.
+    """
+    from acept.uhp_csv_io import read_uhp_csv_to_dataframe, write_uhp_sidecar
+
+    write = setup_uhp_csv_write(number_of_buildings, work_dir)
+    csv_path = write()
+    write_uhp_sidecar(csv_path)
+
+    def run():
+        return read_uhp_csv_to_dataframe(csv_path, additional_info=1)
+
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("read_dwd_netcdf_file", setup_read_dwd_netcdf_file, "grid_cells"),
+    Benchmark("clip", setup_clip, "grid_cells"),
+    Benchmark("temperature_reduction", setup_temperature_reduction, "grid_cells"),
+    # 24 monthly files per scale, the files of the largest scale need several GB
+    Benchmark("temperature_years", setup_temperature_years, "grid_cells", max_scale=10000),
+    Benchmark("temperature_ensemble", setup_temperature_ensemble, "grid_cells", max_scale=10000),
+    # one GSEE model run per building and month, larger scales take hours
+    Benchmark("pv_builder_combined_data", setup_pv_builder, "buildings", max_scale=1000),
+    Benchmark("calculate_free_walls", setup_calculate_free_walls, "buildings"),
+    # the demand profiles of 100k buildings do not fit into the memory of most machines
+    Benchmark("calculate_cop_tve", setup_calculate_cop_tve, "buildings", max_scale=10000),
+    Benchmark("uhp_csv_write", setup_uhp_csv_write, "buildings"),
+    Benchmark("uhp_csv_read", setup_uhp_csv_read, "buildings"),
+    Benchmark("uhp_sidecar_read", setup_uhp_sidecar_read, "buildings"),
+]
+"""All benchmarks."""
+
+
+def git_commit() -> dict:
+    """
+    Returns the current git commit of the repository.
+
+    :return: Dictionary with the commit hash and whether there are uncommitted changes, None values if git is not
+        available.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BENCHMARKS_DIR,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+
+def machine_info() -> dict:
+    """
+    Returns information about the machine and the versions of the main dependencies.
+
+    :return: Dictionary with the machine information.
+    """
+    packages = {}
+    for package in ["numpy", "pandas", "geopandas", "shapely", "xarray", "rioxarray", "gsee"]:
+        try:
+            packages[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[package] = None
+    return {"platform": platform.platform(), "machine": platform.machine(), "processor": platform.processor(),
+            "cpu_count": os.cpu_count(), "python": platform.python_version(), "packages": packages}
+
+
+def run_benchmark(benchmark: Benchmark, scale: int, repeat: int) -> dict:
+    """
+    Runs a benchmark for a scale.
+
+    :param benchmark: The benchmark.
+    :param scale: The scale.
+    :param repeat: Number of timed repetitions.
+    :return: Dictionary with the benchmark name, the scale, the status (``ok``, ``skipped`` or ``error``) and the wall
+        times of the repetitions in seconds with their minimum and median.
+    """
+    result = {"benchmark": benchmark.name, "scale": scale, "unit": benchmark.unit}
+    work_dir = tempfile.mkdtemp(prefix=f"acept_benchmark_{benchmark.name}_")
+    try:
+        function = benchmark.setup(scale, work_dir)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    except ModuleNotFoundError as e:
+        result.update(status="skipped", reason=f"missing dependency: {e.name}")
+    except Exception as e:
+        traceback.print_exc()
+        result.update(status="error", reason=f"{type(e).__name__}: {e}")
+    else:
+        result.update(status="ok", times=times, min=min(times), median=statistics.median(times))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return result
+
+
+def run_benchmarks(names: list[str] | None = None, scales: tuple[int, ...] = DEFAULT_SCALES, repeat: int = 3,
+                   ignore_max_scale: bool = False, output_dir: str = RESULTS_DIR) -> str:
+    """
+    Runs the benchmarks and saves the results as JSON file.
+
+    :param names: Names of the benchmarks to run. Defaults to all benchmarks.
+    :param scales: Scales to run the benchmarks for.
+    :param repeat: Number of timed repetitions of each benchmark.
+    :param ignore_max_scale: If True, the benchmarks are also run for scales above their maximum scale.
+    :param output_dir: Directory to save the results in.
+    :raises ValueError: If a benchmark name is unknown.
+    :return: Path to the JSON file with the results.
+    """
+    benchmarks = {benchmark.name: benchmark for benchmark in BENCHMARKS}
+    if names is None:
+        names = list(benchmarks)
+    unknown_names = [name for name in names if name not in benchmarks]
+    if unknown_names:
+        raise ValueError(f"Unknown benchmarks: {unknown_names}. Valid benchmarks are {list(benchmarks)}")
+
+    started = datetime.now(timezone.utc)
+    results = []
+    for name in names:
+        benchmark = benchmarks[name]
+        for scale in scales:
+            if benchmark.max_scale is not None and scale > benchmark.max_scale and not ignore_max_scale:
+                result = {"benchmark": name, "scale": scale, "unit": benchmark.unit, "status": "skipped",
+                          "reason": f"scale above max_scale={benchmark.max_scale}"}
+            else:
+                result = run_benchmark(benchmark, scale, repeat)
+            print(_format_result(result), flush=True)
+            results.append(result)
+
+    commit = git_commit()
+    report = {"created": started.isoformat(), **commit, "machine": machine_info(), "repeat": repeat,
+              "results": results}
+    os.makedirs(output_dir, exist_ok=True)
+    commit_name = (commit["commit"] or "nogit")[:10] + ("-dirty" if commit["dirty"] else "")
+    file_path = os.path.join(output_dir, f"{started.strftime('%Y%m%dT%H%M%S')}_{commit_name}.json")
+    with open(file_path, "w") as f:
+        json.dump(report, f, indent=1)
+    return file_path
+
+
+def _format_result(result: dict) -> str:
+    """
+    Formats a benchmark result as a single line.
+
+    :param result: The benchmark result, see :py:func:`run_benchmark`.
+    :return: The formatted result.
+    """
+    label = f"{result['benchmark']:<36} {result['scale']:>8} {result['unit']:<10}"
+    if result["status"] != "ok":
+        return f"{label} {result['status']}: {result['reason']}"
+    return f"{label} min {result['min']:10.4f} s  median {result['median']:10.4f} s"
+
+
+def compare_results(baseline_path: str, current_path: str, threshold: float = 1.1) -> list[dict]:
+    """
+    Compares the minimum wall times of two benchmark runs and prints the ratios.
+
+    :param baseline_path: Path to the JSON file of the baseline run.
+    :param current_path: Path to the JSON file of the current run.
+    :param threshold: Ratio of the current to the baseline time from which a benchmark is marked as regression.
+    :return: List of the compared benchmarks with the baseline and current minimum times and their ratio.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    baseline_times = {(result["benchmark"], result["scale"]): result["min"] for result in baseline["results"]
+                      if result["status"] == "ok"}
+
+    print(f"baseline: {baseline['commit']} ({baseline['created']})")
+    print(f"current:  {current['commit']} ({current['created']})")
+    comparison = []
+    for result in current["results"]:
+        key = (result["benchmark"], result["scale"])
+        if result["status"] != "ok" or key not in baseline_times:
+            continue
+        ratio = result["min"] / baseline_times[key]
+        comparison.append({"benchmark": key[0], "scale": key[1], "baseline": baseline_times[key],
+                           "current": result["min"], "ratio": ratio})
+        marker = "REGRESSION" if ratio > threshold else "faster" if ratio < 1 / threshold else ""
+        print(f"{key[0]:<36} {key[1]:>8} {baseline_times[key]:10.4f} s -> {result['min']:10.4f} s "
+              f"x{ratio:6.2f} {marker}")
+    return comparison
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and save the results as JSON")
+    run_parser.add_argument("--benchmarks", nargs="+", choices=[benchmark.name for benchmark in BENCHMARKS],
+                            help="benchmarks to run (default: all)")
+    run_parser.add_argument("--scales", nargs="+", type=int, default=list(DEFAULT_SCALES),
+                            help="numbers of buildings or grid cells (default: %(default)s)")
+    run_parser.add_argument("--repeat", type=int, default=3, help="timed repetitions (default: %(default)s)")
+    run_parser.add_argument("--ignore-max-scale", action="store_true",
+                            help="also run the benchmarks for scales above their maximum scale")
+    run_parser.add_argument("--output-dir", default=RESULTS_DIR,
+                            help="directory for the results (default: %(default)s)")
+
+    compare_parser = subparsers.add_parser("compare", help="compare the results of two runs")
+    compare_parser.add_argument("baseline", help="JSON file of the baseline run")
+    compare_parser.add_argument("current", help="JSON file of the current run")
+    compare_parser.add_argument("--threshold", type=float, default=1.1,
+                                help="time ratio from which a benchmark is marked as regression (default: %(default)s)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        file_path = run_benchmarks(args.benchmarks, tuple(args.scales), args.repeat, args.ignore_max_scale,
+                                   args.output_dir)
+        print("Results saved to", file_path)
+    else:
+        compare_results(args.baseline, args.current, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
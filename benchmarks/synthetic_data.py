@@ -0,0 +1,266 @@
+"""Generators for synthetic input data of the acept benchmarks.
+
+The synthetic data has the same shape as the real input data, so the benchmarks run without the DWD TRY downloads and
+the BBD building data.
+
+Use this module to:
+    - Create synthetic DWD TRY netCDF files (raw files per feature and combined files) for a grid around an area
+    - Point the DWD TRY paths of :py:mod:`acept.dwd_try_data_handling` to the synthetic files
+    - Create a synthetic area shape around the grid center
+    - Create synthetic building GeoDataFrames of any size with the fields of the BBD buildings
+
+The netCDF files are written in the netCDF3 format with the ``scipy`` engine of xarray, which can also read the
+gzip compressed files.
+"""
+
+import bz2
+import contextlib
+import gzip
+import os
+from calendar import monthrange
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+from shapely import box
+
+SCHWABACH_LON_LAT = (11.03, 49.33)
+"""Longitude and latitude of the default center of the synthetic data (Schwabach, PLZ 91126)."""
+DWD_GRID_RESOLUTION = 1000
+"""Resolution of the DWD TRY grid in meters."""
+DWD_RAW_VARIABLES = {"temperature": "temperature", "rad_direct": "SID", "rad_global": "SIS"}
+"""Name of the data variable in the raw DWD TRY files per feature."""
+CONSTRUCTION_CLASSES = ["-1919", "1919-1948", "1949-1978", "1979-1986", "1987-1990", "1991-1995", "1996-2000",
+                        "2001-2004", "2005-2008", "2009-"]
+"""Construction year classes of the Zensus/BDB."""
+BUILDING_TYPES = ["SFH", "TH", "MFH", "AB"]
+"""Building types of the Zensus/BDB."""
+
+
+def dwd_grid_coordinates(center_lon_lat: tuple[float, float] = SCHWABACH_LON_LAT, size: int = 32,
+                         resolution: int = DWD_GRID_RESOLUTION) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Coordinates of a square DWD TRY grid in EPSG:3034 around the center.
+
+    :param center_lon_lat: Longitude and latitude of the center of the grid.
+    :param size: Number of grid cells in X and Y direction.
+    :param resolution: Resolution of the grid in meters.
+    :return: The X and Y coordinates of the cell centers, Y in descending order as in the DWD TRY files.
+    """
+    center_x, center_y = Transformer.from_crs("EPSG:4326", "EPSG:3034", always_xy=True).transform(*center_lon_lat)
+    center_x = np.round(center_x / resolution) * resolution + resolution / 2
+    center_y = np.round(center_y / resolution) * resolution + resolution / 2
+    offsets = (np.arange(size) - size // 2) * resolution
+    return center_x + offsets, (center_y + offsets)[::-1]
+
+
+def synthetic_dwd_try_dataset(year: int, month: int, x: np.ndarray, y: np.ndarray, combined: bool = False,
+                              features: tuple[str, ...] = ("temperature", "rad_direct", "rad_global"),
+                              seed: int = 0):
+    """
+    Create a synthetic DWD TRY dataset with hourly values for one month.
+
+    The temperature follows a seasonal and a daily cycle, the radiation is zero at night and follows the daily cycle
+    otherwise. All values have a random spatial offset and random noise.
+
+    :param year: Year of the data.
+    :param month: Month of the data.
+    :param x: X coordinates of the grid in EPSG:3034.
+    :param y: Y coordinates of the grid in EPSG:3034.
+    :param combined: If True, the data variables are named as in the combined files (``temperature``, ``rad_direct``,
+        ``rad_global``), otherwise as in the raw files (``temperature``, ``SID``, ``SIS``).
+    :param features: DWD features to add to the dataset.
+    :param seed: Seed of the random number generator.
+    :return: The dataset as Xarray Dataset with the dimensions time, Y and X.
+    """
+    import xarray as xr  # only needed for the netCDF generators
+
+    rng = np.random.default_rng(seed + year * 100 + month)
+    time = pd.date_range(f"{year}-{month:02d}-01", periods=24 * monthrange(year, month)[1], freq="h")
+    hour = time.hour.to_numpy()[:, np.newaxis, np.newaxis]
+    day_of_year = time.dayofyear.to_numpy()[:, np.newaxis, np.newaxis]
+    shape = (len(time), len(y), len(x))
+
+    daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+    season = np.cos((day_of_year - 200) / 365 * 2 * np.pi)
+    mean_values = {
+        "temperature": lambda: 9 + 10 * season + 4 * np.sin((hour - 9) / 24 * 2 * np.pi),
+        "rad_direct": lambda: 500 * (0.6 + 0.4 * season) * daylight,
+        "rad_global": lambda: 700 * (0.6 + 0.4 * season) * daylight,
+    }
+    data_vars = {}
+    for feature in features:
+        name = feature if combined else DWD_RAW_VARIABLES[feature]
+        # the noise is created in float32 to keep the memory usage of large grids acceptable
+        if feature == "temperature":
+            values = rng.standard_normal(shape, dtype=np.float32)
+            values *= 0.5
+            values += (mean_values[feature]() + rng.normal(0, 0.3, (1, len(y), len(x)))).astype(np.float32)
+        else:
+            values = rng.random(shape, dtype=np.float32)
+            values *= mean_values[feature]().astype(np.float32)
+        data_vars[name] = (("time", "Y", "X"), values)
+    # like in the DWD TRY files, rioxarray recognizes the spatial dimensions X and Y by the attributes of the coordinates
+    coords = {"time": time,
+              "Y": ("Y", y.astype(np.float64), {"standard_name": "projection_y_coordinate", "axis": "Y", "units": "m"}),
+              "X": ("X", x.astype(np.float64), {"standard_name": "projection_x_coordinate", "axis": "X", "units": "m"})}
+    return xr.Dataset(data_vars, coords=coords)
+
+
+def write_synthetic_dwd_try_files(root_dir: str, years: list[int] | range, months: list[int] | range = range(1, 13),
+                                  features: tuple[str, ...] = ("temperature", "rad_direct", "rad_global",
+                                                               "combined_try", "combined_try_uncompressed"),
+                                  center_lon_lat: tuple[float, float] = SCHWABACH_LON_LAT, grid_size: int = 32,
+                                  seed: int = 0) -> dict[str, str]:
+    """
+    Write synthetic DWD TRY files with the file names and compressions of the real files.
+
+    :param root_dir: Directory to create the DWD TRY subdirectories in.
+    :param years: Years to create the files for.
+    :param months: Months to create the files for.
+    :param features: DWD features to create the files for, see :py:func:`acept.dwd_try_data_handling.path_to_dwd_file`.
+    :param center_lon_lat: Longitude and latitude of the center of the grid.
+    :param grid_size: Number of grid cells in X and Y direction.
+    :param seed: Seed of the random number generator.
+    :return: The DWD TRY directories as dictionary with the names of the path constants in
+        :py:mod:`acept.acept_constants` as keys.
+    """
+    paths = {"TEMPERATURE_DATA_RAW_PATH": os.path.join(root_dir, "temp_data_raw"),
+             "RADIATION_DIRECT_DATA_RAW_PATH": os.path.join(root_dir, "rad_dir_data_raw"),
+             "RADIATION_GLOBAL_DATA_RAW_PATH": os.path.join(root_dir, "rad_glob_data_raw"),
+             "TRY_BAVARIAN_PATH": os.path.join(root_dir, "try_bavarian")}
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+
+    x, y = dwd_grid_coordinates(center_lon_lat, grid_size)
+    for year in years:
+        for month in months:
+            file_name = f"{year}{month:02d}"
+            if "temperature" in features:
+                dataset = synthetic_dwd_try_dataset(year, month, x, y, features=("temperature",), seed=seed)
+                with bz2.open(os.path.join(paths["TEMPERATURE_DATA_RAW_PATH"], f"TT_{file_name}.nc.bz2"), "wb") as f:
+                    f.write(dataset.to_netcdf())
+            for feature, path_name, prefix in [("rad_direct", "RADIATION_DIRECT_DATA_RAW_PATH", "SID"),
+                                               ("rad_global", "RADIATION_GLOBAL_DATA_RAW_PATH", "SIS")]:
+                if feature in features:
+                    dataset = synthetic_dwd_try_dataset(year, month, x, y, features=(feature,), seed=seed)
+                    with gzip.open(os.path.join(paths[path_name], f"{prefix}_{file_name}.nc.gz"), "wb") as f:
+                        f.write(dataset.to_netcdf())
+            if "combined_try" in features or "combined_try_uncompressed" in features:
+                combined_bytes = synthetic_dwd_try_dataset(year, month, x, y, combined=True, seed=seed).to_netcdf()
+                if "combined_try" in features:
+                    with gzip.open(os.path.join(paths["TRY_BAVARIAN_PATH"], f"TRY_{file_name}.nc.gz"), "wb") as f:
+                        f.write(combined_bytes)
+                if "combined_try_uncompressed" in features:
+                    with open(os.path.join(paths["TRY_BAVARIAN_PATH"], f"TRY_{file_name}.nc"), "wb") as f:
+                        f.write(combined_bytes)
+    return paths
+
+
+@contextlib.contextmanager
+def patched_dwd_try_paths(paths: dict[str, str]):
+    """
+    Context manager that points the DWD TRY paths of :py:mod:`acept.dwd_try_data_handling` to other directories.
+
+    :param paths: The directories with the names of the path constants as keys, see
+        :py:func:`write_synthetic_dwd_try_files`.
+    """
+    from acept import dwd_try_data_handling
+
+    original_paths = {name: getattr(dwd_try_data_handling, name) for name in paths}
+    try:
+        for name, path in paths.items():
+            setattr(dwd_try_data_handling, name, path)
+        yield paths
+    finally:
+        for name, path in original_paths.items():
+            setattr(dwd_try_data_handling, name, path)
+
+
+def synthetic_area_shape(center_lon_lat: tuple[float, float] = SCHWABACH_LON_LAT, size: float = 6000) -> \
+        gpd.GeoDataFrame:
+    """
+    Create a square area shape around the center, e.g. as replacement for a PLZ shape.
+
+    :param center_lon_lat: Longitude and latitude of the center of the area.
+    :param size: Side length of the area in meters.
+    :return: GeoDataFrame with the area shape in EPSG:32632.
+    """
+    center = gpd.GeoSeries.from_xy([center_lon_lat[0]], [center_lon_lat[1]], crs="EPSG:4326").to_crs(epsg=32632)
+    geometry = box(center.x[0] - size / 2, center.y[0] - size / 2, center.x[0] + size / 2, center.y[0] + size / 2)
+    return gpd.GeoDataFrame({"plz": ["91126"]}, geometry=[geometry], crs="EPSG:32632")
+
+
+def synthetic_buildings(number_of_buildings: int, center_lon_lat: tuple[float, float] = SCHWABACH_LON_LAT,
+                        row_length: int = 4, seed: int = 0) -> gpd.GeoDataFrame:
+    """
+    Create synthetic buildings with the fields of the BBD buildings.
+
+    The buildings are placed on a square grid around the center. The buildings of each row of ``row_length`` buildings
+    touch each other like terraced houses, so that the number of free walls varies.
+
+    :param number_of_buildings: Number of buildings to create.
+    :param center_lon_lat: Longitude and latitude of the center of the buildings.
+    :param row_length: Number of touching buildings per row.
+    :param seed: Seed of the random number generator.
+    :return: GeoDataFrame with the buildings in EPSG:32632 and the fields osm_id, area, use, free_walls, building_t,
+        occupants, floors, constructi, refurb_wal, refurb_roo, refurb_bas, refurb_win, bid, lat, lon, plz and dist2hp.
+    """
+    rng = np.random.default_rng(seed)
+    width, depth, spacing = 10.0, 12.0, 8.0
+    rows_per_side = int(np.ceil(np.sqrt(number_of_buildings / row_length)))
+    row_width = row_length * width + spacing
+
+    index = np.arange(number_of_buildings)
+    row = index // row_length
+    x_min = (row % rows_per_side) * row_width + (index % row_length) * width
+    y_min = (row // rows_per_side) * (depth + spacing)
+
+    center = gpd.GeoSeries.from_xy([center_lon_lat[0]], [center_lon_lat[1]], crs="EPSG:4326").to_crs(epsg=32632)
+    x_min = x_min + center.x[0] - rows_per_side * row_width / 2
+    y_min = y_min + center.y[0] - rows_per_side * (depth + spacing) / 2
+    geometry = box(x_min, y_min, x_min + width, y_min + depth)
+
+    buildings = gpd.GeoDataFrame({
+        "osm_id": (90000000 + index).astype(str),
+        "area": np.full(number_of_buildings, width * depth),
+        "use": "Residential",
+        "free_walls": 4,
+        "building_t": rng.choice(BUILDING_TYPES, number_of_buildings, p=[0.6, 0.2, 0.15, 0.05]),
+        "occupants": rng.integers(1, 7, number_of_buildings).astype(float),
+        "floors": rng.integers(1, 4, number_of_buildings).astype(str),
+        "constructi": rng.choice(CONSTRUCTION_CLASSES, number_of_buildings),
+        "refurb_wal": np.nan,
+        "refurb_roo": np.nan,
+        "refurb_bas": np.nan,
+        "refurb_win": np.nan,
+        "bid": index,
+        "plz": "91126",
+        "dist2hp": 1000,
+    }, geometry=geometry, crs="EPSG:32632")
+    centroids = buildings.geometry.centroid.to_crs(epsg=4326)
+    buildings.insert(13, "lat", centroids.y)
+    buildings.insert(14, "lon", centroids.x)
+    return buildings
+
+
+def synthetic_heat_demand(buildings: pd.DataFrame, hours: int = 8760, seed: int = 0) -> tuple[pd.DataFrame,
+                                                                                              pd.DataFrame]:
+    """
+    Create synthetic space and water heating demand profiles in the format of the UHP results.
+
+    :param buildings: DataFrame with the buildings, only the field bid is used.
+    :param hours: Number of hours of the profiles.
+    :param seed: Seed of the random number generator.
+    :return: The space heating and the water heating demand as DataFrames with one column ``bid_{bid}`` per building.
+    """
+    rng = np.random.default_rng(seed)
+    columns = [f"bid_{bid}" for bid in buildings["bid"]]
+    season = 1 + np.cos(np.arange(hours) / hours * 2 * np.pi)[:, np.newaxis]
+    space_heat = (season * rng.uniform(500, 5000, (1, len(columns)))).astype(np.float32)
+    water_heat = rng.uniform(0, 400, (hours, len(columns))).astype(np.float32)
+    # no demand in some hours, as in summer nights
+    space_heat[rng.uniform(size=space_heat.shape) < 0.05] = 0
+    water_heat[rng.uniform(size=water_heat.shape) < 0.3] = 0
+    return pd.DataFrame(space_heat, columns=columns), pd.DataFrame(water_heat, columns=columns)
@@ -113,6 +113,18 @@ TEMP_PATH = absolute_path_from_relative_posix("../../temp/")
 Path relative to the acept repository root directory: ``temp/``
 """
 
+ARTIFACT_STORE_PATH = absolute_path_from_relative_posix("../../temp/artifacts/")
+"""Path to the directory of the artifact store for the created profiles, see :py:mod:`acept.artifact_store`.
+
+Path relative to the acept repository root directory: ``temp/artifacts/``
+"""
+
+BATCH_PATH = absolute_path_from_relative_posix("../../temp/batch/")
+"""Path to the default directory of the manifests and profiles of batch runs, see :py:mod:`acept.batch`.
+
+Path relative to the acept repository root directory: ``temp/batch/``
+"""
+
 
 # ------- Example data
 BBD_ROOT_DIR_TEST = absolute_path_from_relative_posix("../../../BBD/TestBezirk/")
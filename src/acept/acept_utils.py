@@ -1,11 +1,18 @@
 """Module containing utility functions for ACEPT"""
 
+from __future__ import annotations
+
 import errno
 import glob
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+import numpy as np
+
+from acept.lazy_imports import lazy_import
 
-import pandas as pd
+pd = lazy_import("pandas")
 
 
 def uppath(filepath: str, n: int) -> str:
@@ -79,6 +86,56 @@ def copy_file_or_directory_recursively(src_path: str, dst_path: str) -> str:
             raise
 
 
+def link_or_copy_file(src_path: str, dst_path: str) -> str:
+    """
+    Make a file available at another path without copying its content if possible.
+
+    Creates a hardlink, falls back to a symbolic link (e.g. if source and destination are on different filesystems) and
+    copies the file only if neither is supported. An existing file at the destination is replaced.
+
+    :param src_path: Path of the file to link.
+    :param dst_path: Destination path.
+    :return: Destination path.
+    """
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(src_path), dst_path)
+        except OSError:
+            shutil.copy2(src_path, dst_path)
+    return dst_path
+
+
+def link_files_in_directory(src_directory: str, dst_directory: str, old_substring: str = "",
+                            new_substring: str = "") -> list[str]:
+    """
+    Link all files of a directory and its subdirectories into another directory with :py:func:`link_or_copy_file`,
+    optionally replacing a substring of the names.
+
+    The substring is replaced in the names of the files and subdirectories directly in src_directory, the names within
+    the subdirectories are kept. This stages the same tree as :py:func:`copy_file_or_directory_recursively` followed by
+    :py:func:`rename_files_in_directory`.
+
+    :param src_directory: Path to the directory with the files.
+    :param dst_directory: Path to the destination directory. It is created if it does not exist.
+    :param old_substring: Substring in the names to replace. Defaults to "", no replacement.
+    :param new_substring: Substring to replace the old_substring with.
+    :return: List of the paths of the linked files.
+    """
+    os.makedirs(dst_directory, exist_ok=True)
+    linked_files = []
+    for entry in os.scandir(src_directory):
+        name = entry.name.replace(old_substring, new_substring) if old_substring else entry.name
+        if entry.is_dir():
+            linked_files.extend(link_files_in_directory(entry.path, os.path.join(dst_directory, name)))
+        elif entry.is_file():
+            linked_files.append(link_or_copy_file(entry.path, os.path.join(dst_directory, name)))
+    return linked_files
+
+
 def rename_files_in_directory(path: str, old_substring: str, new_substring: str):
     """
     Replace a sub string of all files names in a directory
@@ -158,6 +215,189 @@ def combine_csv_profiles_with_pattern(src_directory: str, pattern: str, csv_prof
     return combined_profile
 
 
+def _fast_csv_engine() -> str:
+    """
+    Fastest available engine for :py:func:`pandas.read_csv`: ``pyarrow`` if installed, otherwise ``c``.
+    """
+    try:
+        import pyarrow  # noqa: F401
+        return "pyarrow"
+    except ImportError:
+        return "c"
+
+
+def _read_csv_profile_columns(csv_file: str, column_names: list[str], skip_rows: int, in_delimiter: str, engine: str,
+                              dtype) -> np.ndarray:
+    """
+    Reads the given columns of a csv file as (time steps x columns) array.
+
+    Like the other readers of this module, the first column is not used as index (``index_col=False``), so that rows
+    with a trailing delimiter stay aligned with the header. The ``pyarrow`` engine does not support this option and
+    rejects rows that are longer than the header, such files are read with the ``c`` engine instead.
+    """
+    if engine == "pyarrow":
+        try:
+            profile = pd.read_csv(csv_file, skiprows=skip_rows, usecols=column_names, delimiter=in_delimiter,
+                                  engine=engine)
+            return profile[column_names].to_numpy(dtype=dtype)
+        except pd.errors.ParserError:
+            pass
+    profile = pd.read_csv(csv_file, skiprows=skip_rows, usecols=column_names, index_col=False, delimiter=in_delimiter,
+                          engine="c")
+    return profile[column_names].to_numpy(dtype=dtype)
+
+
+def _read_files_in_parallel(files: list[str], read_file: callable, process_result: callable,
+                            max_workers: int | None = None):
+    """
+    Reads files in parallel with a thread pool and processes the results in the calling thread as they are completed.
+
+    At most two files per thread are read or waiting to be processed at a time, so that the memory needed does not
+    depend on the number of files.
+
+    :param files: Paths to the files.
+    :param read_file: Function that reads a file, called with the path of the file.
+    :param process_result: Function that processes the result of read_file, called with the position of the file in
+        files and the result.
+    :param max_workers: Maximum number of threads to read the files. If None, the default of
+        :py:class:`concurrent.futures.ThreadPoolExecutor` is used.
+    """
+    if max_workers is None:
+        # default of ThreadPoolExecutor
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, file in enumerate(files):
+            if len(futures) >= 2 * max_workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    process_result(futures.pop(future), future.result())
+            futures[executor.submit(read_file, file)] = i
+        for future in as_completed(futures):
+            process_result(futures[future], future.result())
+
+
+def collect_csv_profile_columns_with_pattern(src_directory: str, pattern: str, column_names: list[str],
+                                             new_header: list, key_function: callable = None, skip_rows: int = 0,
+                                             in_delimiter: str = ";", max_workers: int | None = None,
+                                             dtype=np.float32, debug: bool = False) -> dict[str, pd.DataFrame]:
+    """
+    Collects several columns from all csv files with the given pattern in the given directory, reading each file once.
+
+    Each csv file contains the profiles of one building. The files are read in parallel with a thread pool and the
+    values are written directly into a preallocated (time steps x files) matrix per column. At most two files per
+    thread are submitted to the pool at a time. Missing time steps at the end of shorter files are NaN.
+
+    :param src_directory: Path to the directory with the csv files
+    :param pattern: Filename pattern of the csv files to combine
+    :param column_names: Names of the columns to extract from the csv files
+    :param new_header: New header for the combined profiles, one entry per csv file in the sorted order of the files
+    :param key_function: Function to extract the number after the last "_" in the filename for sorting. If None,
+        the files are sorted alphabetically.
+    :param skip_rows: Number of rows to skip in the csv files
+    :param in_delimiter: Delimiter of the input csv files
+    :param max_workers: Maximum number of threads to read the files. If None, the default of
+        :py:class:`concurrent.futures.ThreadPoolExecutor` is used.
+    :param dtype: Data type of the combined profiles. Defaults to np.float32.
+    :param debug: Print debug information
+    :raises ValueError: If the number of csv files and the length of new_header differ.
+    :return: Dictionary with the column names as keys and the combined profiles as pandas dataframes as values
+    """
+    csv_files = glob.glob(os.path.join(src_directory, pattern))
+    if debug:
+        print("Found", len(csv_files), "csv files with pattern", pattern)
+    # sort the files by building ID in ascending order
+    if key_function is not None:
+        csv_files.sort(key=key_function)
+    else:
+        csv_files.sort()
+    if len(csv_files) != len(new_header):
+        raise ValueError(f"Found {len(csv_files)} csv files with pattern {pattern}, but {len(new_header)} headers")
+
+    engine = _fast_csv_engine()
+
+    def read_profile_columns(csv_file: str) -> np.ndarray:
+        return _read_csv_profile_columns(csv_file, column_names, skip_rows, in_delimiter, engine, dtype)
+
+    if len(csv_files) == 0:
+        return {column_name: pd.DataFrame(columns=new_header, dtype=dtype) for column_name in column_names}
+
+    first_profile = read_profile_columns(csv_files[0])
+    n_time_steps = len(first_profile)
+    # one (time steps x files) matrix per column, column major so that every file fills a contiguous block
+    profiles = [np.full((n_time_steps, len(csv_files)), np.nan, dtype=dtype, order="F") for _ in column_names]
+
+    def fill_profile_columns(i: int, profile: np.ndarray):
+        if len(profile) > n_time_steps:
+            raise ValueError(f"{csv_files[i]} has {len(profile)} time steps, expected at most {n_time_steps}")
+        for j, column_profiles in enumerate(profiles):
+            column_profiles[:len(profile), i] = profile[:, j]
+
+    fill_profile_columns(0, first_profile)
+    _read_files_in_parallel(csv_files[1:], read_profile_columns,
+                            lambda i, profile: fill_profile_columns(i + 1, profile), max_workers)
+
+    return {column_name: pd.DataFrame(profiles[j], columns=new_header, copy=False)
+            for j, column_name in enumerate(column_names)}
+
+
+def sum_csv_profile_columns_with_pattern(src_directory: str, pattern: str, column_names: list[str],
+                                         weights: list[float] = None, key_function: callable = None,
+                                         skip_rows: int = 0, in_delimiter: str = ";", max_workers: int | None = None,
+                                         debug: bool = False) -> dict[str, np.ndarray]:
+    """
+    Sums several columns over all csv files with the given pattern in the given directory.
+
+    The files are read in parallel with a thread pool and added to running sums, so that the memory needed does not
+    depend on the number of files: at most two files per thread are submitted to the pool at a time. Missing values
+    are treated as 0.
+
+    :param src_directory: Path to the directory with the csv files
+    :param pattern: Filename pattern of the csv files to sum up
+    :param column_names: Names of the columns to sum up
+    :param weights: Optional weights of the csv files in the sorted order of the files. If None, all files have the
+        weight 1.
+    :param key_function: Function to extract the number after the last "_" in the filename for sorting. If None,
+        the files are sorted alphabetically.
+    :param skip_rows: Number of rows to skip in the csv files
+    :param in_delimiter: Delimiter of the input csv files
+    :param max_workers: Maximum number of threads to read the files. If None, the default of
+        :py:class:`concurrent.futures.ThreadPoolExecutor` is used.
+    :param debug: Print debug information
+    :raises ValueError: If the number of csv files and the number of weights differ.
+    :return: Dictionary with the column names as keys and the summed profiles as numpy arrays as values
+    """
+    csv_files = glob.glob(os.path.join(src_directory, pattern))
+    if debug:
+        print("Found", len(csv_files), "csv files with pattern", pattern)
+    if key_function is not None:
+        csv_files.sort(key=key_function)
+    else:
+        csv_files.sort()
+    if weights is not None and len(weights) != len(csv_files):
+        raise ValueError(f"Found {len(csv_files)} csv files with pattern {pattern}, but {len(weights)} weights")
+
+    engine = _fast_csv_engine()
+
+    def read_profile_columns(csv_file: str) -> np.ndarray:
+        return _read_csv_profile_columns(csv_file, column_names, skip_rows, in_delimiter, engine, np.float64)
+
+    totals = np.zeros((0, len(column_names)))
+
+    def add_profile(i: int, profile: np.ndarray):
+        nonlocal totals
+        if len(profile) > len(totals):
+            totals = np.concatenate([totals, np.zeros((len(profile) - len(totals), len(column_names)))])
+        np.nan_to_num(profile, copy=False)
+        if weights is not None:
+            profile *= weights[i]
+        totals[:len(profile)] += profile
+
+    _read_files_in_parallel(csv_files, read_profile_columns, add_profile, max_workers)
+
+    return {column_name: totals[:, j] for j, column_name in enumerate(column_names)}
+
+
 def concat_csv_profiles_columnwise(file_1: str, file_2: str, output_file: str, in_delimiter_1: str = ";",
                                    in_delimiter_2: str = ";", out_delimiter: str = ";", add_index: bool = True):
     """
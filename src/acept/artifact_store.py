@@ -0,0 +1,431 @@
+"""Module for the content-addressed artifact store.
+
+Artifacts are the files created by the profile builders of acept, e.g. temperature profiles, PV capacity factor
+profiles, COP profiles and demand profiles. Each artifact is saved in its own entry directory in the store. The name
+of the entry is the key of the artifact: a hash of the name of the generating function and all its inputs. Identical
+requests therefore result in the same key and use the existing entry instead of creating the artifact again.
+
+The store guarantees that:
+    - Entries are written atomically: they are created in a temporary directory and moved to their final path, so that
+      other threads and processes never see incomplete entries.
+    - Entries can be looked up by their key or by a human-readable reference (e.g. ``temperature_91126_2011``).
+    - The size of the store is limited: the garbage collector removes the least recently used entries. Entries used
+      within :py:const:`RECENTLY_USED_ENTRY_AGE` are kept, so that the paths returned to callers stay valid.
+
+Use this module to:
+    - Calculate the key of an artifact with :py:func:`artifact_key`, using :py:func:`file_digest` and
+      :py:func:`geometry_digest` for files and geometries
+    - Look up, write and collect the garbage of artifacts with :py:class:`ArtifactStore`
+    - Get the default store in :py:const:`acept.acept_constants.ARTIFACT_STORE_PATH` with
+      :py:func:`get_artifact_store`
+
+Example of a cached artifact:
+
+.. code-block:: python
+
+    store = get_artifact_store()
+    key = artifact_key("build_my_profile", plz="91126", year=2011)
+    entry_dir = store.lookup(key)
+    if entry_dir is None:
+        with store.write(key) as tmp_dir:
+            build_my_profile("91126", 2011, output_dir=tmp_dir)
+        entry_dir = store.entry_path(key)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Iterator
+
+import numpy as np
+
+from acept.acept_constants import ARTIFACT_STORE_PATH
+from acept.lazy_imports import lazy_import
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+
+ARTIFACT_STORE_SIZE_LIMIT = 5 * 1024 ** 3
+"""Default maximum size of the artifact store in bytes (5 GB)."""
+
+STALE_TEMPORARY_ENTRY_AGE = 24 * 60 * 60
+"""Age in seconds after which temporary entries of interrupted writes are removed by the garbage collector."""
+
+RECENTLY_USED_ENTRY_AGE = 60 * 60
+"""Time in seconds since the last use of an entry during which it is not removed by the garbage collector."""
+
+GARBAGE_COLLECTION_INTERVAL = 10 * 60
+"""Interval in seconds after which the garbage collector scans the store again, even if its estimated size is within
+the size limit."""
+
+_REFERENCES_DIR = "refs"
+
+# time of the last scan, estimated size and time at which the least recently used entry can be removed of the stores by
+# their root directory, shared by all instances
+_store_size_estimates: dict[str, tuple[float, int, float]] = {}
+_store_size_estimates_lock = threading.Lock()
+
+
+def file_digest(file_path: str) -> str:
+    """
+    Calculates the SHA-256 hash of the content of a file, to use a file as input of :py:func:`artifact_key`.
+
+    :param file_path: Path to the file.
+    :return: The SHA-256 hash of the file content as hex string.
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def geometry_digest(geometries: gpd.GeoSeries | gpd.GeoDataFrame, decimals: int = 6) -> str:
+    """
+    Calculates a hash of geometries that does not depend on their crs, to use geometries as input of
+    :py:func:`artifact_key`.
+
+    The coordinates are compared in EPSG:4326 and rounded, so that geometries that were transformed to another crs and
+    back result in the same hash.
+
+    :param geometries: The geometries with a crs.
+    :param decimals: Number of decimals of the rounded coordinates in degrees. Defaults to 6 (about 0.1 m).
+    :return: The SHA-256 hash of the geometries as hex string.
+    """
+    geometries = geometries.geometry.to_crs(epsg=4326)
+    coordinates, parts = shapely.get_coordinates(geometries.values, return_index=True)
+    geometry_hash = hashlib.sha256()
+    _update_hash(geometry_hash, np.round(coordinates, decimals) + 0.0)
+    _update_hash(geometry_hash, parts)
+    return geometry_hash.hexdigest()
+
+
+def _update_hash(key_hash, value: Any):
+    """
+    Updates the hash with the type and the content of the value.
+
+    :param key_hash: The hash object from :py:mod:`hashlib`.
+    :param value: The value. Supported are None, bool, int, float, str, bytes, lists, tuples and dictionaries of
+        supported values, NumPy arrays and pandas and GeoPandas Series and DataFrames.
+    :raises TypeError: If the type of the value is not supported.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        key_hash.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, bytes):
+        key_hash.update(f"bytes:{len(value)};".encode())
+        key_hash.update(value)
+    elif isinstance(value, (list, tuple)):
+        key_hash.update(f"{type(value).__name__}:{len(value)};".encode())
+        for item in value:
+            _update_hash(key_hash, item)
+    elif isinstance(value, dict):
+        key_hash.update(f"dict:{len(value)};".encode())
+        for item_key in sorted(value, key=str):
+            _update_hash(key_hash, str(item_key))
+            _update_hash(key_hash, value[item_key])
+    elif isinstance(value, np.ndarray):
+        key_hash.update(f"ndarray:{value.dtype.str}:{value.shape};".encode())
+        key_hash.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (pd.Series, pd.DataFrame)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        crs = getattr(frame, "crs", None)
+        key_hash.update(f"{type(value).__name__}:{frame.shape}:{crs.to_string() if crs else None};".encode())
+        _update_hash(key_hash, [str(column) for column in frame.columns])
+        _update_hash(key_hash, pd.util.hash_pandas_object(frame.index).to_numpy())
+        if len(frame.columns) > 0 and all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+            # numeric data (e.g. demand profiles) is hashed as a whole, which is much faster than column by column
+            _update_hash(key_hash, frame.to_numpy())
+            return
+        for column in frame.columns:
+            column_values = frame[column]
+            if hasattr(column_values, "to_wkb"):
+                # geometries are hashed by their well-known binary representation
+                column_values = pd.Series(column_values.to_wkb(), index=frame.index)
+            _update_hash(key_hash, pd.util.hash_pandas_object(column_values, index=False).to_numpy())
+    else:
+        raise TypeError(f"Unsupported input type for an artifact key: {type(value).__name__}")
+
+
+def artifact_key(function_name: str, **inputs) -> str:
+    """
+    Calculates the key of an artifact from the name of the generating function and its inputs.
+
+    Files have to be passed by their content, see :py:func:`file_digest`, as paths only identify the location of a
+    file.
+
+    :param function_name: Name of the generating function. Change the name (e.g. add a version) if the output of the
+        function changes for the same inputs.
+    :param inputs: The inputs of the generating function as keyword arguments, see :py:func:`_update_hash` for the
+        supported types.
+    :raises TypeError: If the type of an input is not supported.
+    :return: The SHA-256 hash of the function name and the inputs as hex string.
+    """
+    key_hash = hashlib.sha256()
+    _update_hash(key_hash, function_name)
+    _update_hash(key_hash, inputs)
+    return key_hash.hexdigest()
+
+
+def _directory_size(directory: str) -> int:
+    """
+    Calculates the size of all files in a directory and its subdirectories.
+
+    :param directory: Path to the directory.
+    :return: The size in bytes.
+    """
+    size = 0
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            with contextlib.suppress(OSError):
+                size += os.stat(os.path.join(root, file_name)).st_size
+    return size
+
+
+class ArtifactStore:
+    """
+    Class for a content-addressed store of artifacts in a directory.
+    """
+
+    def __init__(self, root_dir: str = ARTIFACT_STORE_PATH, size_limit: int = ARTIFACT_STORE_SIZE_LIMIT):
+        """
+        Constructor for the ArtifactStore class.
+
+        :param root_dir: Path to the directory of the store. Defaults to
+            :py:const:`acept.acept_constants.ARTIFACT_STORE_PATH`.
+        :param size_limit: Maximum size of the store in bytes for the garbage collection. Defaults to
+            :py:const:`ARTIFACT_STORE_SIZE_LIMIT`.
+        """
+        self.root_dir = root_dir
+        self.size_limit = size_limit
+
+    def entry_path(self, key: str) -> str:
+        """
+        Returns the path of the entry directory of an artifact, whether it exists or not.
+
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        :return: The path of the entry directory.
+        """
+        return os.path.join(self.root_dir, key[:2], key)
+
+    def lookup(self, key: str) -> str | None:
+        """
+        Looks up an artifact and marks it as recently used for the garbage collection.
+
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        :return: The path of the entry directory, or None if the artifact is not in the store.
+        """
+        entry_dir = self.entry_path(key)
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            return None
+        return entry_dir
+
+    @contextlib.contextmanager
+    def write(self, key: str) -> Iterator[str]:
+        """
+        Context manager to write an artifact atomically.
+
+        The files of the artifact are written to the yielded temporary directory. When the context is left without an
+        exception, the temporary directory becomes the entry of the artifact. If another thread or process has written
+        the same artifact in the meantime, the existing entry is kept. If an exception is raised, nothing is saved.
+
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        :return: The path of the temporary directory to write the files of the artifact to.
+        """
+        entry_dir = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_entry_dir = tempfile.mkdtemp(prefix=f".{key}_", dir=os.path.dirname(entry_dir))
+        try:
+            yield tmp_entry_dir
+            entry_size = _directory_size(tmp_entry_dir)
+            try:
+                os.replace(tmp_entry_dir, entry_dir)
+            except OSError:
+                # the artifact was written by another thread or process in the meantime
+                if not os.path.isdir(entry_dir):
+                    raise
+            else:
+                self._add_to_size_estimate(entry_size)
+        finally:
+            shutil.rmtree(tmp_entry_dir, ignore_errors=True)
+
+    def _add_to_size_estimate(self, size: int):
+        """
+        Adds the size of a new entry to the estimated size of the store, if the store was already scanned.
+
+        :param size: The size of the entry in bytes.
+        """
+        root_dir = os.path.abspath(self.root_dir)
+        with _store_size_estimates_lock:
+            if root_dir in _store_size_estimates:
+                last_scan, store_size, next_removal = _store_size_estimates[root_dir]
+                _store_size_estimates[root_dir] = (last_scan, store_size + size, next_removal)
+
+    def put_files(self, key: str, files: dict[str, str]) -> str:
+        """
+        Saves copies of existing files as an artifact.
+
+        The files are copied and not linked, so that later changes of the original files do not change the artifact.
+
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        :param files: The files of the artifact as dictionary of the file names in the entry and the paths of the files.
+        :return: The path of the entry directory.
+        """
+        with self.write(key) as tmp_entry_dir:
+            for file_name, file_path in files.items():
+                shutil.copy2(file_path, os.path.join(tmp_entry_dir, file_name))
+        return self.entry_path(key)
+
+    def lookup_file(self, key: str, file_name: str) -> str | None:
+        """
+        Looks up a single file of an artifact.
+
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        :param file_name: The name of the file in the entry.
+        :return: The path of the file, or None if the artifact or the file is not in the store.
+        """
+        entry_dir = self.lookup(key)
+        if entry_dir is None or not os.path.isfile(os.path.join(entry_dir, file_name)):
+            return None
+        return os.path.join(entry_dir, file_name)
+
+    def _reference_path(self, reference: str) -> str:
+        """
+        Returns the path of the file of a reference.
+
+        :param reference: The name of the reference.
+        :raises ValueError: If the name of the reference contains a path separator.
+        :return: The path of the reference file.
+        """
+        if os.sep in reference or (os.altsep and os.altsep in reference) or reference.startswith("."):
+            raise ValueError(f"Invalid reference name: {reference}")
+        return os.path.join(self.root_dir, _REFERENCES_DIR, f"{reference}.json")
+
+    def set_reference(self, reference: str, key: str, metadata: dict = None):
+        """
+        Sets a human-readable reference to an artifact, e.g. ``temperature_91126_2011``. An existing reference with the
+        same name is replaced.
+
+        :param reference: The name of the reference.
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        :param metadata: Optional JSON serializable information on the artifact, e.g. its inputs.
+        :raises ValueError: If the name of the reference contains a path separator.
+        """
+        reference_path = self._reference_path(reference)
+        os.makedirs(os.path.dirname(reference_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(reference_path), prefix=".", suffix=".json",
+                                         delete=False) as f:
+            json.dump({"key": key, "created": time.time(), "metadata": metadata or {}}, f)
+        os.replace(f.name, reference_path)
+
+    def resolve_reference(self, reference: str) -> str | None:
+        """
+        Returns the key of the artifact of a reference.
+
+        :param reference: The name of the reference.
+        :raises ValueError: If the name of the reference contains a path separator.
+        :return: The key of the artifact, or None if the reference or its artifact does not exist.
+        """
+        try:
+            with open(self._reference_path(reference)) as f:
+                key = json.load(f)["key"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return key if os.path.isdir(self.entry_path(key)) else None
+
+    def remove(self, key: str):
+        """
+        Removes an artifact from the store.
+
+        :param key: The key of the artifact, see :py:func:`artifact_key`.
+        """
+        shutil.rmtree(self.entry_path(key), ignore_errors=True)
+
+    def collect_garbage(self, size_limit: int | None = None, force: bool = False) -> int:
+        """
+        Removes the least recently used artifacts until the size of the store is within the size limit, temporary
+        entries of interrupted writes and references to removed artifacts.
+
+        Artifacts used within :py:const:`RECENTLY_USED_ENTRY_AGE` are never removed, so the store can exceed the size
+        limit temporarily. Scanning the store takes time proportional to the number of its files. Therefore, the store
+        is only scanned if its estimated size (the size at the last scan plus the artifacts written by this process
+        since) exceeds the size limit and an artifact can be removed, or the last scan in this process is older than
+        :py:const:`GARBAGE_COLLECTION_INTERVAL`.
+
+        :param size_limit: Maximum size of the store in bytes. Defaults to the size limit of the store.
+        :param force: Whether to scan the store regardless of its estimated size. Defaults to False.
+        :return: The number of bytes freed.
+        """
+        if size_limit is None:
+            size_limit = self.size_limit
+        if not os.path.isdir(self.root_dir):
+            return 0
+        now = time.time()
+        root_dir = os.path.abspath(self.root_dir)
+        with _store_size_estimates_lock:
+            estimate = _store_size_estimates.get(root_dir)
+        if not force and estimate is not None:
+            last_scan, estimated_size, next_removal = estimate
+            if estimated_size <= size_limit and now - last_scan < GARBAGE_COLLECTION_INTERVAL:
+                return 0
+            if estimated_size > size_limit and now < next_removal:
+                # all artifacts of the store were used recently
+                return 0
+        entries = []
+        freed = 0
+        for prefix_dir in os.scandir(self.root_dir):
+            if not prefix_dir.is_dir() or prefix_dir.name == _REFERENCES_DIR:
+                continue
+            for entry in os.scandir(prefix_dir.path):
+                if not entry.is_dir():
+                    continue
+                entry_size = _directory_size(entry.path)
+                entry_mtime = entry.stat().st_mtime
+                if entry.name.startswith("."):
+                    if now - entry_mtime > STALE_TEMPORARY_ENTRY_AGE:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        freed += entry_size
+                    continue
+                entries.append((entry_mtime, entry_size, entry.path))
+
+        store_size = sum(entry_size for _, entry_size, _ in entries)
+        next_removal = 0.0
+        for entry_mtime, entry_size, entry_path in sorted(entries):
+            if store_size <= size_limit:
+                break
+            if now - entry_mtime < RECENTLY_USED_ENTRY_AGE:
+                # the remaining entries are used more recently
+                next_removal = entry_mtime + RECENTLY_USED_ENTRY_AGE
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            store_size -= entry_size
+            freed += entry_size
+        with _store_size_estimates_lock:
+            _store_size_estimates[root_dir] = (now, store_size, next_removal)
+
+        references_dir = os.path.join(self.root_dir, _REFERENCES_DIR)
+        if os.path.isdir(references_dir):
+            for reference_file in os.scandir(references_dir):
+                if reference_file.name.endswith(".json") and not reference_file.name.startswith("."):
+                    if self.resolve_reference(reference_file.name[:-len(".json")]) is None:
+                        with contextlib.suppress(OSError):
+                            os.remove(reference_file.path)
+        return freed
+
+
+def get_artifact_store() -> ArtifactStore:
+    """
+    Returns the default artifact store in :py:const:`acept.acept_constants.ARTIFACT_STORE_PATH`.
+
+    :return: The artifact store.
+    """
+    return ArtifactStore(ARTIFACT_STORE_PATH, ARTIFACT_STORE_SIZE_LIMIT)
@@ -0,0 +1,624 @@
+"""Module for building the scenario profiles of many PLZ and years as a resumable batch.
+
+A batch consists of one job per PLZ and year. Each job runs the stages of :py:const:`BATCH_STAGES`: the buildings of
+the PLZ are queried from the BBD, then the temperature profile, the PV capacity factor profiles, the demand profiles
+and the COP profiles are built. The state of all jobs is recorded in a JSON manifest, which is saved after every
+finished stage. Every stage writes its outputs to a temporary directory that is renamed to the output directory of
+the stage when the stage succeeds, so a stage is finished if and only if its output directory exists. An interrupted
+batch therefore resumes exactly with the stages that were not finished.
+
+Use this module to:
+    - Create the manifest of a batch with :py:func:`create_batch_manifest`
+    - Run or resume a batch with :py:func:`run_batch`
+    - Summarize the state of a batch with :py:func:`summarize_batch`
+
+The batch can also be run from the command line:
+
+.. code-block:: console
+
+    $ python -m acept.batch run --region 911 --years 2010 2012 --output-dir temp/batch/district_911
+    $ python -m acept.batch status temp/batch/district_911/manifest.json
+    $ python -m acept.batch resume temp/batch/district_911/manifest.json
+
+The outputs are saved per PLZ and year in the output directory of the batch:
+``PLZ_{plz}/buildings/buildings.gpkg``, ``PLZ_{plz}/{year}/temperature/temperature.csv``,
+``PLZ_{plz}/{year}/pv/building_{bid}_pv_capacity_{year}.csv``,
+``PLZ_{plz}/{year}/demand/{space_heating,water_heating,updated_buildings}.csv`` and
+``PLZ_{plz}/{year}/cop/heatpump_{heat_source_type}.csv``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import traceback
+from concurrent.futures import CancelledError, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+from acept.acept_constants import BATCH_PATH
+from acept.bbd_plz_preprocessing import query_bbd_for_plz
+from acept.buildings_information import calculate_missing_uhp_building_fields
+from acept.cop_profiles import build_cop_tve_profiles
+from acept.demand_profiles import max_parallel_uhp_runs, run_uhp_for_selected_buildings_year
+from acept.lazy_imports import lazy_import
+from acept.plz_shape import get_plz_in_region, get_single_plz_shape
+from acept.pv_cap_factor_profiles import build_pv_capacity_profile_for_year, select_pv_weather_source
+from acept.temperature_profiles import build_temperature_profile_for_year, read_temperature_profile, \
+    select_temperature_weather_source
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+
+BATCH_MANIFEST_VERSION = 1
+"""Version of the format of the batch manifest."""
+BATCH_MANIFEST_FILE = "manifest.json"
+"""File name of the manifest in the output directory of a batch."""
+BATCH_STAGES = ("buildings", "temperature", "pv", "demand", "cop")
+"""Stages of a batch job in the order they are run."""
+BATCH_STAGE_DEPENDENCIES = {"buildings": (), "temperature": (), "pv": ("buildings",),
+                            "demand": ("buildings", "temperature"), "cop": ("buildings", "temperature", "demand")}
+"""Stages whose outputs are the inputs of a stage. They are added to a batch if the stage is selected."""
+BATCH_STAGE_STATUSES = ("pending", "running", "done", "failed", "blocked")
+"""Status of a stage: 'blocked' stages are not run because a stage they depend on failed."""
+
+
+def _now() -> str:
+    """
+    The current local time for the manifest.
+    """
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _job_id(plz: str, year: int) -> str:
+    """
+    The ID of the job of a PLZ and year in the manifest.
+    """
+    return f"{plz}_{year}"
+
+
+def _with_stage_dependencies(stages: list[str] | tuple[str, ...]) -> list[str]:
+    """
+    The selected stages and all stages they depend on, in the order of :py:const:`BATCH_STAGES`.
+
+    :param stages: The selected stages.
+    :raises ValueError: If a stage is unknown.
+    :return: The stages of the batch.
+    """
+    unknown_stages = [stage for stage in stages if stage not in BATCH_STAGES]
+    if unknown_stages:
+        raise ValueError(f"stages must be in {BATCH_STAGES}, unknown: {unknown_stages}")
+    selected = set()
+    remaining = list(stages)
+    while remaining:
+        stage = remaining.pop()
+        if stage not in selected:
+            selected.add(stage)
+            remaining.extend(BATCH_STAGE_DEPENDENCIES[stage])
+    return [stage for stage in BATCH_STAGES if stage in selected]
+
+
+def batch_stage_dir(output_dir: str, plz: str, year: int, stage: str) -> str:
+    """
+    Output directory of a stage of a batch job. The buildings are shared by the jobs of all years of the PLZ.
+
+    :param output_dir: The output directory of the batch.
+    :param plz: The PLZ of the job.
+    :param year: The year of the job.
+    :param stage: The stage, one of :py:const:`BATCH_STAGES`.
+    :return: The path of the output directory of the stage.
+    """
+    if stage == "buildings":
+        return os.path.join(output_dir, f"PLZ_{plz}", "buildings")
+    return os.path.join(output_dir, f"PLZ_{plz}", str(year), stage)
+
+
+@contextmanager
+def _write_stage_outputs(stage_dir: str) -> Iterator[str]:
+    """
+    Context manager to write the outputs of a stage atomically, like
+    :py:meth:`acept.artifact_store.ArtifactStore.write`.
+
+    The outputs are written to the yielded temporary directory, which becomes the output directory of the stage when
+    the context is left without an exception. Existing outputs of the stage are replaced.
+
+    :param stage_dir: The output directory of the stage.
+    :return: The path of the temporary directory to write the outputs to.
+    """
+    os.makedirs(os.path.dirname(stage_dir), exist_ok=True)
+    tmp_stage_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(stage_dir)}_", dir=os.path.dirname(stage_dir))
+    try:
+        yield tmp_stage_dir
+        if os.path.isdir(stage_dir):
+            shutil.rmtree(stage_dir)
+        os.replace(tmp_stage_dir, stage_dir)
+    finally:
+        shutil.rmtree(tmp_stage_dir, ignore_errors=True)
+
+
+#####################################################################################################
+# Manifest
+
+def create_batch_manifest(plz_list: list[str | int], year_start: int, year_end: int, output_dir: str | None = None,
+                          stages: list[str] | tuple[str, ...] = BATCH_STAGES, building_use: str = "All",
+                          demand_unit: str = "W", heat_source_type: str = "air", max_attempts: int = 2) -> str:
+    """
+    Creates the manifest of a batch with one job per PLZ and year and saves it in the output directory.
+
+    An existing manifest in the output directory is kept, so that its jobs can be resumed with :py:func:`run_batch`.
+
+    :param plz_list: The PLZ of the batch, e.g. from :py:func:`acept.plz_shape.get_plz_in_region`.
+    :param year_start: The first year of the batch.
+    :param year_end: The last year of the batch.
+    :param output_dir: The output directory of the batch. Defaults to a new directory in
+        :py:const:`acept.acept_constants.BATCH_PATH`.
+    :param stages: The stages to run, the stages they depend on are added. Defaults to all stages.
+    :param building_use: Use type of the buildings queried from the BBD, see
+        :py:func:`acept.bbd_plz_preprocessing.query_bbd_for_plz`. Defaults to 'All'.
+    :param demand_unit: Unit of the demand profiles. Defaults to 'W'.
+    :param heat_source_type: The type of heat source of the COP profiles. Defaults to 'air'.
+    :param max_attempts: How often a failing stage is run in a batch run. Defaults to 2.
+    :raises ValueError: If no PLZ is given, the years or stages are invalid, or a different batch exists in the output
+        directory.
+    :return: Path of the manifest.
+    """
+    if not plz_list:
+        raise ValueError("The batch needs at least one PLZ")
+    if year_start > year_end:
+        raise ValueError(f"year_start must not be after year_end, is: {year_start} > {year_end}")
+    if output_dir is None:
+        os.makedirs(BATCH_PATH, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix=f"batch_{datetime.now():%Y%m%d_%H%M%S}_", dir=BATCH_PATH)
+    output_dir = os.path.abspath(output_dir)
+    manifest_path = os.path.join(output_dir, BATCH_MANIFEST_FILE)
+
+    settings = {"stages": _with_stage_dependencies(stages), "building_use": building_use,
+                "demand_unit": demand_unit, "heat_source_type": heat_source_type, "max_attempts": max_attempts}
+    jobs = {}
+    for plz in sorted({str(plz) for plz in plz_list}):
+        for year in range(year_start, year_end + 1):
+            jobs[_job_id(plz, year)] = {
+                "plz": plz, "year": year, "status": "pending",
+                "stages": {stage: {"status": "pending", "attempts": 0, "duration": None, "error": None}
+                           for stage in settings["stages"]}}
+
+    if os.path.isfile(manifest_path):
+        manifest = load_batch_manifest(manifest_path)
+        if manifest["settings"] != settings or set(manifest["jobs"]) != set(jobs):
+            raise ValueError(f"A different batch exists in {output_dir}, resume it or use another output directory")
+        print("Using existing batch manifest", manifest_path)
+        return manifest_path
+
+    created = _now()
+    manifest = {"version": BATCH_MANIFEST_VERSION, "created": created, "updated": created, "output_dir": output_dir,
+                "settings": settings, "jobs": jobs}
+    save_batch_manifest(manifest, manifest_path)
+    return manifest_path
+
+
+def save_batch_manifest(manifest: dict, manifest_path: str):
+    """
+    Saves the manifest of a batch atomically, so that an interruption never leaves a partially written manifest.
+
+    :param manifest: The manifest.
+    :param manifest_path: Path of the manifest.
+    """
+    manifest["updated"] = _now()
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(manifest_path), prefix=".", suffix=".json",
+                                     delete=False) as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f.name, manifest_path)
+
+
+def load_batch_manifest(manifest_path: str) -> dict:
+    """
+    Loads the manifest of a batch and reconciles the status of the stages with their outputs.
+
+    Stages that were running when the batch was interrupted are failed, so that they are run again until they were
+    started ``max_attempts`` times, stages whose outputs exist are done and stages whose outputs are missing are not
+    done.
+
+    :param manifest_path: Path of the manifest.
+    :raises ValueError: If the manifest has an unknown version.
+    :return: The manifest.
+    """
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != BATCH_MANIFEST_VERSION:
+        raise ValueError(f"Unknown batch manifest version {manifest.get('version')} in {manifest_path}")
+    for job in manifest["jobs"].values():
+        for stage, record in job["stages"].items():
+            outputs_exist = os.path.isdir(batch_stage_dir(manifest["output_dir"], job["plz"], job["year"], stage))
+            if outputs_exist:
+                record["status"] = "done"
+            elif record["status"] == "running":
+                # the attempt was counted when the stage was started
+                record.update(status="failed", error="The batch was interrupted while the stage was running")
+            elif record["status"] == "done":
+                record["status"] = "pending"
+        _update_job_status(job)
+    return manifest
+
+
+def _update_job_status(job: dict):
+    """
+    Sets the status of a job from the status of its stages.
+    """
+    statuses = {record["status"] for record in job["stages"].values()}
+    if statuses == {"done"}:
+        job["status"] = "done"
+    elif "running" in statuses:
+        job["status"] = "running"
+    elif statuses & {"failed", "blocked"} and not statuses & {"pending"}:
+        job["status"] = "failed"
+    else:
+        job["status"] = "pending"
+
+
+def reset_failed_stages(manifest: dict):
+    """
+    Sets failed and blocked stages pending again with no attempts, e.g. after the cause of the errors was fixed.
+
+    :param manifest: The manifest.
+    """
+    for job in manifest["jobs"].values():
+        for record in job["stages"].values():
+            if record["status"] in ("failed", "blocked"):
+                record.update(status="pending", attempts=0)
+        _update_job_status(job)
+
+
+def summarize_batch(manifest: dict) -> dict:
+    """
+    Summarizes the state of a batch.
+
+    :param manifest: The manifest.
+    :return: A dictionary with the number of ``jobs``, the number of jobs per status as ``job_statuses``, the number of
+        stages per stage and status as ``stage_statuses`` and the ``errors`` of the failed stages by job and stage.
+    """
+    job_statuses = {status: 0 for status in ("pending", "running", "done", "failed")}
+    stage_statuses = {stage: {status: 0 for status in BATCH_STAGE_STATUSES} for stage in manifest["settings"]["stages"]}
+    errors = {}
+    for job_id, job in manifest["jobs"].items():
+        job_statuses[job["status"]] += 1
+        for stage, record in job["stages"].items():
+            stage_statuses[stage][record["status"]] += 1
+            if record["status"] == "failed":
+                errors.setdefault(job_id, {})[stage] = record["error"]
+    return {"jobs": len(manifest["jobs"]), "job_statuses": job_statuses, "stage_statuses": stage_statuses,
+            "errors": errors}
+
+
+def print_batch_summary(manifest: dict, show_errors: bool = False):
+    """
+    Prints the summary of a batch, see :py:func:`summarize_batch`.
+
+    :param manifest: The manifest.
+    :param show_errors: If True, the full error messages of the failed stages are printed, otherwise their last line.
+    """
+    summary = summarize_batch(manifest)
+    print(f"Batch in {manifest['output_dir']}: {summary['jobs']} jobs, "
+          + ", ".join(f"{count} {status}" for status, count in summary["job_statuses"].items()))
+    for stage, statuses in summary["stage_statuses"].items():
+        print(f"  {stage:<12} " + ", ".join(f"{count} {status}" for status, count in statuses.items() if count))
+    for job_id, stage_errors in summary["errors"].items():
+        for stage, error in stage_errors.items():
+            print(f"Job {job_id} stage {stage} failed: {error if show_errors else error.strip().splitlines()[-1]}")
+
+
+#####################################################################################################
+# Stages
+# The stages run in separate processes. They read their inputs from the output directories of the stages they depend
+# on and write their outputs to the temporary directory of :py:func:`_write_stage_outputs`.
+
+def _read_batch_buildings(output_dir: str, plz: str, year: int) -> gpd.GeoDataFrame:
+    """
+    Reads the buildings of a batch job.
+    """
+    return gpd.read_file(os.path.join(batch_stage_dir(output_dir, plz, year, "buildings"), "buildings.gpkg"))
+
+
+def _read_batch_temperature_profile(output_dir: str, plz: str, year: int) -> tuple[pd.Series, bool]:
+    """
+    Reads the temperature profile of a batch job.
+
+    :return: The temperature profile and whether it is the temperature profile of the TMY.
+    """
+    temperature_dir = batch_stage_dir(output_dir, plz, year, "temperature")
+    is_tmy = os.path.isfile(os.path.join(temperature_dir, "tmy"))
+    return read_temperature_profile(os.path.join(temperature_dir, "temperature.csv")), is_tmy
+
+
+def _run_buildings_stage(output_dir: str, plz: str, year: int, settings: dict, stage_dir: str) -> dict:
+    """
+    Queries the buildings of the PLZ from the BBD and adds the fields needed by UrbanHeatPro.
+    """
+    buildings = query_bbd_for_plz(plz, building_use=settings["building_use"], debug=False)
+    buildings, _ = calculate_missing_uhp_building_fields(buildings, debug=False)
+    buildings.to_file(os.path.join(stage_dir, "buildings.gpkg"), driver="GPKG")
+    return {"buildings": len(buildings)}
+
+
+def _run_temperature_stage(output_dir: str, plz: str, year: int, settings: dict, stage_dir: str) -> dict:
+    """
+    Builds the temperature profile of the PLZ for the year, see
+    :py:func:`acept.temperature_profiles.build_temperature_profile_for_year`.
+    """
+    weather_source = select_temperature_weather_source(year)
+    temperature_profile = build_temperature_profile_for_year(plz, get_single_plz_shape(plz), year, debug=False)
+    shutil.copy2(temperature_profile, os.path.join(stage_dir, "temperature.csv"))
+    if weather_source == "tmy":
+        # marks the TMY fallback for the demand stage, UrbanHeatPro is run without a year
+        open(os.path.join(stage_dir, "tmy"), "w").close()
+    return {"weather_source": weather_source}
+
+
+def _run_pv_stage(output_dir: str, plz: str, year: int, settings: dict, stage_dir: str) -> dict:
+    """
+    Builds the PV capacity factor profiles of the buildings for the year, see
+    :py:func:`acept.pv_cap_factor_profiles.build_pv_capacity_profile_for_year`.
+    """
+    weather_source = select_pv_weather_source(year)
+    buildings = _read_batch_buildings(output_dir, plz, year)
+    pv_capacity_dir = build_pv_capacity_profile_for_year(get_single_plz_shape(plz), buildings,
+                                                         year if weather_source != "tmy" else None, debug=False)
+    for file_name in os.listdir(pv_capacity_dir):
+        shutil.copy2(os.path.join(pv_capacity_dir, file_name), os.path.join(stage_dir, file_name))
+    return {"weather_source": weather_source}
+
+
+def _run_demand_stage(output_dir: str, plz: str, year: int, settings: dict, stage_dir: str) -> dict:
+    """
+    Builds the demand profiles of the buildings with UrbanHeatPro, see
+    :py:func:`acept.demand_profiles.run_uhp_for_selected_buildings_year`.
+    """
+    buildings = _read_batch_buildings(output_dir, plz, year)
+    temperature_profile, is_tmy = _read_batch_temperature_profile(output_dir, plz, year)
+    demand = run_uhp_for_selected_buildings_year(plz, buildings, None if is_tmy else year, temperature_profile,
+                                                 demand_unit=settings["demand_unit"], use_cache=True)
+    demand["space_heating_df"].to_csv(os.path.join(stage_dir, "space_heating.csv"), index=False)
+    demand["water_heating_df"].to_csv(os.path.join(stage_dir, "water_heating.csv"), index=False)
+    shutil.copy2(demand["buildings_csv"], os.path.join(stage_dir, "updated_buildings.csv"))
+    return {"buildings": len(demand["updated_buildings_df"])}
+
+
+def _run_cop_stage(output_dir: str, plz: str, year: int, settings: dict, stage_dir: str) -> dict:
+    """
+    Builds the COP profiles of the buildings, see :py:func:`acept.cop_profiles.build_cop_tve_profiles`.
+    """
+    buildings = _read_batch_buildings(output_dir, plz, year)
+    temperature_profile, _ = _read_batch_temperature_profile(output_dir, plz, year)
+    demand_dir = batch_stage_dir(output_dir, plz, year, "demand")
+    space_heat = pd.read_csv(os.path.join(demand_dir, "space_heating.csv"))
+    water_heat = pd.read_csv(os.path.join(demand_dir, "water_heating.csv"))
+    cop_tve = build_cop_tve_profiles(buildings, space_heat, water_heat, temperature_profile,
+                                     heat_source_type=settings["heat_source_type"])
+    cop_tve.to_csv(os.path.join(stage_dir, f"heatpump_{settings['heat_source_type']}.csv"), sep=",", index=False)
+    return {}
+
+
+_STAGE_FUNCTIONS = {"buildings": _run_buildings_stage, "temperature": _run_temperature_stage, "pv": _run_pv_stage,
+                    "demand": _run_demand_stage, "cop": _run_cop_stage}
+
+
+def _run_batch_stage(output_dir: str, plz: str, year: int, stage: str, settings: dict) -> dict:
+    """
+    Runs a single stage of a batch job and catches its errors, like :py:func:`acept.demand_profiles._run_uhp_job`.
+
+    :return: A dictionary with the job ID, the stage, the duration in seconds and either the information returned by
+        the stage or the error message.
+    """
+    start = time.perf_counter()
+    try:
+        with _write_stage_outputs(batch_stage_dir(output_dir, plz, year, stage)) as stage_dir:
+            info = _STAGE_FUNCTIONS[stage](output_dir, plz, year, settings, stage_dir)
+        error = None
+    except Exception as e:
+        info = None
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+    return {"job_id": _job_id(plz, year), "stage": stage, "duration": time.perf_counter() - start, "info": info,
+            "error": error}
+
+
+def _stage_resource(job: dict, stage: str) -> str | None:
+    """
+    The resource a stage needs exclusively: the buildings are shared by the jobs of a PLZ, and UrbanHeatPro uses
+    temporary files per PLZ.
+    """
+    if stage in ("buildings", "demand"):
+        return f"{stage}:{job['plz']}"
+    return None
+
+
+#####################################################################################################
+# Scheduler
+
+def run_batch(manifest_path: str, max_workers: int | None = None, max_parallel_demand: int | None = None,
+              debug: bool = True) -> dict:
+    """
+    Runs or resumes the batch of a manifest.
+
+    The stages of all jobs are run in a process pool as soon as the stages they depend on are done, so stages of
+    different jobs run at the same time. Since each UrbanHeatPro run uses multiple processes itself, the number of
+    parallel demand stages is limited separately. Stages that are done are not run again. A failing stage is run again
+    until it failed ``max_attempts`` times (see :py:func:`create_batch_manifest`); the stages depending on it are
+    blocked, but the other jobs continue. If a worker process terminates abruptly (e.g. killed because it ran out of
+    memory), the stages running in the pool fail and the pool is recreated. The manifest is saved after every stage,
+    so the batch can be interrupted at any time and resumed by calling this function again.
+
+    :param manifest_path: Path of the manifest, see :py:func:`create_batch_manifest`.
+    :param max_workers: Maximum number of stages running at the same time. If None, the number of CPU cores is used.
+    :param max_parallel_demand: Maximum number of demand stages running at the same time. If None,
+        :py:func:`acept.demand_profiles.max_parallel_uhp_runs` is used.
+    :param debug: If True, print when stages are started and finished.
+    :return: The summary of the batch, see :py:func:`summarize_batch`.
+    """
+    manifest = load_batch_manifest(manifest_path)
+    settings = manifest["settings"]
+    output_dir = manifest["output_dir"]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_parallel_demand is None and "demand" in settings["stages"]:
+        max_parallel_demand = max_parallel_uhp_runs()
+    max_parallel_demand = max(1, min(max_parallel_demand or 1, max_workers))
+
+    start = time.perf_counter()
+    running = {}
+    resources = set()
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            changed = False
+            for job_id, job in manifest["jobs"].items():
+                for stage, record in job["stages"].items():
+                    if record["status"] == "failed" and record["attempts"] < settings["max_attempts"]:
+                        record["status"] = "pending"
+                    if record["status"] != "pending":
+                        continue
+                    dependency_statuses = {job["stages"][dependency]["status"]
+                                           for dependency in BATCH_STAGE_DEPENDENCIES[stage]}
+                    if dependency_statuses & {"failed", "blocked"}:
+                        record.update(status="blocked", error=None)
+                        changed = True
+                        continue
+                    if dependency_statuses - {"done"}:
+                        continue
+                    if os.path.isdir(batch_stage_dir(output_dir, job["plz"], job["year"], stage)):
+                        # the outputs shared by the jobs of the PLZ were created by another job
+                        record.update(status="done", error=None)
+                        changed = True
+                        continue
+                    resource = _stage_resource(job, stage)
+                    running_demand = sum(1 for running_stage in running.values() if running_stage[1] == "demand")
+                    if (len(running) >= max_workers or resource in resources
+                            or (stage == "demand" and running_demand >= max_parallel_demand)):
+                        continue
+                    future = executor.submit(_run_batch_stage, output_dir, job["plz"], job["year"], stage, settings)
+                    running[future] = (job_id, stage, resource, time.perf_counter(), executor)
+                    if resource is not None:
+                        resources.add(resource)
+                    record.update(status="running", attempts=record["attempts"] + 1, started=_now())
+                    changed = True
+                    if debug:
+                        print(f"Job {job_id} stage {stage}: started (attempt {record['attempts']})")
+                _update_job_status(job)
+            if changed:
+                save_batch_manifest(manifest, manifest_path)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            pool_broken = False
+            for future in done:
+                job_id, stage, resource, stage_start, stage_executor = running.pop(future)
+                resources.discard(resource)
+                record = manifest["jobs"][job_id]["stages"][stage]
+                try:
+                    stage_result = future.result()
+                except CancelledError:
+                    # the stage was cancelled before it started, it is submitted again without counting the attempt
+                    record.update(status="pending", attempts=record["attempts"] - 1, error=None)
+                    _update_job_status(manifest["jobs"][job_id])
+                    if debug:
+                        print(f"Job {job_id} stage {stage}: cancelled")
+                    continue
+                except BrokenProcessPool as e:
+                    # a worker process was terminated abruptly, e.g. killed because it ran out of memory. Only a
+                    # failure of the current pool requires a new one, the other stages of an already replaced pool
+                    # fail as well and are collected in the next iterations
+                    pool_broken = pool_broken or stage_executor is executor
+                    stage_result = {"duration": time.perf_counter() - stage_start, "info": None,
+                                    "error": f"{type(e).__name__}: {e}"}
+                status = "failed" if stage_result["error"] is not None else "done"
+                record.update(status=status, duration=stage_result["duration"], error=stage_result["error"],
+                              info=stage_result["info"])
+                _update_job_status(manifest["jobs"][job_id])
+                if debug:
+                    print(f"Job {job_id} stage {stage}: {status} after {stage_result['duration']:.1f} s")
+            save_batch_manifest(manifest, manifest_path)
+            if pool_broken:
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+    finally:
+        # stages that are still running stay 'running' in the manifest and count as failed when it is loaded
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Batch run finished in {time.perf_counter() - start:.1f} s")
+    print_batch_summary(manifest)
+    return summarize_batch(manifest)
+
+
+#####################################################################################################
+# Command line interface
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="create the manifest of a new batch and run it")
+    area_group = run_parser.add_mutually_exclusive_group(required=True)
+    area_group.add_argument("--plz", nargs="+", help="PLZ of the batch")
+    area_group.add_argument("--plz-file", help="text file with one PLZ per line")
+    area_group.add_argument("--region", help="leading digits of the PLZ of the batch, e.g. 911")
+    run_parser.add_argument("--years", nargs=2, type=int, required=True, metavar=("START", "END"),
+                            help="first and last year of the batch")
+    run_parser.add_argument("--stages", nargs="+", choices=BATCH_STAGES, default=list(BATCH_STAGES),
+                            help="stages to run, the stages they depend on are added (default: all)")
+    run_parser.add_argument("--output-dir", help=f"output directory (default: a new directory in {BATCH_PATH})")
+    run_parser.add_argument("--building-use", default="All", help="use type of the buildings (default: %(default)s)")
+    run_parser.add_argument("--demand-unit", default="W", help="unit of the demand profiles (default: %(default)s)")
+    run_parser.add_argument("--heat-source-type", default="air",
+                            help="heat source type of the COP profiles (default: %(default)s)")
+    run_parser.add_argument("--max-attempts", type=int, default=2,
+                            help="how often a failing stage is run (default: %(default)s)")
+
+    resume_parser = subparsers.add_parser("resume", help="resume an interrupted batch")
+    resume_parser.add_argument("manifest", help="manifest of the batch")
+    resume_parser.add_argument("--retry-failed", action="store_true",
+                               help="run failed stages again, even if they failed max-attempts times")
+
+    for command_parser in (run_parser, resume_parser):
+        command_parser.add_argument("--max-workers", type=int, help="maximum number of parallel stages "
+                                                                    "(default: number of CPU cores)")
+        command_parser.add_argument("--max-parallel-demand", type=int,
+                                    help="maximum number of parallel UrbanHeatPro runs (default: depending on the "
+                                         "UrbanHeatPro settings)")
+
+    status_parser = subparsers.add_parser("status", help="print the state of a batch")
+    status_parser.add_argument("manifest", help="manifest of the batch")
+    status_parser.add_argument("--errors", action="store_true", help="print the full error messages")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.plz is not None:
+            plz_list = args.plz
+        elif args.plz_file is not None:
+            with open(args.plz_file, "r") as f:
+                plz_list = [line.strip() for line in f if line.strip()]
+        else:
+            plz_list = get_plz_in_region(args.region)
+        manifest_path = create_batch_manifest(plz_list, args.years[0], args.years[1], args.output_dir, args.stages,
+                                              args.building_use, args.demand_unit, args.heat_source_type,
+                                              args.max_attempts)
+        print("Batch manifest saved to", manifest_path)
+    elif args.command == "resume":
+        manifest_path = args.manifest
+        if args.retry_failed:
+            manifest = load_batch_manifest(manifest_path)
+            reset_failed_stages(manifest)
+            save_batch_manifest(manifest, manifest_path)
+    else:
+        print_batch_summary(load_batch_manifest(args.manifest), show_errors=args.errors)
+        return
+    run_batch(manifest_path, args.max_workers, args.max_parallel_demand)
+
+
+if __name__ == "__main__":
+    main()
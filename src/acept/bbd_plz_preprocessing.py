@@ -13,21 +13,24 @@ Note:
     shapefiles are saved in the :py:const:`acept.acept_constants.BBD_WITH_PLZ_ROOT_PATH` directory.
 """
 
+from __future__ import annotations
+
 import glob
 import json
 import os
 import re
 from typing import Tuple
 
-import geopandas as gpd
-import pandas as pd
-
 from acept import acept_utils
 from acept import plz_shape
 from acept.acept_constants import TEMP_PATH, BBD_ROOT_DIR, PLZ_MAPPING_JSON_DIR, BBD_WITH_PLZ_ROOT_PATH
 from acept.buildings_information import calculate_missing_uhp_building_fields
+from acept.lazy_imports import lazy_import
 from acept.uhp_input_formatting import map_building_use_types_to_numbers
 
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+
 
 # ---------
 def derive_bbd_output_path_from_filepath_shp(output_base: str, filename: str) -> str:
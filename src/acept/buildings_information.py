@@ -9,6 +9,7 @@ The following fields are calculated and added to the GeoDataFrame:
     - lat: latitude of the centroid in degrees
     - lon: longitude of the centroid in degrees
     - dist2hp: distance to the heat plant or a heat source in meters
+    - hp_id: ID of the nearest heat plant, if the distance to the nearest of several heat plants is calculated
     - construction: the class of the year of construction based on the Zensus data
     - year_class: the class of the year of construction based on the Zensus data as a numerical value
     - building_type: the typology of the building based on the Zensus data
@@ -25,12 +26,23 @@ If the input GeoDataFrame already contains these fields, they will not be added
 If there are fields with similar names as the calculated ones, the existing fields will be renamed to the expected
 names. If values are then still missing, they are calculated where possible.
 
+For large building sets (e.g. a whole Landkreis), use :py:func:`iter_enriched_building_chunks` to calculate the missing
+fields in spatially coherent chunks, so that the peak memory is bounded by the chunk size instead of the input size.
+
 """
 
-import geopandas as gpd
-import pandas as pd
-from shapely import convex_hull
-from shapely.ops import unary_union
+from __future__ import annotations
+
+from typing import Iterator
+
+import numpy as np
+
+from acept.lazy_imports import lazy_import
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+shapely_ops = lazy_import("shapely.ops")
 
 
 def calculate_missing_uhp_building_fields(buildings: gpd.GeoDataFrame, debug: bool = True) -> tuple[
@@ -172,6 +184,89 @@ def calculate_missing_uhp_building_fields(buildings: gpd.GeoDataFrame, debug: bo
     return buildings, flag_modified
 
 
+def iter_enriched_building_chunks(buildings: gpd.GeoDataFrame, chunk_size: int = 10000, halo_distance: float = 1.0,
+                                  debug: bool = True) -> Iterator[gpd.GeoDataFrame]:
+    """
+    Calculates missing fields that are input to UrbanHeatPro chunk by chunk and yields the enriched chunks.
+
+    The buildings are ordered along a grid of tiles over their projected bounding boxes, so that each chunk contains
+    buildings that are close to each other. Every chunk is enriched together with a halo of the neighbouring buildings
+    within ``halo_distance`` of a building of the chunk. This way the free walls of buildings at the border of a chunk
+    are detected correctly. Only the buildings of the chunk itself are yielded as a copy, the halo is dropped after the
+    enrichment. The halo is queried from a spatial index (STRtree) of the bounding boxes of the buildings, whose
+    lower-left and upper-right corners are reprojected to EPSG:32632; the other corners and the exact geometries are not
+    used for the selection.
+
+    The chunks are yielded in the order of the tiles, not in the order of the "bid" field. Within a chunk, the
+    buildings keep the order of the input.
+
+    The input GeoDataFrame is not modified. If it has no "bid" field, the building IDs are the row numbers of the
+    input, i.e. the same as with :py:func:`calculate_missing_uhp_building_fields`.
+
+    :param buildings: GeoDataFrame containing the buildings
+    :param chunk_size: Maximum number of buildings per chunk (without the halo). Default: 10000.
+    :param halo_distance: Distance in m around the chunk in which neighbouring buildings are included in the
+        enrichment. Has to be larger than the 0.1 m buffer used in :py:func:`calculate_free_walls`. Default: 1.0.
+    :param debug: Prints debug messages if True (default).
+    :raises ValueError: If chunk_size is not positive.
+    :return: Iterator over the enriched chunks as GeoDataFrames in EPSG:32632.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if len(buildings) == 0:
+        return
+
+    # bounding boxes of the buildings in a projection with meters as unit
+    bounds = buildings.geometry.bounds.to_numpy()
+    lower_left = gpd.GeoSeries(gpd.points_from_xy(bounds[:, 0], bounds[:, 1]), crs=buildings.crs).to_crs(epsg=32632)
+    upper_right = gpd.GeoSeries(gpd.points_from_xy(bounds[:, 2], bounds[:, 3]), crs=buildings.crs).to_crs(epsg=32632)
+    min_x, min_y = lower_left.x.to_numpy(), lower_left.y.to_numpy()
+    max_x, max_y = upper_right.x.to_numpy(), upper_right.y.to_numpy()
+    del bounds, lower_left, upper_right
+
+    # order the buildings along a serpentine over square tiles with about chunk_size buildings each
+    center_x, center_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+    extent = max(np.nanmax(center_x) - np.nanmin(center_x), np.nanmax(center_y) - np.nanmin(center_y), 1.0)
+    tile_size = extent * np.sqrt(min(chunk_size / len(buildings), 1.0))
+    tile_x = np.nan_to_num((center_x - np.nanmin(center_x)) // tile_size).astype(np.int64)
+    tile_y = np.nan_to_num((center_y - np.nanmin(center_y)) // tile_size).astype(np.int64)
+    tile_x = np.where(tile_y % 2 == 0, tile_x, tile_x.max() - tile_x)
+    order = np.lexsort((center_x, tile_x, tile_y))
+
+    # spatial index of the bounding boxes for the halo, buildings without geometry have no bounding box
+    has_bounds = ~(np.isnan(min_x) | np.isnan(min_y) | np.isnan(max_x) | np.isnan(max_y))
+    boxes = np.full(len(buildings), None, dtype=object)
+    boxes[has_bounds] = shapely.box(min_x[has_bounds], min_y[has_bounds], max_x[has_bounds], max_y[has_bounds])
+    tree = shapely.STRtree(boxes)
+
+    add_bid = "bid" not in [str(x).lower() for x in buildings.columns]
+
+    for start in range(0, len(order), chunk_size):
+        core = np.sort(order[start:start + chunk_size])
+
+        # halo: all other buildings whose bounding box is within halo_distance of the bounding box of a building of
+        # the chunk
+        core_with_bounds = core[has_bounds[core]]
+        _, neighbours = tree.query(shapely.box(min_x[core_with_bounds] - halo_distance,
+                                               min_y[core_with_bounds] - halo_distance,
+                                               max_x[core_with_bounds] + halo_distance,
+                                               max_y[core_with_bounds] + halo_distance))
+        positions = np.concatenate([core, np.setdiff1d(neighbours, core)])
+
+        # copy, so that the input GeoDataFrame is not modified, and use positional index for the calculations
+        chunk = buildings.iloc[positions].copy()
+        chunk.reset_index(drop=True, inplace=True)
+        if add_bid:
+            # consecutive building number of the whole input as in calculate_bid
+            chunk["bid"] = positions
+        if debug:
+            print(f"Chunk {start // chunk_size + 1}: {len(core)} buildings with {len(positions) - len(core)} "
+                  f"buildings in the halo")
+        chunk, _ = calculate_missing_uhp_building_fields(chunk, debug=False)
+        # copy, so that changes of the caller do not write into the chunk with the halo
+        yield chunk.iloc[:len(core)].copy()
+
+
 def calculate_bid(buildings: gpd.GeoDataFrame):
     """
     Adds field "bid" with a consecutive building number as id to the buildings GeoDataFrame.
@@ -201,19 +296,18 @@ def calculate_free_walls(buildings: gpd.GeoDataFrame):
     Adds field "free_walls" with the number of walls in direct contact with ambient temperature.
 
     It is assumed that all buildings have only four walls.
+    The intersecting buildings are found with a spatial index, so that only neighbouring buildings are compared.
 
     :param buildings: GeoDataFrame containing buildings.
     """
 
-    # add field "free walls"
-    buildings['free_walls'] = 4
+    # count the buildings intersecting each buffered building, the analyzed building is taken as intersected
+    tree = shapely.STRtree(buildings.geometry.values)
+    input_index, _ = tree.query(buildings.geometry.buffer(0.1).values, predicate="intersects")
+    intersected = np.bincount(input_index, minlength=len(buildings))
 
-    # calculate free walls
-    for iii in range(len(buildings)):
-        intersected = buildings[buildings.geometry.intersects(buildings.iloc[iii].geometry.buffer(0.1))]
-        if len(intersected) > 1:  # the analyzed building is taken as intersected
-            free_walls = 4 - (len(intersected) - 1)
-            buildings.loc[iii, 'free_walls'] = free_walls
+    # add field "free walls"
+    buildings['free_walls'] = np.where(intersected > 1, 4 - (intersected - 1), 4)
 
 
 def calculate_lat_lon(buildings: gpd.GeoDataFrame):
@@ -239,20 +333,30 @@ def calculate_lat_lon(buildings: gpd.GeoDataFrame):
 
 def calculate_distance2hp(buildings: gpd.GeoDataFrame, default_value: int | float = 0,
                           path_to_heat_plant_file: str | None = None,
-                          position_index_of_heat_plant: int = 0):
+                          position_index_of_heat_plant: int | None = 0,
+                          heat_plant_id_field: str | None = None):
     """
     Adds field "dist2hp" with the distance between building and heat plant.
 
     This can be done via the location of the heat plant (see shapefile) or if there is a user-defined distance in the
     field "user_dist_to_heat_source", this is used. If no heat plant is given and the field "user_dist_to_heat_source"
     does not exist or is empty, the default value is used.
-    The heat plant location is given in a shapefile.
+    The heat plant location is given in a shapefile. The distances are calculated in meters in EPSG:32632, independent
+    of the CRS of the buildings.
+
+    If the shapefile contains several candidate heat plants and position_index_of_heat_plant is None, the distance to
+    the nearest heat plant is used and the ID of this heat plant is added in the field "hp_id". The nearest heat plant
+    is found with a spatial index on the heat plants, so that no distance matrix of all buildings and heat plants is
+    built.
 
     :param buildings: GeoDataFrame containing buildings.
     :param default_value: Default distance to be used if the heat plant file or the specified index in it does not exist.
         Default: 0.
     :param path_to_heat_plant_file: Path to the shapefile containing the heat plant. If None, the default value is used.
-    :param position_index_of_heat_plant: Index of the heat plant in the shapefile. Default: 0
+    :param position_index_of_heat_plant: Index of the heat plant in the shapefile. If None, the nearest of all heat
+        plants in the shapefile is used. Default: 0
+    :param heat_plant_id_field: Field in the shapefile with the ID of the heat plants, that is written to the field
+        "hp_id". If None, the index of the heat plants in the shapefile is used. Default: None
     """
 
     if path_to_heat_plant_file is None:
@@ -266,15 +370,63 @@ def calculate_distance2hp(buildings: gpd.GeoDataFrame, default_value: int | floa
     hp = gpd.read_file(path_to_heat_plant_file)
     hp.to_crs(epsg=32632, inplace=True)
 
+    if position_index_of_heat_plant is None:
+        calculate_distance_to_nearest_heat_plant(buildings, hp, default_value, heat_plant_id_field)
+        return
+
     try:
         # chose heat plant by numeric index
         hp = hp.iloc[position_index_of_heat_plant].geometry
         # calculate distance of buildings centroid to heat plant and add field "dist2hp"
-        buildings['dist2hp'] = buildings.centroid.distance(hp)
+        buildings['dist2hp'] = _centroids_in_meters(buildings).distance(hp)
     except IndexError:
         buildings['dist2hp'] = default_value
 
 
+def _centroids_in_meters(buildings: gpd.GeoDataFrame) -> gpd.GeoSeries:
+    """
+    Returns the centroids of the buildings in EPSG:32632, so that distances are in meters.
+
+    :param buildings: GeoDataFrame containing buildings.
+    :return: The centroids in EPSG:32632.
+    """
+    if buildings.crs is not None and buildings.crs.to_epsg() == 32632:
+        return buildings.centroid
+    return buildings.geometry.to_crs(epsg=32632).centroid
+
+
+def calculate_distance_to_nearest_heat_plant(buildings: gpd.GeoDataFrame, heat_plants: gpd.GeoDataFrame,
+                                             default_value: int | float = 0, heat_plant_id_field: str | None = None):
+    """
+    Adds the fields "dist2hp" with the distance between the building centroid and the nearest heat plant and "hp_id"
+    with the ID of that heat plant.
+
+    The heat plants are put into a spatial index (STRtree) that is queried for the nearest heat plant of all building
+    centroids at once. The distances are calculated in EPSG:32632, both GeoDataFrames are reprojected if necessary.
+
+    :param buildings: GeoDataFrame containing buildings.
+    :param heat_plants: GeoDataFrame containing the candidate heat plants.
+    :param default_value: Default distance for buildings without heat plant, e.g. if there are no heat plants.
+        Default: 0.
+    :param heat_plant_id_field: Field of heat_plants with the ID of the heat plants. If None, the index of heat_plants is
+        used. Default: None
+    """
+    dist2hp = np.full(len(buildings), default_value, dtype=float)
+    hp_id = np.full(len(buildings), None, dtype=object)
+
+    if len(heat_plants) > 0:
+        heat_plant_ids = (heat_plants[heat_plant_id_field] if heat_plant_id_field is not None
+                          else heat_plants.index).to_numpy()
+        tree = shapely.STRtree(heat_plants.geometry.to_crs(epsg=32632).values)
+        (building_index, heat_plant_index), distances = tree.query_nearest(_centroids_in_meters(buildings).values,
+                                                                           return_distance=True, all_matches=False)
+        dist2hp[building_index] = distances
+        hp_id[building_index] = heat_plant_ids[heat_plant_index]
+
+    buildings['dist2hp'] = dist2hp
+    buildings['hp_id'] = hp_id
+
+
 def calculate_construction(buildings: gpd.GeoDataFrame):
     """
     Adds field "construction" with the construction year of the building or renames it if there already exists a field
@@ -405,14 +557,39 @@ def initialize_ref_level(buildings: gpd.GeoDataFrame, feature_name: str, default
         buildings[f"ref_level_{feature_name}"] = default_value
 
 
-def calculate_shape_around_buildings(buildings: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+def calculate_shape_around_buildings(buildings: gpd.GeoDataFrame, method: str = "vertices",
+                                     buffer_distance: float = 0.0, concave_ratio: float = 0.3) -> gpd.GeoDataFrame:
     """
     Calculate the shape around buildings in a GeoDataFrame.
 
+    The shape is calculated with one of the following methods:
+        - 'vertices': convex hull of all vertices of the buildings (default). This is the same as the convex hull of the
+          union of the buildings, but does not need to calculate the union.
+        - 'centroids': convex hull of the centroids of the buildings. Use buffer_distance to include the buildings at the
+          border of the area.
+        - 'concave': concave hull of all vertices of the buildings, see :py:func:`shapely.concave_hull`.
+        - 'union': convex hull of the union of all buildings.
+
     :param buildings: A GeoDataFrame containing the buildings.
+    :param method: Method to calculate the shape: 'vertices', 'centroids', 'concave' or 'union'. Default: 'vertices'.
+    :param buffer_distance: Distance in units of the CRS of the buildings to buffer the shape with. Default: 0.0.
+    :param concave_ratio: Ratio between 0 and 1 for the 'concave' method, 1 gives the convex hull. Default: 0.3.
+    :raises ValueError: If the method is unknown.
     :return: The shape around the selected buildings in a GeoDataFrame.
     """
-    building_shapes = buildings.geometry.to_list()
-    selected_area = convex_hull(unary_union(building_shapes))
+    if method == "vertices":
+        selected_area = shapely.convex_hull(shapely.multipoints(shapely.get_coordinates(buildings.geometry.values)))
+    elif method == "centroids":
+        selected_area = shapely.convex_hull(shapely.multipoints(shapely.get_coordinates(buildings.centroid.values)))
+    elif method == "concave":
+        selected_area = shapely.concave_hull(shapely.multipoints(shapely.get_coordinates(buildings.geometry.values)),
+                                             ratio=concave_ratio)
+    elif method == "union":
+        building_shapes = buildings.geometry.to_list()
+        selected_area = shapely.convex_hull(shapely_ops.unary_union(building_shapes))
+    else:
+        raise ValueError("method must be 'vertices', 'centroids', 'concave' or 'union'")
+    if buffer_distance > 0:
+        selected_area = selected_area.buffer(buffer_distance)
     selected_area_df = gpd.GeoDataFrame(geometry=[selected_area], crs=buildings.crs)
     return selected_area_df
@@ -4,21 +4,30 @@ The COP (Coefficient of Performance) is a measure of the performance of a heat p
 The COP is calculated based on the temperature difference between the heat source and the heat sink.
 
 Use this module to:
+    - Compute the COP values of all heat source and sink types at once as NumPy array.
+    - Derive ground and water source temperatures from the ambient temperature.
     - Build the COP heat pump data for a given DataFrame of buildings.
     - Save the COP heat pump data to a CSV file in the :py:const:`acept.acept_constants.TEMP_PATH` directory.
     - Build the COP heat pump air data for a given DataFrame of buildings and save it to a CSV file in the :py:const:`acept.acept_constants.TEMP_PATH` directory.
 
 Use the :py:func:`acept.cop_profiles.build_cop_tve_profiles_csv` function to build the COP heat pump data for a given
-DataFrame of buildings and save it to a CSV file in the :py:const:`acept.acept_constants.TEMP_PATH` directory.
+DataFrame of buildings and save it to a CSV file in the artifact store, see :py:mod:`acept.artifact_store`.
 """
 
+from __future__ import annotations
+
+import hashlib
 import os
 
 import numpy as np
-import pandas as pd
 
 from acept import acept_utils
 from acept.acept_constants import TEMP_PATH
+from acept.artifact_store import ArtifactStore, artifact_key, get_artifact_store
+from acept.instrumentation import span
+from acept.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
 
 COP_PARAMS = {'air': [6.0801, -0.0941, 0.0005], 'ground': [10.288, -0.2084, 0.0012], 'water': [9.9696, -0.2049, 0.0012]}
 """
@@ -38,6 +47,35 @@ COP parameters for air, ground, water.
 CORRECTION = 0.85
 """Correction factor for the COP values."""
 
+COP_SOURCE_TYPES = ('air', 'ground', 'water')
+"""Heat source types in the order of the first axis of :py:func:`compute_cop_array`."""
+
+COP_SINK_TYPES = ('radiator', 'floor', 'water_small', 'water_large')
+"""Heat sink types in the order of the last axis of :py:func:`compute_cop_array`."""
+
+COP_POLYNOMIALS = np.array([COP_PARAMS[heat_source_type][::-1] for heat_source_type in COP_SOURCE_TYPES])
+"""COP parameters as :py:func:`numpy.polyval` coefficients (highest power first), one row per heat source type."""
+
+GROUND_TEMPERATURE_DAMPING = 0.4
+"""Ratio between the amplitude of the ground temperature and the amplitude of the smoothed ambient temperature."""
+
+GROUND_TEMPERATURE_LAG_HOURS = 30 * 24
+"""Delay of the ground temperature behind the smoothed ambient temperature in hours."""
+
+GROUND_TEMPERATURE_SMOOTHING_HOURS = 30 * 24
+"""Length of the moving average window applied to the ambient temperature for the ground temperature in hours."""
+
+WATER_TEMPERATURE_SMOOTHING_HOURS = 7 * 24
+"""Length of the moving average window applied to the ambient temperature for the water temperature in hours."""
+
+WATER_TEMPERATURE_MIN = 2.0
+"""Minimum water temperature in degrees Celsius, the water source does not freeze."""
+
+_SOURCE_TEMPERATURE_CACHE: dict[str, np.ndarray] = {}
+_SOURCE_TEMPERATURE_CACHE_SIZE = 32
+
+_COP_TVE_BLOCK_SIZE = 64
+
 
 def compute_sink_temperature_from_source_temperature(source_temperature: pd.Series) -> pd.DataFrame:
     """
@@ -68,6 +106,126 @@ def cop_calc(delta_temp: float, heat_source_type: str = 'air') -> float:
         COP_PARAMS[heat_source_type][2] * delta_temp ** 2
 
 
+def _circular_moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Centered moving average of a yearly profile that wraps around the end of the year.
+
+    :param values: The profile values.
+    :param window: The length of the window in time steps.
+    :return: The smoothed profile with the same length as values.
+    """
+    window = max(1, min(int(window), len(values)))
+    before = window // 2
+    after = window - before - 1
+    padded = np.concatenate([values[len(values) - before:], values, values[:after]])
+    cumulative_sum = np.concatenate([[0.0], np.cumsum(padded)])
+    return (cumulative_sum[window:] - cumulative_sum[:-window]) / window
+
+
+def compute_ground_temperature(ambient_temperature: np.ndarray | pd.Series,
+                               damping: float = GROUND_TEMPERATURE_DAMPING,
+                               lag_hours: int = GROUND_TEMPERATURE_LAG_HOURS,
+                               smoothing_hours: int = GROUND_TEMPERATURE_SMOOTHING_HOURS) -> np.ndarray:
+    """
+    Compute a ground temperature profile from the ambient temperature profile.
+
+    The ground temperature follows the smoothed ambient temperature around its annual mean, with a damped amplitude and
+    a time lag. The profile is treated as a full year that repeats, so the lag wraps around the end of the year.
+
+    :param ambient_temperature: The hourly ambient temperature profile in degrees Celsius.
+    :param damping: Ratio between the ground and the smoothed ambient temperature amplitude.
+        Defaults to :py:const:`GROUND_TEMPERATURE_DAMPING`.
+    :param lag_hours: Delay of the ground temperature in hours. Defaults to :py:const:`GROUND_TEMPERATURE_LAG_HOURS`.
+    :param smoothing_hours: Length of the moving average window in hours.
+        Defaults to :py:const:`GROUND_TEMPERATURE_SMOOTHING_HOURS`.
+    :return: The ground temperature profile in degrees Celsius.
+    """
+    ambient = np.asarray(ambient_temperature, dtype=np.float64)
+    mean_temperature = ambient.mean()
+    smoothed = _circular_moving_average(ambient, smoothing_hours)
+    return mean_temperature + damping * (np.roll(smoothed, lag_hours) - mean_temperature)
+
+
+def compute_water_temperature(ambient_temperature: np.ndarray | pd.Series,
+                              smoothing_hours: int = WATER_TEMPERATURE_SMOOTHING_HOURS,
+                              min_temperature: float = WATER_TEMPERATURE_MIN) -> np.ndarray:
+    """
+    Compute a water temperature profile from the ambient temperature profile.
+
+    The water temperature is the moving average of the ambient temperature, limited to a minimum temperature.
+
+    :param ambient_temperature: The hourly ambient temperature profile in degrees Celsius.
+    :param smoothing_hours: Length of the moving average window in hours.
+        Defaults to :py:const:`WATER_TEMPERATURE_SMOOTHING_HOURS`.
+    :param min_temperature: The minimum water temperature in degrees Celsius.
+        Defaults to :py:const:`WATER_TEMPERATURE_MIN`.
+    :return: The water temperature profile in degrees Celsius.
+    """
+    ambient = np.asarray(ambient_temperature, dtype=np.float64)
+    return np.maximum(_circular_moving_average(ambient, smoothing_hours), min_temperature)
+
+
+def compute_source_temperatures(ambient_temperature: np.ndarray | pd.Series) -> np.ndarray:
+    """
+    Compute the source temperature profiles of all heat source types from the ambient temperature profile.
+
+    The result is cached per ambient temperature profile, so the profiles of an area are computed only once.
+
+    :param ambient_temperature: The hourly ambient temperature profile in degrees Celsius.
+    :return: Read-only array of shape (len(:py:const:`COP_SOURCE_TYPES`), hours) with the air, ground and water
+        temperature profiles.
+    """
+    ambient = np.ascontiguousarray(ambient_temperature, dtype=np.float64)
+    key = hashlib.sha1(ambient.tobytes()).hexdigest()
+    source_temperatures = _SOURCE_TEMPERATURE_CACHE.get(key)
+    if source_temperatures is None:
+        source_temperatures = np.vstack([ambient, compute_ground_temperature(ambient),
+                                         compute_water_temperature(ambient)])
+        source_temperatures.setflags(write=False)
+        if len(_SOURCE_TEMPERATURE_CACHE) >= _SOURCE_TEMPERATURE_CACHE_SIZE:
+            _SOURCE_TEMPERATURE_CACHE.pop(next(iter(_SOURCE_TEMPERATURE_CACHE)))
+        _SOURCE_TEMPERATURE_CACHE[key] = source_temperatures
+    return source_temperatures
+
+
+def compute_cop_array(source_temperature: np.ndarray | pd.Series, cap_value: int | None = None,
+                      heat_source_types: tuple[str, ...] = COP_SOURCE_TYPES, dtype=np.float32) -> np.ndarray:
+    """
+    Compute the COP (Coefficient of Performance) values for several heat source types and all heat sink types at once.
+
+    The sink temperatures and temperature differences are the same as in :py:func:`build_cop_df`, the COP polynomials
+    of all heat source types are evaluated on the whole array with :py:func:`numpy.polyval`.
+
+    :param source_temperature: The source temperature data, either one profile of length hours used for all heat source
+        types, or an array of shape (len(heat_source_types), hours) with one profile per heat source type.
+    :param cap_value: The minimum delta temperature. If set, smaller delta temperature values are raised to this value.
+        Defaults to None.
+    :param heat_source_types: The heat source types to calculate the COP for. Defaults to
+        :py:const:`COP_SOURCE_TYPES`.
+    :param dtype: The data type of the returned array. Defaults to np.float32.
+    :raises KeyError: If a heat source type is unknown.
+    :return: The COP values as array of shape (len(heat_source_types), hours, len(:py:const:`COP_SINK_TYPES`)).
+    """
+    source_positions = [COP_SOURCE_TYPES.index(heat_source_type) if heat_source_type in COP_SOURCE_TYPES else -1
+                        for heat_source_type in heat_source_types]
+    if -1 in source_positions:
+        raise KeyError(f"Unknown heat source type in {heat_source_types}, use one of {COP_SOURCE_TYPES}")
+
+    source = np.asarray(source_temperature, dtype=np.float64)
+    source = np.broadcast_to(source, (len(heat_source_types), source.shape[-1]))[:, :, np.newaxis]
+    # sink temperatures in the order of COP_SINK_TYPES: radiator, floor, water small and large buildings
+    sink = np.concatenate([40 - source, 30 - source / 2,
+                           np.full_like(source, 50), np.full_like(source, 60)], axis=2)
+    delta_temperature = sink - source
+    if cap_value is not None:
+        delta_temperature = np.maximum(delta_temperature, cap_value)
+
+    coefficients = COP_POLYNOMIALS[source_positions].T[:, :, np.newaxis, np.newaxis]
+    cop = np.polyval(coefficients, delta_temperature)
+    cop *= CORRECTION
+    return cop.astype(dtype, copy=False)
+
+
 def build_cop_df(source_temperature: pd.Series, cap_value: int | None = None,
                  heat_source_type: str = 'air') -> pd.DataFrame:
     """
@@ -85,18 +243,42 @@ def build_cop_df(source_temperature: pd.Series, cap_value: int | None = None,
         Defaults to 'air'.
     :return: The COP DataFrame with the calculated COP values.
     """
-    sink_temperature = compute_sink_temperature_from_source_temperature(source_temperature)
-
-    delta_temperature = (sink_temperature.T - source_temperature).T
-    # cap the delta temperature if cap_value is set
-    if cap_value is not None:
-        delta_temperature[delta_temperature < cap_value] = cap_value
-
-    cop = delta_temperature.apply(lambda x: cop_calc(x, heat_source_type)) * CORRECTION
+    cop_values = compute_cop_array(source_temperature, cap_value, (heat_source_type,), dtype=np.float64)[0]
+    cop = pd.DataFrame(cop_values, index=source_temperature.index, columns=list(COP_SINK_TYPES))
     cop.index.name = 't'
     return cop
 
 
+def _fill_from_neighbouring_hours(profiles: np.ndarray) -> np.ndarray:
+    """
+    Fills the nan values of each profile with the next valid value of the profile, or the previous valid value if
+    there is no next one. Same as ``bfill`` followed by ``ffill`` of a DataFrame with the profiles as columns.
+
+    :param profiles: C-contiguous 2D array with one profile per row.
+    :return: The filled array.
+    """
+    missing = np.isnan(profiles)
+    # flat index of each valid value and flat index + size of each nan value. The minimum from the end of each profile
+    # is the index of the next valid value, or the own index + size for nan values without a next valid value
+    index_dtype = np.int32 if 2 * profiles.size < np.iinfo(np.int32).max else np.int64
+    next_valid = missing * index_dtype(profiles.size)
+    next_valid += np.arange(profiles.size, dtype=index_dtype).reshape(profiles.shape)
+    next_valid = np.minimum.accumulate(next_valid[:, ::-1], axis=1)[:, ::-1]
+    # the indices + size wrap around to the nan values themselves
+    filled = np.take(profiles.ravel(), next_valid, mode='wrap')
+
+    # the nan values at the end of a profile are filled with the last valid value, profiles without any valid value stay
+    # nan
+    trailing_rows = np.flatnonzero(missing[:, -1])
+    if len(trailing_rows) > 0:
+        trailing_profiles = filled[trailing_rows]
+        last_valid = profiles.shape[1] - 1 - np.argmax(~missing[trailing_rows, ::-1], axis=1)
+        last_values = trailing_profiles[np.arange(len(trailing_rows)), last_valid]
+        filled[trailing_rows] = np.where(np.arange(profiles.shape[1]) > last_valid[:, np.newaxis],
+                                         last_values[:, np.newaxis], trailing_profiles)
+    return filled
+
+
 def calculate_cop_tve(cop_df: pd.DataFrame, buildings: pd.DataFrame, space_heat: pd.DataFrame,
                       water_heat: pd.DataFrame) -> pd.DataFrame:
     """
@@ -110,43 +292,67 @@ def calculate_cop_tve(cop_df: pd.DataFrame, buildings: pd.DataFrame, space_heat:
     :type space_heat: pd.DataFrame
     :param water_heat: A DataFrame containing the water heating values for each building.
     :type water_heat: pd.DataFrame
-    :return: A DataFrame containing the calculated COP profiles for the buildings.
+    :raises KeyError: If there is no space or water heating demand column for a building.
+    :raises ValueError: If the COP and demand data do not have the same number of time steps.
+    :return: A DataFrame containing the calculated COP profiles for the buildings. Hours without any demand are filled
+        with the COP of the neighbouring hours.
     """
 
     # Determine heating type based on building Zensus/BBD year class:
-    # if year class >6, floor. otherwise radiator.
-    buildings['heating'] = np.where(buildings['year_class'] > 6, 'floor', 'radiator')
-
-    cop_tve = pd.DataFrame()
-
-    for bid in buildings.bid:
-        # get the building type and heating type values
-        building_type = buildings.loc[buildings['bid'] == bid]['building_type'].values[0]
-        heating_type = buildings.loc[buildings['bid'] == bid]['heating'].values[0]
-        space_heat_value = space_heat[f"bid_{bid}"]
-        water_heat_value = water_heat[f"bid_{bid}"]
-
-        if building_type in ['SFH', 'TH']:
-            cop_water = cop_df['water_small']
-        else:
-            cop_water = cop_df['water_large']
-        cop_space = cop_df[heating_type]
-        try:
-            cop_tve[f"bid_{bid}"] = (cop_space * space_heat_value + cop_water * water_heat_value) / (
-                    space_heat_value + water_heat_value)
-        except ZeroDivisionError:
-            print(f"Zero division error for bid {bid}.")
-            # cop_tve[f"bid_{bid}"] = 0
-
-    cop_tve = cop_tve.bfill(axis=0).ffill(axis=0)
-    return cop_tve
+    # if year class >6, floor. otherwise radiator, also for buildings without a known year class.
+    buildings['heating'] = np.where(buildings['year_class'].gt(6).fillna(False).to_numpy(bool), 'floor', 'radiator')
+
+    columns = pd.Index([f"bid_{bid}" for bid in buildings['bid']])
+    space_positions = space_heat.columns.get_indexer(columns)
+    water_positions = water_heat.columns.get_indexer(columns)
+    missing = columns[(space_positions < 0) | (water_positions < 0)]
+    if len(missing) > 0:
+        raise KeyError(f"No heat demand for {', '.join(missing[:5])}{' ...' if len(missing) > 5 else ''}")
+    if not len(cop_df) == len(space_heat) == len(water_heat):
+        raise ValueError("cop_df, space_heat and water_heat must have the same number of time steps")
+
+    # the demand keeps its dtype (float32 for UHP results), so the COP profiles are computed in the same precision
+    dtype = np.result_type(*space_heat.dtypes, *water_heat.dtypes, np.float32)
+    # one COP profile per row in the order radiator, floor, water_small, water_large
+    cop_profiles = cop_df[['radiator', 'floor', 'water_small', 'water_large']].to_numpy(dtype=dtype).T.copy()
+    space_cop_positions = np.where(buildings['heating'].to_numpy() == 'floor', 1, 0)
+    water_cop_positions = np.where(buildings['building_type'].isin(['SFH', 'TH']).to_numpy(), 2, 3)
+    space_heat_values = space_heat.to_numpy(dtype=dtype, copy=False)
+    water_heat_values = water_heat.to_numpy(dtype=dtype, copy=False)
+
+    cop_tve_profiles = np.empty((len(columns), len(space_heat)), dtype=dtype)
+    # the buildings with the same space heating and water COP are processed together in blocks, so that the COPs are a
+    # single profile and the intermediate arrays fit into the CPU cache
+    cop_groups = space_cop_positions * len(cop_profiles) + water_cop_positions
+    for cop_group in np.unique(cop_groups):
+        group_positions = np.flatnonzero(cop_groups == cop_group)
+        space_cop, water_cop = np.divmod(cop_group, len(cop_profiles))
+        for start in range(0, len(group_positions), _COP_TVE_BLOCK_SIZE):
+            block = group_positions[start:start + _COP_TVE_BLOCK_SIZE]
+            # the buildings are processed as rows, so that the time steps of a building are contiguous
+            weighted_cop = np.ascontiguousarray(space_heat_values[:, space_positions[block]].T)
+            water_heat_block = np.ascontiguousarray(water_heat_values[:, water_positions[block]].T)
+            total_heat = weighted_cop + water_heat_block
+            # weighted_cop = cop_space * space_heat + cop_water * water_heat, computed in place
+            weighted_cop *= cop_profiles[space_cop]
+            weighted_cop += np.multiply(water_heat_block, cop_profiles[water_cop], out=water_heat_block)
+            # hours without any demand have no defined COP (0 / 0 is nan for the non-negative demands), they are filled
+            # from the neighbouring hours
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cop_tve_block = np.divide(weighted_cop, total_heat, out=total_heat)
+            missing_rows = np.flatnonzero(np.isnan(cop_tve_block).any(axis=1))
+            if len(missing_rows) > 0:
+                cop_tve_block[missing_rows] = _fill_from_neighbouring_hours(cop_tve_block[missing_rows])
+            cop_tve_profiles[block] = cop_tve_block
+
+    return pd.DataFrame(cop_tve_profiles.T, index=space_heat.index, columns=columns, copy=False)
 
 
 def build_cop_tve_profiles(buildings: pd.DataFrame, space_heat: pd.DataFrame, water_heat: pd.DataFrame,
                            source_temperature: pd.Series, cap_value: int | None = None,
-                           heat_source_type: str = 'air') -> pd.DataFrame:
+                           heat_source_type: str = 'air', source_temperature_is_ambient: bool = True) -> pd.DataFrame:
     """
-    Builds the COP (Coefficient of Performance) heat pump air data for the given buildings.
+    Builds the COP (Coefficient of Performance) heat pump data for the given buildings.
 
     :param buildings: The GeoDataFrame containing the buildings.
     :type buildings: gpd.GeoDataFrame
@@ -161,20 +367,65 @@ def build_cop_tve_profiles(buildings: pd.DataFrame, space_heat: pd.DataFrame, wa
     :type cap_value: int | None, optional
     :param heat_source_type: The type of heat source being used. Defaults to 'air'.
     :type heat_source_type: str, optional
-    :return: DataFrame with the COP heat pump air data.
+    :param source_temperature_is_ambient: If True, source_temperature is the ambient temperature and the temperature
+        of the heat source is derived from it with :py:func:`compute_source_temperatures`. Set to False if
+        source_temperature already is the temperature of the heat source. Defaults to True.
+    :type source_temperature_is_ambient: bool, optional
+    :return: DataFrame with the COP heat pump data.
     """
-    print(f"Building COP heat pump air profiles for {len(buildings)} buildings.")
+    print(f"Building COP heat pump {heat_source_type} profiles for {len(buildings)} buildings.")
+    if source_temperature_is_ambient and heat_source_type != 'air':
+        source_temperatures = compute_source_temperatures(source_temperature)
+        source_temperature = pd.Series(source_temperatures[COP_SOURCE_TYPES.index(heat_source_type)],
+                                       index=source_temperature.index)
     cop_df = build_cop_df(source_temperature, cap_value, heat_source_type)
     cop_tve = calculate_cop_tve(cop_df, buildings, space_heat, water_heat)
     return cop_tve
 
 
+def build_cop_tve_profiles_for_all_source_types(buildings: pd.DataFrame, space_heat: pd.DataFrame,
+                                                water_heat: pd.DataFrame, ambient_temperature: pd.Series,
+                                                cap_value: int | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Builds the COP (Coefficient of Performance) heat pump data of all heat source types for the given buildings.
+
+    The air, ground and water temperatures are derived from the ambient temperature with
+    :py:func:`compute_source_temperatures` and the COP values of all heat source types are computed at once.
+
+    :param buildings: The GeoDataFrame containing the buildings.
+    :type buildings: gpd.GeoDataFrame
+    :param space_heat: The DataFrame containing the space heating values.
+    :type space_heat: pd.DataFrame
+    :param water_heat: The DataFrame containing the water heating values.
+    :type water_heat: pd.DataFrame
+    :param ambient_temperature: The ambient temperature data.
+    :type ambient_temperature: pd.Series
+    :param cap_value: The maximum allowed temperature difference between the heat source and the heat sink. If None,
+        the difference is not capped. Defaults to None.
+    :type cap_value: int | None, optional
+    :return: Dictionary with the heat source types from :py:const:`COP_SOURCE_TYPES` as keys and DataFrames with the
+        COP heat pump data as values.
+    """
+    print(f"Building COP heat pump {', '.join(COP_SOURCE_TYPES)} profiles for {len(buildings)} buildings.")
+    source_temperatures = compute_source_temperatures(ambient_temperature)
+    cop_values = compute_cop_array(source_temperatures, cap_value, COP_SOURCE_TYPES, dtype=np.float64)
+    cop_tve_profiles = {}
+    for heat_source_type, cop_values_of_type in zip(COP_SOURCE_TYPES, cop_values):
+        cop_df = pd.DataFrame(cop_values_of_type, index=ambient_temperature.index, columns=list(COP_SINK_TYPES))
+        cop_df.index.name = 't'
+        cop_tve_profiles[heat_source_type] = calculate_cop_tve(cop_df, buildings, space_heat, water_heat)
+    return cop_tve_profiles
+
+
 def build_cop_tve_profiles_csv(area_id: str, buildings: pd.DataFrame, space_heat: pd.DataFrame,
                                water_heat: pd.DataFrame, source_temperature: pd.Series, cap_value: int | None = None,
-                               heat_source_type: str = 'air') -> tuple[pd.DataFrame, str]:
+                               heat_source_type: str = 'air', source_temperature_is_ambient: bool = True,
+                               store: ArtifactStore | None = None) -> tuple[pd.DataFrame, str]:
     """
     Builds the COP (Coefficient of Performance) heat pump air data for the given buildings and saves it to a CSV file
-    in the: py:const:`acept.acept_constants.TEMP_PATH` directory.
+    in the artifact store (see :py:mod:`acept.artifact_store`) with the reference
+    ``heatpump_{heat_source_type}_{area_id}``. If the data was already built for the same inputs, the stored data is
+    used.
 
     :param area_id: The ID of the area COP data belongs to.
     :type area_id: str
@@ -191,10 +442,33 @@ def build_cop_tve_profiles_csv(area_id: str, buildings: pd.DataFrame, space_heat
     :type cap_value: int | None, optional
     :param heat_source_type: The type of heat source being used. Defaults to 'air'.
     :type heat_source_type: str, optional
+    :param source_temperature_is_ambient: If True, source_temperature is the ambient temperature and the temperature
+        of the heat source is derived from it. Defaults to True.
+    :type source_temperature_is_ambient: bool, optional
+    :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
+    :type store: ArtifactStore | None, optional
     :return: A tuple containing the COP heat pump air data and the path to the saved CSV file.
     """
-    cop_tve = build_cop_tve_profiles(buildings, space_heat, water_heat, source_temperature, cap_value, heat_source_type)
-    return cop_tve, save_heapump_air_to_csv(area_id, cop_tve)
+    if store is None:
+        store = get_artifact_store()
+    key = artifact_key("build_cop_tve_profiles_csv", area_id=str(area_id),
+                       buildings=buildings[['bid', 'year_class', 'building_type']], space_heat=space_heat,
+                       water_heat=water_heat, source_temperature=source_temperature, cap_value=cap_value,
+                       heat_source_type=heat_source_type, source_temperature_is_ambient=source_temperature_is_ambient)
+    file_name = f"heatpump_{heat_source_type}_{area_id}.csv"
+    stored_csv = store.lookup_file(key, file_name)
+    if stored_csv is not None:
+        return pd.read_csv(stored_csv, sep=","), stored_csv
+
+    span_attributes = {"builder": "cop", "area": str(area_id), "heat_source_type": heat_source_type}
+    with span("model", **span_attributes):
+        cop_tve = build_cop_tve_profiles(buildings, space_heat, water_heat, source_temperature, cap_value,
+                                         heat_source_type, source_temperature_is_ambient)
+    with span("write", **span_attributes), store.write(key) as tmp_entry_dir:
+        cop_tve.to_csv(os.path.join(tmp_entry_dir, file_name), mode='w', sep=",", index=False, header=True)
+    store.set_reference(f"heatpump_{heat_source_type}_{area_id}", key)
+    store.collect_garbage()
+    return cop_tve, os.path.join(store.entry_path(key), file_name)
 
 
 def save_heapump_air_to_csv(area_id: str, cop_tve_df: pd.DataFrame) -> str:
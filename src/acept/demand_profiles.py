@@ -1,43 +1,585 @@
 """Module for building demand profiles.
 
-Use this module to create demand profiles for the selected area and buildings using UrbanHeatPro.
+Use this module to create demand profiles for the selected area and buildings using UrbanHeatPro, or for many areas
+in parallel with :py:func:`run_uhp_for_multiple_regions`.
 
 This module is the interface to the UrbanHeatPro project (https://github.com/VeraKowalczuk/UrbanHeatPro) that is a
 dependency for the ACEPT project and is integrated to the ACEPT project as a submodule in /deps/UrbanHeatPro.
 
 """
+
+from __future__ import annotations
+
 import glob
 import os
+import shutil
+import tempfile
+import time
+import traceback
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 
-import geopandas as gpd
-import pandas as pd
+import numpy as np
 
-import UrbanHeatPro
 from acept.acept_constants import UHP_PATH, TEMP_PATH, UHP_SETTINGS_PATH
-from acept.acept_utils import copy_file_or_directory_recursively, rename_files_in_directory, \
-    delete_files_or_directory_recursively_with_pattern, combine_csv_profiles_with_pattern, \
+from acept.acept_utils import copy_file_or_directory_recursively, link_or_copy_file, link_files_in_directory, \
+    collect_csv_profile_columns_with_pattern, sum_csv_profile_columns_with_pattern, \
     get_bid_from_uhp_building_specific_files
+from acept.artifact_store import ArtifactStore, artifact_key, file_digest, get_artifact_store
 from acept.buildings_information import calculate_shape_around_buildings
-from acept.temperature_profiles import build_temperature_profile_for_tmy_for_shape
-from acept.uhp_csv_io import prepare_buildings_for_uhp_csv, read_uhp_csv_to_dataframe
+from acept.instrumentation import span
+from acept.lazy_imports import lazy_import
+from acept.temperature_profiles import build_temperature_profile_for_year, \
+    compute_temperature_profile_for_tmy_for_shape, find_typical_days, lookup_temperature_profile_for_year, \
+    read_temperature_profile, save_temperature_profile, typical_day_hours, HOURS_PER_DAY
+from acept.uhp_csv_io import prepare_buildings_for_uhp_csv, read_uhp_csv_to_dataframe, save_buildings_to_temp_uhp_csv, \
+    write_geopandas_to_uhp_csv, UHP_BUILDING_COLUMNS
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+yaml = lazy_import("yaml")
+UrbanHeatPro = lazy_import("UrbanHeatPro")
+
+
+def demand_cache_key(buildings_csv: str, temperature_profile: str | pd.Series,
+                     settings_file: str = UHP_SETTINGS_PATH, number_of_typical_days: int | None = None) -> str:
+    """
+    Calculates the key of demand profiles in the artifact store from the content of the UrbanHeatPro input files.
+
+    :param buildings_csv: Path to the buildings CSV file in the UHP format.
+    :param temperature_profile: Path to the temperature profile in the UHP format, or the temperature profile as
+        Series. A profile given as Series is compared by its values.
+    :param settings_file: Path to the UrbanHeatPro settings file.
+        Defaults to :py:const:`acept.acept_constants.UHP_SETTINGS_PATH`.
+    :param number_of_typical_days: The number of simulated typical days, None if all days are simulated.
+    :return: The key of the demand profiles, see :py:func:`acept.artifact_store.artifact_key`.
+    """
+    if isinstance(temperature_profile, str):
+        temperature_digest = file_digest(temperature_profile)
+    else:
+        temperature_digest = np.asarray(temperature_profile, dtype=np.float64)
+    return artifact_key("run_uhp", buildings=file_digest(buildings_csv), temperature_profile=temperature_digest,
+                        settings=file_digest(settings_file), number_of_typical_days=number_of_typical_days)
+
+
+def load_demand_from_cache(cache_key: str,
+                           store: ArtifactStore | None = None) -> dict[str, str | pd.DataFrame] | None:
+    """
+    Loads demand profiles created with UrbanHeatPro from the artifact store.
+
+    :param cache_key: The key of the demand profiles, see :py:func:`demand_cache_key`.
+    :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
+    :return: A dictionary with the space heating and water heating demand in W (``space_heating_df``,
+        ``water_heating_df``) and the path to the stored updated buildings CSV file (``csv_updated_buildings``),
+        or None if the demand profiles are not in the store.
+    """
+    if store is None:
+        store = get_artifact_store()
+    demand_file = store.lookup_file(cache_key, "demand.npz")
+    if demand_file is None:
+        return None
+    with np.load(demand_file, allow_pickle=False) as demand:
+        header = demand["header"].tolist()
+        space_heating_df = pd.DataFrame(demand["space_heating"], columns=header)
+        water_heating_df = pd.DataFrame(demand["water_heating"], columns=header)
+    print("Using stored demand profiles", cache_key)
+    return {"space_heating_df": space_heating_df, "water_heating_df": water_heating_df,
+            "csv_updated_buildings": os.path.join(store.entry_path(cache_key), "updated_buildings.csv")}
+
+
+def save_demand_to_cache(cache_key: str, space_heating_df: pd.DataFrame, water_heating_df: pd.DataFrame,
+                         csv_updated_buildings: str, store: ArtifactStore | None = None,
+                         size_limit: int | None = None):
+    """
+    Saves demand profiles created with UrbanHeatPro to the artifact store and removes the least recently used artifacts
+    if the store exceeds the size limit.
+
+    :param cache_key: The key of the demand profiles, see :py:func:`demand_cache_key`.
+    :param space_heating_df: The space heating demand in W.
+    :param water_heating_df: The water heating demand in W, with the same columns as space_heating_df.
+    :param csv_updated_buildings: Path to the updated buildings CSV file of the UrbanHeatPro run.
+    :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
+    :param size_limit: Maximum size of the artifact store in bytes. Defaults to the size limit of the store.
+    """
+    if store is None:
+        store = get_artifact_store()
+    with store.write(cache_key) as tmp_entry_dir:
+        np.savez(os.path.join(tmp_entry_dir, "demand.npz"),
+                 space_heating=space_heating_df.to_numpy(dtype=np.float32),
+                 water_heating=water_heating_df.to_numpy(dtype=np.float32),
+                 header=np.array(space_heating_df.columns, dtype=str))
+        shutil.copy(csv_updated_buildings, os.path.join(tmp_entry_dir, "updated_buildings.csv"))
+    store.collect_garbage(size_limit)
+
+
+ARCHETYPE_COLUMNS = ['use', 'free_walls', 'year_class', 'size_class', 'floors', 'ref_level_roof', 'ref_level_wall',
+                     'ref_level_floor', 'ref_level_window']
+"""UHP building fields that are equal for all buildings of an archetype, see :py:func:`find_building_archetypes`."""
+
+
+def find_building_archetypes(buildings: pd.DataFrame, area_tolerance: float = 0.1,
+                             representatives_per_archetype: int = 1,
+                             archetype_columns: list[str] = None) -> pd.DataFrame:
+    """
+    Groups buildings with the same UHP inputs into archetypes and selects the buildings to simulate for each archetype.
+
+    Buildings belong to the same archetype if all archetype columns are equal and their areas differ by at most about
+    the area tolerance (the areas are grouped in logarithmic classes of width ``1 + area_tolerance``).
+    Each archetype is split into up to ``representatives_per_archetype`` groups of members, alternating by area, and the
+    member with the median area of each group is its representative. Using more than one representative spreads the
+    random components of the UrbanHeatPro simulation over the members of an archetype.
+
+    :param buildings: The buildings with the UHP fields, see
+        :py:func:`acept.buildings_information.calculate_missing_uhp_building_fields`.
+    :param area_tolerance: Relative area tolerance within an archetype. If 0, only buildings with exactly the same area
+        belong to the same archetype. Defaults to 0.1.
+    :param representatives_per_archetype: Maximum number of buildings to simulate per archetype. Defaults to 1.
+    :param archetype_columns: Columns that have to be equal within an archetype. Columns that are not in buildings are
+        ignored. Defaults to :py:const:`ARCHETYPE_COLUMNS`.
+    :raises ValueError: If area_tolerance is negative or representatives_per_archetype is smaller than 1.
+    :return: A DataFrame with the same index as buildings and the columns ``bid``, ``archetype``,
+        ``representative_bid`` (bid of the simulated building of the member) and ``scale`` (area of the member divided
+        by the area of its representative).
+    """
+    if area_tolerance < 0:
+        raise ValueError("area_tolerance must not be negative")
+    if representatives_per_archetype < 1:
+        raise ValueError("representatives_per_archetype must be at least 1")
+    if archetype_columns is None:
+        archetype_columns = ARCHETYPE_COLUMNS
+    archetype_columns = [column for column in archetype_columns if column in buildings.columns]
+
+    area = buildings['area'].to_numpy(dtype=np.float64)
+    if area_tolerance > 0:
+        area_class = np.floor(np.log(np.maximum(area, 1e-6)) / np.log1p(area_tolerance))
+    else:
+        area_class = area
+    archetype_keys = buildings[archetype_columns].reset_index(drop=True)
+    archetype_keys['area_class'] = area_class
+    archetype = archetype_keys.groupby(archetype_columns + ['area_class'], dropna=False, sort=False).ngroup()
+    archetype = archetype.to_numpy()
+
+    # rank of each building by area within its archetype, members are assigned to representatives alternately
+    order = np.lexsort((area, archetype))
+    _, group_starts, group_sizes = np.unique(archetype[order], return_index=True, return_counts=True)
+    rank = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+    group = archetype[order].astype(np.int64) * representatives_per_archetype + rank % representatives_per_archetype
+
+    # the member with the median area of each group is the representative
+    group_order = np.argsort(group, kind="stable")
+    _, group_starts, group_sizes = np.unique(group[group_order], return_index=True, return_counts=True)
+    representative_positions = order[group_order[group_starts + group_sizes // 2]]
+    representative = np.empty(len(order), dtype=np.int64)
+    representative[order[group_order]] = np.repeat(representative_positions, group_sizes)
+
+    representative_area = area[representative]
+    scale = np.divide(area, representative_area, out=np.ones_like(area), where=representative_area > 0)
+    bid = buildings['bid'].to_numpy()
+    return pd.DataFrame({'bid': bid, 'archetype': archetype, 'representative_bid': bid[representative],
+                         'scale': scale}, index=buildings.index)
+
+
+def expand_archetype_demand(demand_df: pd.DataFrame, archetypes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expands the demand profiles of the simulated representatives to all buildings of their archetypes.
+
+    The demand of each building is the demand of its representative scaled by the ratio of their areas.
+
+    :param demand_df: The demand profiles of the representatives with the columns ``bid_{representative_bid}``.
+    :param archetypes: The archetypes of the buildings, see :py:func:`find_building_archetypes`.
+    :return: The demand profiles of all buildings with the columns ``bid_{bid}`` sorted by bid.
+    """
+    archetypes = archetypes.sort_values('bid')
+    positions = demand_df.columns.get_indexer([f"bid_{bid}" for bid in archetypes['representative_bid']])
+    values = demand_df.to_numpy()[:, positions] * archetypes['scale'].to_numpy(dtype=demand_df.to_numpy().dtype)
+    return pd.DataFrame(values, index=demand_df.index, columns=[f"bid_{bid}" for bid in archetypes['bid']])
+
+
+def expand_archetype_buildings(updated_buildings_df: pd.DataFrame, buildings: pd.DataFrame,
+                               archetypes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expands the updated buildings table of the simulated representatives to all buildings of their archetypes.
+
+    Each building gets the row of its representative, with its own values for the UHP building fields
+    (:py:const:`acept.uhp_csv_io.UHP_BUILDING_COLUMNS`) that are in both tables.
+
+    :param updated_buildings_df: The updated buildings table of the UrbanHeatPro run of the representatives.
+    :param buildings: The buildings with the UHP fields of all buildings.
+    :param archetypes: The archetypes of the buildings, see :py:func:`find_building_archetypes`.
+    :return: The updated buildings table for all buildings sorted by bid.
+    """
+    archetypes = archetypes.sort_values('bid')
+    expanded = updated_buildings_df.set_index('bid', drop=False).loc[archetypes['representative_bid']]
+    expanded = expanded.reset_index(drop=True)
+    own_columns = [column for column in UHP_BUILDING_COLUMNS if column in expanded.columns and column in buildings]
+    own_values = buildings.set_index('bid', drop=False).loc[archetypes['bid'], own_columns].reset_index(drop=True)
+    expanded[own_columns] = own_values.to_numpy()
+    return expanded
+
+
+def prepare_uhp_workspace(plz_or_region: int | str, buildings_csv: str, temperature_profile: str | pd.Series,
+                          settings_file: str = UHP_SETTINGS_PATH,
+                          typical_days: np.ndarray = None) -> dict[str, str | list[str]]:
+    """
+    Prepares an isolated workspace for a single UrbanHeatPro run.
+
+    UrbanHeatPro reads its input data from the ``input`` directory of the UrbanHeatPro project. The input files of the
+    run are linked there (hardlinks, or symlinks/copies as fallback) under a run ID that is unique for the run
+    (``{plz_or_region}_{random suffix}``), so that runs for the same or different regions do not overwrite each other's
+    inputs. The settings file is copied and the results are written to a temporary directory in the
+    :py:const:`acept.acept_constants.TEMP_PATH` directory that belongs to this run only.
+
+    If typical days are given, only the hours of these days of the temperature and radiation profiles are staged, and
+    the copied settings are changed to simulate these days only (see :py:func:`typical_day_settings`).
+
+    Use :py:func:`clean_up_uhp_workspace` to remove the workspace after the run.
+
+    :param plz_or_region: PLZ or Region of the run (area ID).
+    :param buildings_csv: Path to the buildings CSV file in the UHP format.
+    :param temperature_profile: Path to the temperature profile in the UHP format, or the temperature profile as Series
+        (see :py:func:`acept.temperature_profiles.compute_temperature_profile_for_year`), which is written to the
+        UrbanHeatPro input directory directly.
+    :param settings_file: Path to the UrbanHeatPro settings file.
+        Defaults to :py:const:`acept.acept_constants.UHP_SETTINGS_PATH`.
+    :param typical_days: Optional days of the year (starting at 0) to simulate, see
+        :py:func:`acept.temperature_profiles.find_typical_days`. If None, the whole profile is simulated.
+    :return: A dictionary with the run ID (``run_id``), the paths to the workspace directory (``workspace``),
+        the settings file (``settings_file``) and the result directory (``result_dir``) of the run, and the list of
+        input paths staged in the UrbanHeatPro input directory (``staged_paths``).
+    """
+    run_id = f"{plz_or_region}_{uuid.uuid4().hex[:8]}"
+    os.makedirs(TEMP_PATH, exist_ok=True)
+    workspace = tempfile.mkdtemp(prefix=f"uhp_{run_id}_", dir=TEMP_PATH)
+    staged_paths = []
+    try:
+        result_dir = os.path.join(workspace, "results")
+        os.makedirs(result_dir)
+        workspace_settings_file = os.path.join(workspace, os.path.basename(settings_file))
+        if typical_days is None:
+            shutil.copy(settings_file, workspace_settings_file)
+        else:
+            with open(settings_file, "r") as f:
+                settings = yaml.safe_load(f)
+            _update_nested_dict(settings, typical_day_settings(len(typical_days)))
+            with open(workspace_settings_file, "w") as f:
+                yaml.safe_dump(settings, f, sort_keys=False)
+
+        # the input files are linked instead of copied, see acept_utils.link_or_copy_file
+        # UHP/input/Regional Data/DE/*_DE.csv -> UHP/input/Regional Data/{run_id}/*_{run_id}.csv
+        regional_data_dir = os.path.join(UHP_PATH, "input", "Regional Data", run_id)
+        staged_paths.append(regional_data_dir)
+        link_files_in_directory(os.path.join(UHP_PATH, "input", "Regional Data", "DE"), regional_data_dir, "_DE",
+                                f"_{run_id}")
+        # /temperature profile -> UHP/input/Regional Data/{run_id}/Tamb_{run_id}.csv
+        staged_temperature_profile = os.path.join(regional_data_dir, f"Tamb_{run_id}.csv")
+        if not isinstance(temperature_profile, str):
+            _write_temperature_profile(temperature_profile, staged_temperature_profile, typical_days)
+        elif typical_days is None:
+            link_or_copy_file(temperature_profile, staged_temperature_profile)
+        else:
+            _write_typical_day_profile(temperature_profile, staged_temperature_profile, typical_days)
+        if typical_days is not None:
+            _write_typical_day_profile(os.path.join(UHP_PATH, "input", "Regional Data", "DE", "I_DE.csv"),
+                                       os.path.join(regional_data_dir, f"I_{run_id}.csv"), typical_days)
+        # /temp/buildingsXYZ.csv -> /input/Buildings/buildings_{run_id}.csv
+        staged_paths.append(os.path.join(UHP_PATH, "input", "Buildings", f"buildings_{run_id}.csv"))
+        link_or_copy_file(buildings_csv, staged_paths[-1])
+    except Exception:
+        clean_up_uhp_workspace({"run_id": run_id, "workspace": workspace, "staged_paths": staged_paths})
+        raise
+
+    return {"run_id": run_id, "workspace": workspace, "settings_file": workspace_settings_file,
+            "result_dir": result_dir, "staged_paths": staged_paths}
+
+
+def typical_day_settings(number_of_typical_days: int) -> dict:
+    """
+    Changes of the UrbanHeatPro settings to simulate only typical days.
+
+    The typical days are simulated one after another as a profile of ``number_of_typical_days`` days. Since the days
+    are no longer in calendar order, workdays/weekends and the monthly space heating probability are not used.
+
+    :param number_of_typical_days: The number of typical days.
+    :return: The changed settings as nested dictionary.
+    """
+    return {"simulation": {"general": {"offset": 0, "length": number_of_typical_days * HOURS_PER_DAY,
+                                       "number_of_typ_days": number_of_typical_days}},
+            "space_heating_demand": {"flags": {"_workday_weekend": False, "_monthly_sh_prob": False}}}
+
+
+def _update_nested_dict(target: dict, changes: dict):
+    """
+    Updates a nested dictionary in place with the values of another nested dictionary.
+    """
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _update_nested_dict(target[key], value)
+        else:
+            target[key] = value
+
+
+def _write_typical_day_profile(src_path: str, dst_path: str, typical_days: np.ndarray):
+    """
+    Writes the hours of the typical days of an hourly profile in the UHP format (header and unit row) to a new file.
+
+    Profiles that do not have hourly values for all typical days are linked unchanged.
+
+    :param src_path: Path of the hourly profile.
+    :param dst_path: Destination path. An existing file or link is replaced, the file it links to is not changed.
+    :param typical_days: Days of the year (starting at 0) to keep.
+    """
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    profile_df, unit_info = read_uhp_csv_to_dataframe(src_path, header_row=0, additional_info=1, sep=";")
+    hours = typical_day_hours(typical_days)
+    if len(profile_df) <= hours.max():
+        print(f"{src_path} has no hourly values for all typical days and is used unchanged")
+        link_or_copy_file(src_path, dst_path)
+        return
+    write_geopandas_to_uhp_csv(dst_path, profile_df.iloc[hours], profile_df.columns.to_list(), unit_info)
+
+
+def _write_temperature_profile(temperature_profile: pd.Series, dst_path: str, typical_days: np.ndarray = None):
+    """
+    Writes a temperature profile given as Series in the UHP format to a new file, optionally only the hours of the
+    typical days.
+
+    :param temperature_profile: The hourly temperature profile.
+    :param dst_path: Destination path. An existing file or link is replaced, the file it links to is not changed.
+    :param typical_days: Optional days of the year (starting at 0) to keep.
+    """
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    if typical_days is not None:
+        hours = typical_day_hours(typical_days)
+        if len(temperature_profile) <= hours.max():
+            print("The temperature profile has no hourly values for all typical days and is used unchanged")
+        else:
+            temperature_profile = temperature_profile.iloc[hours]
+    save_temperature_profile(temperature_profile, dst_path)
+
+
+def expand_typical_day_demand(demand_df: pd.DataFrame, day_to_typical_day: np.ndarray) -> pd.DataFrame:
+    """
+    Expands the demand profiles of the simulated typical days to all days of the year.
+
+    :param demand_df: The hourly demand profiles of the typical days, simulated one after another.
+    :param day_to_typical_day: For each day of the year the position of its typical day, see
+        :py:func:`acept.temperature_profiles.find_typical_days`.
+    :return: The hourly demand profiles of all days.
+    """
+    hours = typical_day_hours(day_to_typical_day)
+    return pd.DataFrame(demand_df.to_numpy()[hours], columns=demand_df.columns)
+
+
+def typical_day_demand_error(full_demand_df: pd.DataFrame, typical_day_demand_df: pd.DataFrame) -> dict[str, float]:
+    """
+    Error of demand profiles created from typical days compared to the demand profiles of a full simulation.
+
+    The errors are calculated for the total demand of all buildings.
+
+    :param full_demand_df: The demand profiles of the full simulation.
+    :param typical_day_demand_df: The demand profiles expanded from the typical days, see
+        :py:func:`expand_typical_day_demand`, with the same number of hours as full_demand_df. The profiles are summed,
+        so either of them can also be the total demand only.
+    :return: A dictionary with the relative error of the annual energy (``energy_error``), the relative error of the
+        peak (``peak_error``) and the root mean square error of the hourly total demand relative to its mean
+        (``normalized_rmse``).
+    """
+    full_total = np.nan_to_num(full_demand_df.to_numpy(dtype=np.float64)).sum(axis=1)
+    typical_day_total = np.nan_to_num(typical_day_demand_df.to_numpy(dtype=np.float64)).sum(axis=1)
+    mean_demand = full_total.mean()
+    return {"energy_error": float((typical_day_total.sum() - full_total.sum()) / full_total.sum()),
+            "peak_error": float((typical_day_total.max() - full_total.max()) / full_total.max()),
+            "normalized_rmse": float(np.sqrt(((typical_day_total - full_total) ** 2).mean()) / mean_demand)}
+
+
+def clean_up_uhp_workspace(uhp_workspace: dict[str, str]):
+    """
+    Removes the input files and the workspace directory of a single UrbanHeatPro run.
+
+    Only the files of the run prepared with :py:func:`prepare_uhp_workspace` are removed, the inputs and results of
+    other runs are not touched.
+
+    :param uhp_workspace: The workspace dictionary returned by :py:func:`prepare_uhp_workspace`.
+    """
+    print("\nCleaning up input files for UrbanHeatPro")
+    for staged_path in uhp_workspace["staged_paths"]:
+        if os.path.isdir(staged_path) and not os.path.islink(staged_path):
+            shutil.rmtree(staged_path, ignore_errors=True)
+        elif os.path.lexists(staged_path):
+            os.remove(staged_path)
+    shutil.rmtree(uhp_workspace["workspace"], ignore_errors=True)
+
+
+def aggregate_demand(demand_df: pd.DataFrame, archetypes: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Sums the demand profiles of all buildings.
+
+    :param demand_df: The demand profiles with the columns ``bid_{bid}``.
+    :param archetypes: Optional archetypes of the buildings, see :py:func:`find_building_archetypes`. If given,
+        demand_df contains the profiles of the representatives and each is weighted with the scaled areas of the members
+        of its archetype.
+    :return: The total demand profile as column ``total``.
+    """
+    values = np.nan_to_num(demand_df.to_numpy(dtype=np.float64))
+    if archetypes is None:
+        total = values.sum(axis=1)
+    else:
+        weights = archetypes.groupby('representative_bid')['scale'].sum()
+        total = values @ weights.reindex([int(column.removeprefix("bid_")) for column in demand_df.columns],
+                                         fill_value=0).to_numpy()
+    return pd.DataFrame({"total": total}, index=demand_df.index)
+
+
+def summarize_total_demand(total_demand_df: pd.DataFrame) -> dict[str, float | int]:
+    """
+    Summary statistics of a total demand profile.
+
+    :param total_demand_df: The total demand profile as column ``total`` with hourly resolution.
+    :return: A dictionary with the ``energy`` (sum over all hours), the ``peak`` and the time step of the peak
+        (``peak_time_step``).
+    """
+    total = total_demand_df["total"].to_numpy()
+    return {"energy": float(total.sum()), "peak": float(total.max()) if len(total) else 0.0,
+            "peak_time_step": int(total.argmax()) if len(total) else 0}
+
+
+def _run_uhp_in_workspace(plz_or_region: str, buildings: gpd.GeoDataFrame, buildings_csv: str,
+                          temperature_profile: str | pd.Series, settings_file: str, csv_updated_buildings_out: str,
+                          aggregate_only: bool = False, weights: list[float] = None,
+                          typical_days: np.ndarray = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Runs UrbanHeatPro in an isolated workspace and collects the results.
+
+    :param plz_or_region: PLZ or Region of the run (area ID).
+    :param buildings: GeoDataFrame of the selected buildings.
+    :param buildings_csv: Path to the buildings CSV file in the UHP format.
+    :param temperature_profile: Path to the temperature profile in the UHP format, or the temperature profile as Series.
+    :param settings_file: Path to the UrbanHeatPro settings file.
+    :param csv_updated_buildings_out: Path to copy the updated buildings CSV file of the run to.
+    :param aggregate_only: If True, only the total demand of all buildings is collected. Defaults to False.
+    :param weights: Optional weights of the buildings sorted by bid for the total demand if aggregate_only is True.
+    :param typical_days: Optional days of the year to simulate, see :py:func:`prepare_uhp_workspace`.
+    :return: The space heating and water heating demand in W, per building or as column ``total`` if aggregate_only is
+        True.
+    """
+    span_attributes = {"builder": "demand", "area": plz_or_region, "buildings": len(buildings)}
+    with span("preprocess", **span_attributes):
+        uhp_workspace = prepare_uhp_workspace(plz_or_region, buildings_csv, temperature_profile, settings_file,
+                                              typical_days)
+    run_id = uhp_workspace["run_id"]
+    uhp_result_dir = uhp_workspace["result_dir"]
+    try:
+        with span("model", **span_attributes):
+            UrbanHeatPro.run_uhp(run_id, simulation_name=run_id, settings_file=uhp_workspace["settings_file"],
+                                 result_dir=uhp_result_dir)
+
+        # get latest uhp result directory of this run
+        uhp_result_dirs_list = [os.path.join(uhp_result_dir, d) for d in os.listdir(uhp_result_dir) if
+                                os.path.isdir(os.path.join(uhp_result_dir, d)) and f"{run_id}_" in d]
+        latest_result_dir = max(uhp_result_dirs_list, key=os.path.getmtime)
+
+        # Extract space heating and water heating demand from results
+        pattern = os.path.join("**", "Buildings", "HeatDemand_*.csv")
+        with span("read", **span_attributes):
+            if aggregate_only:
+                # sum up the building files without keeping the profiles of the single buildings
+                heating_totals = sum_csv_profile_columns_with_pattern(latest_result_dir, pattern,
+                                                                      ["SpaceHeatingD_W", "HotWaterD_W"], weights,
+                                                                      get_bid_from_uhp_building_specific_files,
+                                                                      skip_rows=0)
+                space_heating_df = pd.DataFrame({"total": heating_totals["SpaceHeatingD_W"]})
+                water_heating_df = pd.DataFrame({"total": heating_totals["HotWaterD_W"]})
+            else:
+                header = sorted(buildings["bid"].to_list())
+                header = [f"bid_{x}" for x in header]
+                # read every building file once for both demand columns
+                heating_dfs = collect_csv_profile_columns_with_pattern(latest_result_dir, pattern,
+                                                                       ["SpaceHeatingD_W", "HotWaterD_W"], header,
+                                                                       get_bid_from_uhp_building_specific_files,
+                                                                       skip_rows=0)
+                space_heating_df = heating_dfs["SpaceHeatingD_W"]
+                water_heating_df = heating_dfs["HotWaterD_W"]
+
+        # retrieve updated buildings file from the UHP run
+        csv_updated_buildings_file_list = glob.glob(os.path.join(latest_result_dir, "**",
+                                                                 f"SynCity_{run_id}_*.csv"))
+        if len(csv_updated_buildings_file_list) > 0:
+            csv_updated_buildings_file_list.sort()
+            csv_updated_buildings_file = csv_updated_buildings_file_list[-1]
+        else:
+            # if no SynCity csv file was generated, use the original buildings csv
+            csv_updated_buildings_file = buildings_csv
+
+        # copy updated buildings file out of the workspace
+        copy_file_or_directory_recursively(csv_updated_buildings_file, csv_updated_buildings_out)
+    finally:
+        # clean up after session: remove the input files and the workspace with all results of this run
+        clean_up_uhp_workspace(uhp_workspace)
+
+    return space_heating_df, water_heating_df
 
 
 def run_uhp_for_selected_buildings_year(plz_or_region: int | str, buildings: gpd.GeoDataFrame = None,
-                                        year: int | None = 2011, temperature_profile: str = None,
-                                        demand_unit: str = 'W') -> dict[
-    str, str | pd.DataFrame]:
+                                        year: int | None = 2011, temperature_profile: str | pd.Series = None,
+                                        demand_unit: str = 'W', settings_file: str = UHP_SETTINGS_PATH,
+                                        use_cache: bool = False, cache_size_limit: int | None = None,
+                                        deduplicate_archetypes: bool = False, area_tolerance: float = 0.1,
+                                        representatives_per_archetype: int = 1, aggregate_only: bool = False,
+                                        number_of_typical_days: int | None = None,
+                                        validate_typical_days: bool = False) -> dict[
+    str, str | pd.DataFrame | dict]:
     """
     Creates demand profiles for the selected area and buildings using UrbanHeatPro.
 
+    Each call runs UrbanHeatPro in its own workspace (see :py:func:`prepare_uhp_workspace`) and writes its buildings
+    CSV file and its results to a new directory ``PLZ_{plz_or_region}/run_{year}_{random suffix}`` in the
+    :py:const:`acept.acept_constants.TEMP_PATH` directory, so that demand profiles for the same or different regions
+    and years can be created at the same time.
+
     :param plz_or_region: PLZ or Region for which the demand profile should be created (area ID).
     :param buildings: GeoDataFrame of the selected buildings.
     :param year: Year for which the demand profile should be created. Defaults to 2011. If None, the temperature profile
         for the typical meterological year (TMY) will be used.
-    :param temperature_profile: Path to the temperature profile. If None, the temperature profile is expected at the
-        default location according to the year and plz_or_region.
+    :param temperature_profile: Path to the temperature profile, or the temperature profile as Series, e.g. from
+        :py:func:`acept.temperature_profiles.compute_temperature_profile_for_year`. A Series is written to the input
+        directory of UrbanHeatPro directly. If None, the temperature profile of the year and plz_or_region in the
+        artifact store is used (see :py:func:`acept.temperature_profiles.lookup_temperature_profile_for_year`), and
+        created with :py:func:`acept.temperature_profiles.build_temperature_profile_for_year` if it is not stored yet.
     :param demand_unit: Unit of the demand. Defaults to 'W'. Valid values are 'W', 'Wh', 'kW', 'kWh', 'MW', and 'MWh'.
         As the timeseries have hourly resolution, the values of 'W' and 'Wh' are equivalent.
+    :param settings_file: Path to the UrbanHeatPro settings file.
+        Defaults to :py:const:`acept.acept_constants.UHP_SETTINGS_PATH`.
+    :param use_cache: If True, the demand profiles are loaded from the artifact store (see
+        :py:mod:`acept.artifact_store`) if the same buildings, temperature profile and settings were simulated before,
+        and new results are saved to the store. Defaults to False.
+    :param cache_size_limit: Maximum size of the artifact store in bytes, the least recently used artifacts are removed
+        first. Defaults to :py:const:`acept.artifact_store.ARTIFACT_STORE_SIZE_LIMIT`.
+    :param deduplicate_archetypes: If True, the buildings are grouped into archetypes with
+        :py:func:`find_building_archetypes`, only the representatives of the archetypes are simulated and their demand
+        is scaled by area to the other buildings. Defaults to False.
+    :param area_tolerance: Relative area tolerance within an archetype if deduplicate_archetypes is True.
+        Defaults to 0.1.
+    :param representatives_per_archetype: Maximum number of simulated buildings per archetype if
+        deduplicate_archetypes is True. Defaults to 1.
+    :param aggregate_only: If True, only the total demand of all buildings is created: the results of the buildings are
+        summed up while they are read, and the dataframes contain the single column ``total``. New results are not
+        saved to the artifact store in this mode. Defaults to False.
+    :param number_of_typical_days: If set, the days of the temperature profile are clustered into this number of
+        typical days with :py:func:`acept.temperature_profiles.find_typical_days`. UrbanHeatPro simulates only the
+        typical days and the results are expanded to the whole year. Defaults to None, all days are simulated.
+    :param validate_typical_days: If True and number_of_typical_days is set, UrbanHeatPro is also run for all days and
+        the error of the total demand from the typical days against this full run is reported, see
+        :py:func:`typical_day_demand_error`. The full run takes as long as a run without typical days.
+        Defaults to False.
     :return: A dictionary containing the paths to the demand profiles and the dataframes containing the profiles.
+        If aggregate_only is True, it also contains the summary statistics of the total demand (``summary``), see
+        :py:func:`summarize_total_demand`. If number_of_typical_days is set, it also contains the typical days
+        (``typical_days``) with the simulated ``days``, the ``day_to_typical_day`` map and the root mean square error
+        of the temperature profile built from the typical days (``temperature_rmse``), and with validate_typical_days
+        the errors of the ``space_heating`` and ``water_heating`` demand against the full run (``demand_error``).
     """
     if demand_unit not in ['W', 'Wh', 'kW', 'kWh', 'MW', 'MWh']:
         raise ValueError("Invalid demand_unit. Valid values are 'W', 'Wh', 'kW', 'kWh', 'MW', and 'MWh'.")
@@ -46,74 +588,113 @@ def run_uhp_for_selected_buildings_year(plz_or_region: int | str, buildings: gpd
     print("Selected region: ", plz_or_region, "for UrbanHeatPro")
     print("Setting up the input data for UrbanHeatPro")
 
-    buildings_csv = prepare_buildings_for_uhp_csv(plz_or_region, buildings, debug=True)
+    # the files of this call are kept apart from other calls for the same area
+    area_dir = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}")
+    os.makedirs(area_dir, exist_ok=True)
+    output_dir = tempfile.mkdtemp(prefix=f"run_{year if year is not None else 'tmy'}_", dir=area_dir)
+    buildings_csv = prepare_buildings_for_uhp_csv(plz_or_region, buildings, debug=True,
+                                                  file_path=os.path.join(output_dir, f"buildings_{plz_or_region}.csv"))
+
+    # simulate only the representatives of the building archetypes
+    archetypes = None
+    simulated_buildings = buildings
+    if deduplicate_archetypes:
+        archetypes = find_building_archetypes(buildings, area_tolerance, representatives_per_archetype)
+        simulated_buildings = buildings[buildings['bid'].isin(archetypes['representative_bid'])]
+        print(f"Simulating {len(simulated_buildings)} representatives of {archetypes['archetype'].nunique()} "
+              f"archetypes for {len(buildings)} buildings")
+        buildings_csv = save_buildings_to_temp_uhp_csv(plz_or_region, simulated_buildings, "All", debug=True,
+                                                       file_path=buildings_csv)
 
     if temperature_profile is None:
         if year is None:
             selected_shape = calculate_shape_around_buildings(buildings)
-            temperature_profile = build_temperature_profile_for_tmy_for_shape(plz_or_region, selected_shape, debug=True)
+            temperature_profile = compute_temperature_profile_for_tmy_for_shape(plz_or_region, selected_shape,
+                                                                                debug=True)
         else:
-            temperature_profile = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}", f"DWD_TRY_{plz_or_region}_{year}.csv")
-
-    path_mapping = {
-        # UHP/input/Regional Data/DE -> UHP/input/Regional Data/{plz}
-        os.path.join(UHP_PATH, "input", "Regional Data", "DE"):
-            os.path.join(UHP_PATH, "input", "Regional Data", plz_or_region),
-        # /temp/buildingsXYZ.csv -> /input/Buildings/buildings_{plz}.csv
-        buildings_csv:
-            os.path.join(UHP_PATH, "input", "Buildings", f"buildings_{plz_or_region}.csv"),
-        # /temperature profile -> UHP/input/Regional Data/{plz}/Tamb_{plz}.csv
-        temperature_profile:
-            os.path.join(UHP_PATH, "input", "Regional Data", plz_or_region, f"Tamb_{plz_or_region}.csv")
-    }
-    for src, dest in path_mapping.items():
-        copy_file_or_directory_recursively(src, dest)
-    rename_files_in_directory(os.path.join(UHP_PATH, "input", "Regional Data", plz_or_region), "_DE",
-                              f"_{plz_or_region}")
-
-    uhp_result_dir = os.path.join(UHP_PATH, "results")
-
-    UrbanHeatPro.run_uhp(plz_or_region, settings_file=UHP_SETTINGS_PATH, result_dir=uhp_result_dir)
-
-    # clean up after session
-    # remove input files
-    print("\nCleaning up input files for UrbanHeatPro")
-    delete_files_or_directory_recursively_with_pattern(os.path.join(UHP_PATH, "input", "**"), f"*{plz_or_region}*")
-
-    # get latest uhp result directory for the selected plz/region
-    uhp_result_dirs_list = [os.path.join(uhp_result_dir, d) for d in os.listdir(uhp_result_dir) if
-                            os.path.isdir(os.path.join(uhp_result_dir, d)) and f"{plz_or_region}_" in d]
-    latest_result_dir = max(uhp_result_dirs_list, key=os.path.getmtime)
-
-    # Extract space heating and water heating demand from results
-    pattern = os.path.join("**", "Buildings", "HeatDemand_*.csv")
-    csv_space_heating = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}", f"space_heat_{plz_or_region}.csv")
-    header = sorted(buildings["bid"].to_list())
-    header = [f"bid_{x}" for x in header]
-    space_heating_df = combine_csv_profiles_with_pattern(latest_result_dir, pattern, csv_space_heating, header,
-                                                         get_bid_from_uhp_building_specific_files, skip_rows=0,
-                                                         column_name="SpaceHeatingD_W")
-    csv_water_heating = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}", f"water_heat_{plz_or_region}.csv")
-    water_heating_df = combine_csv_profiles_with_pattern(latest_result_dir, pattern, csv_water_heating, header,
-                                                         get_bid_from_uhp_building_specific_files, skip_rows=0,
-                                                         column_name="HotWaterD_W")
-
-    # retrieve updated buildings file from the UHP run
-    csv_updated_buildings_file_list = glob.glob(os.path.join(latest_result_dir, "**",
-                                                             f"SynCity_{plz_or_region}_*.csv"))
-    if len(csv_updated_buildings_file_list) > 0:
-        csv_updated_buildings_file_list.sort()
-        csv_updated_buildings_file = csv_updated_buildings_file_list[-1]
+            temperature_profile = lookup_temperature_profile_for_year(plz_or_region, year)
+            if temperature_profile is None:
+                selected_shape = calculate_shape_around_buildings(buildings)
+                temperature_profile = build_temperature_profile_for_year(plz_or_region, selected_shape, year,
+                                                                         debug=True)
+
+    demand_suffix = "_total" if aggregate_only else ""
+    csv_space_heating = os.path.join(output_dir, f"space_heat{demand_suffix}_{plz_or_region}.csv")
+    csv_water_heating = os.path.join(output_dir, f"water_heat{demand_suffix}_{plz_or_region}.csv")
+    csv_updated_buildings_out = os.path.join(output_dir, f"updated_buildings_{plz_or_region}.csv")
+
+    # the path is kept to clean up a temporary temperature profile after it has been read
+    temperature_profile_path = temperature_profile if isinstance(temperature_profile, str) else None
+    typical_days = None
+    if number_of_typical_days is not None:
+        if isinstance(temperature_profile, str):
+            temperature_profile = read_temperature_profile(temperature_profile)
+        temperature = temperature_profile.to_numpy(dtype=np.float64)
+        days, day_to_typical_day = find_typical_days(temperature, number_of_typical_days)
+        typical_day_temperature = temperature[typical_day_hours(days)][typical_day_hours(day_to_typical_day)]
+        temperature_rmse = np.sqrt(((typical_day_temperature - temperature[:len(typical_day_temperature)]) ** 2).mean())
+        typical_days = {"days": days, "day_to_typical_day": day_to_typical_day,
+                        "temperature_rmse": float(temperature_rmse)}
+        print(f"Simulating {number_of_typical_days} typical days, temperature RMSE {temperature_rmse:.2f} K")
+
+    cache_key = demand_cache_key(buildings_csv, temperature_profile, settings_file,
+                                 number_of_typical_days) if use_cache else None
+    cached_demand = load_demand_from_cache(cache_key) if use_cache else None
+    weights = None
+    if archetypes is not None:
+        # weights of the representatives sorted by bid like the UHP result files
+        weights = archetypes.groupby('representative_bid')['scale'].sum().sort_index().to_list()
+    if cached_demand is not None:
+        space_heating_df = cached_demand["space_heating_df"]
+        water_heating_df = cached_demand["water_heating_df"]
+        copy_file_or_directory_recursively(cached_demand["csv_updated_buildings"], csv_updated_buildings_out)
     else:
-        # if no SynCity csv file was generated, use the original buildings csv
-        csv_updated_buildings_file = buildings_csv
+        space_heating_df, water_heating_df = _run_uhp_in_workspace(plz_or_region, simulated_buildings, buildings_csv,
+                                                                   temperature_profile, settings_file,
+                                                                   csv_updated_buildings_out, aggregate_only,
+                                                                   weights if aggregate_only else None,
+                                                                   typical_days["days"] if typical_days else None)
+        if typical_days is not None:
+            space_heating_df = expand_typical_day_demand(space_heating_df, typical_days["day_to_typical_day"])
+            water_heating_df = expand_typical_day_demand(water_heating_df, typical_days["day_to_typical_day"])
+        if use_cache and not aggregate_only:
+            save_demand_to_cache(cache_key, space_heating_df, water_heating_df, csv_updated_buildings_out,
+                                 size_limit=cache_size_limit)
+
+    # read updated buildings file for the return value
+    updated_buildings_df, updated_buildings_info = read_uhp_csv_to_dataframe(csv_updated_buildings_out, header_row=1,
+                                                                             ignore_index=True, additional_info=0,
+                                                                             sep=";")
+
+    if archetypes is not None and 'bid' in updated_buildings_df.columns:
+        updated_buildings_df = expand_archetype_buildings(updated_buildings_df, buildings, archetypes)
+        column_names = updated_buildings_df.columns.to_list()
+        if len(updated_buildings_info) != len(column_names):
+            updated_buildings_info = column_names
+        write_geopandas_to_uhp_csv(csv_updated_buildings_out, updated_buildings_df, updated_buildings_info,
+                                   column_names)
+
+    if aggregate_only:
+        if cached_demand is not None:
+            # the cache contains the demand of the single (simulated) buildings
+            space_heating_df = aggregate_demand(space_heating_df, archetypes)
+            water_heating_df = aggregate_demand(water_heating_df, archetypes)
+    elif archetypes is not None:
+        space_heating_df = expand_archetype_demand(space_heating_df, archetypes)
+        water_heating_df = expand_archetype_demand(water_heating_df, archetypes)
 
-    # read and copy updated buildings file for the return value
-    updated_buildings_df, _ = read_uhp_csv_to_dataframe(csv_updated_buildings_file, header_row=1, ignore_index=True,
-                                                        additional_info=0, sep=";")
-    csv_updated_buildings_out = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}",
-                                             f"updated_buildings_{plz_or_region}.csv")
-    copy_file_or_directory_recursively(csv_updated_buildings_file, csv_updated_buildings_out)
+    if validate_typical_days and typical_days is not None:
+        # only the total demand of the full run is compared, so its building profiles are not kept
+        csv_full_run_buildings = os.path.join(output_dir, f"updated_buildings_full_run_{plz_or_region}.csv")
+        full_space_heating_df, full_water_heating_df = _run_uhp_in_workspace(plz_or_region, simulated_buildings,
+                                                                             buildings_csv, temperature_profile,
+                                                                             settings_file, csv_full_run_buildings,
+                                                                             True, weights)
+        os.remove(csv_full_run_buildings)
+        typical_days["demand_error"] = {
+            "space_heating": typical_day_demand_error(full_space_heating_df, space_heating_df),
+            "water_heating": typical_day_demand_error(full_water_heating_df, water_heating_df)}
+        print("Demand error of the typical days against the full run:", typical_days["demand_error"])
 
     # convert from W (UHP output) to the desired unit
     if demand_unit in ["kW", "kWh"]:
@@ -123,23 +704,144 @@ def run_uhp_for_selected_buildings_year(plz_or_region: int | str, buildings: gpd
         space_heating_df /= 1000000
         water_heating_df /= 1000000
 
-    # replace NaN with 0 and save to csv again
+    # replace NaN with 0 and save to csv
     space_heating_df.fillna(0, inplace=True)
-    space_heating_df.to_csv(csv_space_heating, index=False)
     water_heating_df.fillna(0, inplace=True)
-    water_heating_df.to_csv(csv_water_heating, index=False)
-
-    # clear uhp_result_dir, all results
-    delete_files_or_directory_recursively_with_pattern(uhp_result_dir, "*")
-
-    # clean up temporary files
-    if temperature_profile.startswith(os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}")):
-        delete_files_or_directory_recursively_with_pattern(os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}"),
-                                                           os.path.basename(temperature_profile))
-    if buildings_csv.startswith(os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}")):
-        delete_files_or_directory_recursively_with_pattern(os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}"),
-                                                           os.path.basename(buildings_csv))
-
-    return {"space_heating_df": space_heating_df, "csv_space_heating": csv_space_heating,
-            "water_heating_df": water_heating_df, "csv_water_heating": csv_water_heating,
-            "updated_buildings_df": updated_buildings_df, "buildings_csv": csv_updated_buildings_out}
+    with span("write", builder="demand", area=plz_or_region, buildings=len(buildings)):
+        space_heating_df.to_csv(csv_space_heating, index=False)
+        water_heating_df.to_csv(csv_water_heating, index=False)
+
+    # clean up temporary files, only the files themselves since other calls use the same names in their directories
+    if temperature_profile_path is not None and temperature_profile_path.startswith(area_dir) and \
+            os.path.isfile(temperature_profile_path):
+        os.remove(temperature_profile_path)
+    os.remove(buildings_csv)
+
+    demand_profiles = {"space_heating_df": space_heating_df, "csv_space_heating": csv_space_heating,
+                       "water_heating_df": water_heating_df, "csv_water_heating": csv_water_heating,
+                       "updated_buildings_df": updated_buildings_df, "buildings_csv": csv_updated_buildings_out}
+    if typical_days is not None:
+        demand_profiles["typical_days"] = typical_days
+    if aggregate_only:
+        demand_profiles["summary"] = {"space_heating": summarize_total_demand(space_heating_df),
+                                      "water_heating": summarize_total_demand(water_heating_df)}
+    return demand_profiles
+
+
+def max_parallel_uhp_runs(settings_file: str = UHP_SETTINGS_PATH) -> int:
+    """
+    Number of UrbanHeatPro runs that can be executed at the same time without oversubscribing the CPU cores.
+
+    Each UrbanHeatPro run uses ``simulation.multi_processing.processes`` processes from the settings file. If this
+    setting is null, UrbanHeatPro uses all available cores and only one run at a time is possible.
+
+    :param settings_file: Path to the UrbanHeatPro settings file.
+        Defaults to :py:const:`acept.acept_constants.UHP_SETTINGS_PATH`.
+    :return: The number of parallel runs, at least 1.
+    """
+    with open(settings_file, "r") as f:
+        settings = yaml.safe_load(f)
+    processes_per_run = (settings.get("simulation", {}).get("multi_processing", {}) or {}).get("processes")
+    cpu_count = os.cpu_count() or 1
+    if not processes_per_run:
+        return 1
+    return max(1, cpu_count // processes_per_run)
+
+
+def _run_uhp_job(area_id: int | str, buildings: gpd.GeoDataFrame, year: int | None, demand_unit: str,
+                 settings_file: str) -> dict:
+    """
+    Runs a single job of :py:func:`run_uhp_for_multiple_regions` and catches its errors.
+
+    :return: A dictionary with the area ID, the year, the duration in seconds and either the result of
+        :py:func:`run_uhp_for_selected_buildings_year` or the error message.
+    """
+    start = time.perf_counter()
+    try:
+        result = run_uhp_for_selected_buildings_year(area_id, buildings, year, demand_unit=demand_unit,
+                                                     settings_file=settings_file)
+        error = None
+    except Exception as e:
+        result = None
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+    return {"area_id": str(area_id), "year": year, "duration": time.perf_counter() - start, "result": result,
+            "error": error}
+
+
+def run_uhp_for_multiple_regions(jobs: list[tuple[int | str, gpd.GeoDataFrame, int | None]],
+                                 max_workers: int | None = None, demand_unit: str = 'W',
+                                 settings_file: str = UHP_SETTINGS_PATH) -> list[dict]:
+    """
+    Creates demand profiles for multiple areas in parallel using UrbanHeatPro.
+
+    The jobs are run with :py:func:`run_uhp_for_selected_buildings_year` in a process pool. Since each UrbanHeatPro run
+    uses multiple processes itself, the size of the pool defaults to :py:func:`max_parallel_uhp_runs`. Jobs for the
+    same area are run one after another in the order of the jobs, jobs for different areas run in parallel.
+    Failing jobs do not stop the other jobs, their errors are reported in the returned list. If a worker process
+    terminates abruptly (e.g. killed because it ran out of memory), the jobs that were running in the pool fail and the
+    pool is recreated for the remaining jobs.
+
+    :param jobs: List of jobs as tuples of (area ID, GeoDataFrame of the selected buildings, year). The year can be
+        None to use the temperature profile for the typical meterological year (TMY).
+    :param max_workers: Maximum number of parallel UrbanHeatPro runs. If None, :py:func:`max_parallel_uhp_runs` is used.
+    :param demand_unit: Unit of the demand. Defaults to 'W'. Valid values are 'W', 'Wh', 'kW', 'kWh', 'MW', and 'MWh'.
+    :param settings_file: Path to the UrbanHeatPro settings file.
+        Defaults to :py:const:`acept.acept_constants.UHP_SETTINGS_PATH`.
+    :return: A list with one dictionary per job in the order of the jobs. Each dictionary contains the ``area_id``,
+        the ``year``, the ``duration`` of the job in seconds, the ``result`` of
+        :py:func:`run_uhp_for_selected_buildings_year` (None if the job failed) and the ``error`` message (None if the
+        job succeeded).
+    """
+    # job indices per area, the next job of an area is submitted when the previous one has finished
+    pending_jobs = {}
+    for i, (area_id, _, _) in enumerate(jobs):
+        pending_jobs.setdefault(str(area_id), []).append(i)
+    if max_workers is None:
+        max_workers = max_parallel_uhp_runs(settings_file)
+    max_workers = max(1, min(max_workers, len(pending_jobs)))
+    print(f"Running UrbanHeatPro for {len(jobs)} jobs in {len(pending_jobs)} areas with {max_workers} parallel runs")
+
+    start = time.perf_counter()
+    job_results = [None] * len(jobs)
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        while pending_jobs or running:
+            running_areas = {area_id for _, area_id, _, _ in running.values()}
+            for area_id in [area_id for area_id in pending_jobs if area_id not in running_areas]:
+                if len(running) >= max_workers:
+                    break
+                i = pending_jobs[area_id].pop(0)
+                if not pending_jobs[area_id]:
+                    del pending_jobs[area_id]
+                job_area_id, buildings, year = jobs[i]
+                future = executor.submit(_run_uhp_job, job_area_id, buildings, year, demand_unit, settings_file)
+                running[future] = (i, area_id, time.perf_counter(), executor)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            pool_broken = False
+            for future in done:
+                i, area_id, job_start, job_executor = running.pop(future)
+                try:
+                    job_result = future.result()
+                except (BrokenProcessPool, CancelledError) as e:
+                    # only a failure of the current pool requires a new one, the other futures of an already replaced
+                    # pool fail or are cancelled as well and are collected in the next iterations
+                    pool_broken = pool_broken or (isinstance(e, BrokenProcessPool) and job_executor is executor)
+                    job_result = {"area_id": area_id, "year": jobs[i][2], "duration": time.perf_counter() - job_start,
+                                  "result": None, "error": f"{type(e).__name__}: {e}"}
+                job_results[i] = job_result
+                status = "failed" if job_result["error"] is not None else "done"
+                print(f"Job {job_result['area_id']} ({job_result['year']}) {status} after "
+                      f"{job_result['duration']:.1f} s")
+            if pool_broken:
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    failed_jobs = [job_result for job_result in job_results if job_result["error"] is not None]
+    print(f"Finished {len(jobs) - len(failed_jobs)} of {len(jobs)} jobs in {time.perf_counter() - start:.1f} s")
+    for job_result in failed_jobs:
+        print(f"Job {job_result['area_id']} ({job_result['year']}) failed: {job_result['error']}")
+    return job_results
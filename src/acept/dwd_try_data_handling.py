@@ -16,21 +16,25 @@ Note:
 
 """
 
+from __future__ import annotations
+
 import bz2
 import gc
 import gzip
 import os
 
-import geopandas as gpd
-import psutil
-import rioxarray
-import xarray as xr
-from tqdm import tqdm
-
 from acept import acept_utils
 from acept.acept_constants import TEMPERATURE_DATA_RAW_PATH, RADIATION_DIRECT_DATA_RAW_PATH, \
     RADIATION_GLOBAL_DATA_RAW_PATH, FED_STATES_PATH, TRY_BAVARIAN_PATH
 from acept.exceptions import ValueOutsideRangeError
+from acept.instrumentation import span
+from acept.lazy_imports import lazy_import
+
+gpd = lazy_import("geopandas")
+rioxarray = lazy_import("rioxarray")
+# rioxarray registers the rio accessor of the xarray Datasets, so it is imported together with xarray
+xr = lazy_import("xarray", companions=("rioxarray",))
+tqdm = lazy_import("tqdm")
 
 DWD_MIN_YEAR = 1995
 """Minimum year of DWD TRY data available to download."""
@@ -184,7 +188,7 @@ def combine_dwd_try_data_and_save(year_start: int = DWD_MIN_YEAR, year_end: int
     if debug:
         print("bavaria_shape.crs:", bavaria_shape.crs)
 
-    for year_spec in tqdm(range(year_start, year_end + 1), desc="Year Loop", leave=True):
+    for year_spec in tqdm.tqdm(range(year_start, year_end + 1), desc="Year Loop", leave=True):
         combine_dwd_try_data_and_save_single_year(bavaria_shape, year_spec, debug, uncompressed_years)
 
 
@@ -205,10 +209,7 @@ def combine_dwd_try_data_and_save_single_year(bavaria_shape: gpd.GeoDataFrame, y
     if year_spec not in DWD_MAX_RANGE or (
             uncompressed_years is not None and not all(x in DWD_MAX_RANGE for x in uncompressed_years)):
         raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
-    for month_spec in tqdm(range(1, 13), desc="Month Loop", leave=True):
-        if debug:
-            print("Free Memory @ Start:", psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-
+    for month_spec in tqdm.tqdm(range(1, 13), desc="Month Loop", leave=True):
         output_path = os.path.join(TRY_BAVARIAN_PATH, f"TRY_{year_spec:04d}{month_spec:02d}.nc.gz")
         if uncompressed_years is not None and year_spec in uncompressed_years:
             output_path = output_path.removesuffix(".gz")
@@ -223,23 +224,25 @@ def combine_dwd_try_data_and_save_single_year(bavaria_shape: gpd.GeoDataFrame, y
         dwd_features = ['temperature', 'rad_direct', 'rad_global']
         try_clipped: xr.Dataset = None
         for try_feature in dwd_features:
-            wd_data = read_dwd_netcdf_file(try_feature, year=year_spec, month=month_spec, debug=debug)
+            span_attributes = {"builder": "combine_dwd_try", "feature": try_feature, "year": year_spec,
+                               "month": month_spec}
+            with span("read", **span_attributes):
+                wd_data = read_dwd_netcdf_file(try_feature, year=year_spec, month=month_spec, debug=debug)
 
-            wd_data = preprocess_dwd_try_dataset(wd_data, try_feature, debug=debug)
+            with span("preprocess", **span_attributes):
+                wd_data = preprocess_dwd_try_dataset(wd_data, try_feature, debug=debug)
 
             # ---------
             # ### Clipping
             # all_touched – If True, all pixels touched by geometries will be burned in.
             # If false, only pixels whose center is within the polygon or that are selected by Bresenham’s line
             # algorithm will be burned in.
-            wd_clipped: xr.Dataset = wd_data.rio.clip(bavaria_shape.geometry.values, bavaria_shape.crs,
-                                                      all_touched=True)
+            with span("clip", **span_attributes):
+                wd_clipped: xr.Dataset = wd_data.rio.clip(bavaria_shape.geometry.values, bavaria_shape.crs,
+                                                          all_touched=True)
 
             # free up memory
             del wd_data
-            if debug:
-                print("Free Memory @ after clipping:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
             # ---------
 
             # collect clipped data in one dataset
@@ -263,23 +266,22 @@ def combine_dwd_try_data_and_save_single_year(bavaria_shape: gpd.GeoDataFrame, y
         if debug:
             print("Saving file...")
 
-        if uncompressed_years is not None and year_spec in uncompressed_years:
-            # write to raw netcdf os.path.join(TRY_BAVARIAN_PATH, f"TRY_{year_spec:04d}{month_spec:02d}.nc")
-            try_clipped.to_netcdf(output_path)
-            if debug:
-                print("uncompressed written to", output_path.removesuffix('.gz'))
-        else:
-            # write to netcdf file and gzip it
-            # output_path: os.path.join(TRY_BAVARIAN_PATH, f"TRY_{year_spec:04d}{month_spec:02d}.nc.gz")
-            with gzip.open(output_path, 'wb') as f:
-                f.write(try_clipped.to_netcdf())
-            if debug:
-                print("written to", output_path)
+        with span("write", builder="combine_dwd_try", year=year_spec, month=month_spec):
+            if uncompressed_years is not None and year_spec in uncompressed_years:
+                # write to raw netcdf os.path.join(TRY_BAVARIAN_PATH, f"TRY_{year_spec:04d}{month_spec:02d}.nc")
+                try_clipped.to_netcdf(output_path)
+                if debug:
+                    print("uncompressed written to", output_path.removesuffix('.gz'))
+            else:
+                # write to netcdf file and gzip it
+                # output_path: os.path.join(TRY_BAVARIAN_PATH, f"TRY_{year_spec:04d}{month_spec:02d}.nc.gz")
+                with gzip.open(output_path, 'wb') as f:
+                    f.write(try_clipped.to_netcdf())
+                if debug:
+                    print("written to", output_path)
 
         del try_clipped
         gc.collect()
-        if debug:
-            print("Free Memory @ End:", psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
 
 
 def check_for_un_compressed_dwd_try_data(compressed=True, year_start: int = DWD_MIN_YEAR,
@@ -0,0 +1,258 @@
+"""Module for building ensembles of weather dependent profiles over several years of DWD TRY data.
+
+Planning under weather uncertainty needs the profiles of the same area for all DWD TRY years. Instead of building the
+profiles year by year with :py:mod:`acept.temperature_profiles` and :py:mod:`acept.pv_cap_factor_profiles`, the
+ensemble is computed in one pass over the weather data:
+
+- the grid cells of the area (the same cells as ``rio.clip`` with ``all_touched=True``) and the grid cells of the
+  buildings are determined once from the grid of the first month,
+- only the bounding box of these grid cells is read from the DWD TRY files, and the temperature and the radiation are
+  read together for both profiles,
+- the PV model runs once per building and year instead of once per building and month.
+
+The hours of all years are aligned: the 29th of February of leap years is dropped, so that each year has
+:py:const:`ENSEMBLE_HOURS` hours starting on the 1st of January at 00:00.
+
+Use this module to:
+    - compute the temperature and PV capacity factor profiles of an area for several years with
+      :py:func:`compute_weather_ensemble`
+    - compute statistics of an ensemble per hour with :py:func:`summarize_ensemble`
+"""
+
+from __future__ import annotations
+
+import gc
+from calendar import monthrange
+
+import numpy as np
+
+from acept.dwd_try_data_handling import DWD_MIN_YEAR, DWD_MAX_YEAR, read_dwd_netcdf_file, \
+    preprocess_dwd_try_dataset, preprocess_combined_dwd_try_dataset
+from acept.exceptions import ValueOutsideRangeError
+from acept.instrumentation import span
+from acept.lazy_imports import lazy_import
+from acept.pv_cap_factor_profiles import calculate_gsee_input_weather_from_raw_weather, run_pv_model
+from acept.temperature_profiles import TEMPERATURE_PROFILE_UNIT
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+# rioxarray registers the rio accessor of the xarray Datasets, so it is imported together with xarray
+xr = lazy_import("xarray", companions=("rioxarray",))
+
+ENSEMBLE_HOURS = 8760
+"""Hours of each year of an ensemble. The 29th of February of leap years is dropped."""
+ENSEMBLE_PERCENTILES = (5, 25, 50, 75, 95)
+"""Default percentiles of the statistics of an ensemble, see :py:func:`summarize_ensemble`."""
+ENSEMBLE_WEATHER_SOURCES = ("try", "combined_try", "combined_try_uncompressed")
+"""DWD TRY data an ensemble can be computed from, see :py:const:`acept.pv_cap_factor_profiles.PV_WEATHER_SOURCES`."""
+
+
+def _area_grid_cells(grid: xr.Dataset, selected_shape: gpd.GeoDataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of the grid cells in the selected area: the same grid cells as selected by ``rio.clip`` with
+    ``all_touched=True`` in :py:mod:`acept.temperature_profiles`.
+
+    :param grid: DWD TRY dataset with the spatial dimensions X and Y.
+    :param selected_shape: GeoDataFrame of the selected area in EPSG:3034.
+    :return: The Y and X positions of the grid cells.
+    """
+    grid_shape = (grid.sizes["Y"], grid.sizes["X"])
+    # clip the numbers of the grid cells instead of the data, the cells outside the area become NaN
+    cell_numbers = xr.DataArray(np.arange(grid_shape[0] * grid_shape[1], dtype=np.float64).reshape(grid_shape),
+                                coords={"Y": grid["Y"].values, "X": grid["X"].values}, dims=("Y", "X"))
+    cell_numbers = cell_numbers.rio.set_spatial_dims(x_dim="X", y_dim="Y").rio.write_crs("EPSG:3034")
+    clipped = cell_numbers.rio.clip(selected_shape.geometry.values, selected_shape.crs, all_touched=True).values
+    return np.unravel_index(clipped[~np.isnan(clipped)].astype(np.int64), grid_shape)
+
+
+def _nearest_grid_cells(grid: xr.Dataset, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of the grid cells nearest to the points, like ``sel(X=x, Y=y, method="nearest")`` in
+    :py:mod:`acept.pv_cap_factor_profiles`.
+
+    :param grid: DWD TRY dataset with the spatial dimensions X and Y.
+    :param x: X coordinates of the points in EPSG:3034.
+    :param y: Y coordinates of the points in EPSG:3034.
+    :return: The Y and X positions of the grid cells.
+    """
+    return (grid.indexes["Y"].get_indexer(y, method="nearest"),
+            grid.indexes["X"].get_indexer(x, method="nearest"))
+
+
+def _read_dwd_try_month(weather_source: str, features: list[str], year: int, month: int,
+                        debug: bool = True) -> xr.Dataset:
+    """
+    Reads the DWD TRY features of a month from the single files (``try``) or the combined files.
+
+    :return: Dataset with the features as data variables.
+    """
+    if weather_source != "try":
+        wd_data = preprocess_combined_dwd_try_dataset(read_dwd_netcdf_file(weather_source, year=year, month=month,
+                                                                           debug=debug), debug=debug)
+        return wd_data[features]
+    wd_data = None
+    for feature in features:
+        feature_data = preprocess_dwd_try_dataset(read_dwd_netcdf_file(feature, year=year, month=month, debug=debug),
+                                                  feature, debug=debug)
+        if wd_data is None:
+            wd_data = feature_data[[feature]]
+        else:
+            wd_data[feature] = feature_data[feature]
+    return wd_data
+
+
+def summarize_ensemble(ensemble: np.ndarray, percentiles: tuple[int, ...] | list[int] = ENSEMBLE_PERCENTILES) -> dict[
+        str, np.ndarray]:
+    """
+    Computes the statistics of an ensemble over the years for each hour (and building).
+
+    :param ensemble: The ensemble with the years as first axis, e.g. the ``temperature`` or the ``pv_capacity`` of
+        :py:func:`compute_weather_ensemble`.
+    :param percentiles: The percentiles to compute. Defaults to :py:const:`ENSEMBLE_PERCENTILES`.
+    :return: Dictionary with the ``mean``, ``std``, ``min``, ``max`` and the percentiles as ``p{percentile}``. Each
+        value has the shape of the ensemble without the first axis.
+    """
+    statistics = {"mean": ensemble.mean(axis=0), "std": ensemble.std(axis=0), "min": ensemble.min(axis=0),
+                  "max": ensemble.max(axis=0)}
+    for percentile, values in zip(percentiles, np.percentile(ensemble, percentiles, axis=0)):
+        statistics[f"p{percentile}"] = values
+    return statistics
+
+
+def compute_weather_ensemble(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame = None,
+                             year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
+                             weather_source: str = "combined_try_uncompressed",
+                             building_specific_weather: bool = False,
+                             percentiles: tuple[int, ...] | list[int] = ENSEMBLE_PERCENTILES,
+                             debug: bool = True) -> dict:
+    """
+    Computes the temperature profiles and the PV capacity factor profiles of an area for all years between year_start
+    and year_end from the DWD TRY data in one pass over the weather data.
+
+    The temperature is averaged over the grid cells of the area like in
+    :py:func:`acept.temperature_profiles.compute_temperature_profiles_for_selected_years`. The PV capacity factor
+    profiles are computed like in :py:func:`acept.pv_cap_factor_profiles.compute_pv_capacity_for_selected_years` from
+    the weather of the grid cell at the centroid of the area, or of the grid cell of each building if
+    building_specific_weather is True. The grid cells are determined once for all years, see
+    :py:mod:`acept.ensemble_profiles`.
+
+    The PV capacity factor profiles need ``years x 8760 x buildings`` values, e.g. about 630 MB for 18 years and 1000
+    buildings.
+
+    :param selected_shape: GeoDataFrame of the selected area.
+    :param buildings: GeoDataFrame of the buildings with the columns ``bid``, ``lat`` and ``lon``. If None, only the
+        temperature profiles are computed.
+    :param year_start: First year. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
+    :param year_end: Last year. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
+    :param weather_source: The DWD TRY data to use, one of :py:const:`ENSEMBLE_WEATHER_SOURCES`.
+        Defaults to ``combined_try_uncompressed``.
+    :param building_specific_weather: Whether to use building specific weather data for the PV capacity factor
+        profiles. Defaults to False.
+    :param percentiles: The percentiles of the statistics, see :py:func:`summarize_ensemble`.
+        Defaults to :py:const:`ENSEMBLE_PERCENTILES`.
+    :param debug: Whether to print debug messages. Defaults to True.
+    :raises ValueOutsideRangeError: If year_start or year_end is outside the allowed range (see DWD_MAX_RANGE).
+    :raises ValueError: If weather_source is not a DWD TRY weather source or the grid of the DWD TRY data changes.
+    :return: Dictionary with the ``years``, the ``temperature`` in degC as array of shape (years, hours), the
+        ``temperature_statistics`` and the ``unit`` of the temperature. If buildings are given also the ``bids``
+        (sorted), the ``pv_capacity`` as float32 array of shape (years, hours, buildings) and the
+        ``pv_capacity_statistics`` of shape (hours, buildings).
+    """
+    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
+        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
+    if weather_source not in ENSEMBLE_WEATHER_SOURCES:
+        raise ValueError(f"Invalid weather_source {weather_source}. Valid values are "
+                         f"{', '.join(ENSEMBLE_WEATHER_SOURCES)}.")
+
+    # convert to projection of DWD try data without changing the inputs
+    selected_shape = selected_shape.to_crs(epsg=3034)
+    features = ["temperature"]
+    if buildings is not None:
+        buildings = buildings.sort_values("bid").to_crs(epsg=3034)
+        features += ["rad_direct", "rad_global"]
+        if building_specific_weather:
+            pv_points = buildings.geometry.centroid
+            pv_x, pv_y = pv_points.x.to_numpy(), pv_points.y.to_numpy()
+        else:
+            centroid = selected_shape.iloc[0].geometry.centroid
+            pv_x, pv_y = np.array([centroid.x]), np.array([centroid.y])
+
+    years = np.arange(year_start, year_end + 1)
+    temperature = np.full((len(years), ENSEMBLE_HOURS), np.nan)
+    pv_capacity = np.full((len(years), ENSEMBLE_HOURS, len(buildings)), np.nan, dtype=np.float32) \
+        if buildings is not None else None
+    grid_shape = None
+    for year_position, year_spec in enumerate(years):
+        monthly_times, monthly_temperature, monthly_pv_weather = [], [], []
+        for month_spec in range(1, 13):
+            span_attributes = {"builder": "ensemble", "year": int(year_spec), "month": month_spec}
+            with span("read", **span_attributes):
+                wd_data = _read_dwd_try_month(weather_source, features, year_spec, month_spec, debug=debug)
+
+            if grid_shape is None:
+                # the grid cells are determined once, all files of the DWD TRY data have the same grid
+                grid_shape = (wd_data.sizes["Y"], wd_data.sizes["X"])
+                with span("clip", **span_attributes):
+                    area_y, area_x = _area_grid_cells(wd_data, selected_shape)
+                cell_y, cell_x = area_y, area_x
+                if buildings is not None:
+                    pv_cell_y, pv_cell_x = _nearest_grid_cells(wd_data, pv_x, pv_y)
+                    # the PV model runs once per grid cell weather and building
+                    pv_cells, pv_cell_of_point = np.unique(np.stack([pv_cell_y, pv_cell_x]), axis=1,
+                                                           return_inverse=True)
+                    pv_cell_of_point = pv_cell_of_point.reshape(-1)
+                    cell_y, cell_x = np.concatenate([area_y, pv_cells[0]]), np.concatenate([area_x, pv_cells[1]])
+                # only the bounding box of the grid cells is read
+                y_slice = slice(int(cell_y.min()), int(cell_y.max()) + 1)
+                x_slice = slice(int(cell_x.min()), int(cell_x.max()) + 1)
+                area_y, area_x = area_y - y_slice.start, area_x - x_slice.start
+                if buildings is not None:
+                    pv_cells = pv_cells - np.array([[y_slice.start], [x_slice.start]])
+            elif (wd_data.sizes["Y"], wd_data.sizes["X"]) != grid_shape:
+                raise ValueError(f"The grid of the DWD TRY data of {month_spec}/{year_spec} differs from the grid of "
+                                 f"the first month: {(wd_data.sizes['Y'], wd_data.sizes['X'])} != {grid_shape}")
+
+            with span("reduce", **span_attributes):
+                values = {feature: wd_data[feature].isel(Y=y_slice, X=x_slice).transpose("time", "Y", "X").values
+                          for feature in features}
+                hours_in_month = 24 * monthrange(year_spec, month_spec)[1]
+                if values["temperature"].shape[0] != hours_in_month:
+                    raise ValueError(f"The DWD TRY data of {month_spec}/{year_spec} has "
+                                     f"{values['temperature'].shape[0]} hours instead of {hours_in_month}")
+                monthly_times.append(wd_data.indexes["time"])
+                monthly_temperature.append(np.nanmean(values["temperature"][:, area_y, area_x], axis=1))
+                if buildings is not None:
+                    monthly_pv_weather.append({feature: values[feature][:, pv_cells[0], pv_cells[1]]
+                                               for feature in features})
+            del wd_data, values
+            gc.collect()
+
+        time_index = monthly_times[0].append(monthly_times[1:])
+        # align the hours of all years
+        hours = ~((time_index.month == 2) & (time_index.day == 29))
+        temperature[year_position] = np.concatenate(monthly_temperature)[hours]
+
+        if buildings is not None:
+            pv_weather = {feature: np.concatenate([month[feature] for month in monthly_pv_weather])
+                          for feature in features}
+            input_weather_of_cells = [
+                calculate_gsee_input_weather_from_raw_weather(pd.DataFrame(
+                    {feature: pv_weather[feature][:, cell] for feature in features}, index=time_index))
+                for cell in range(pv_cells.shape[1])]
+            span_attributes = {"builder": "ensemble", "year": int(year_spec)}
+            for building_position, (lat, lon) in enumerate(zip(buildings["lat"], buildings["lon"])):
+                cell = pv_cell_of_point[building_position if building_specific_weather else 0]
+                with span("model", **span_attributes):
+                    pv_capacity[year_position, :, building_position] = \
+                        run_pv_model(input_weather_of_cells[cell], lat, lon).to_numpy()[hours]
+            del pv_weather, input_weather_of_cells
+        if debug:
+            print("Computed the weather ensemble for year", year_spec)
+
+    ensemble = {"years": years, "temperature": temperature,
+                "temperature_statistics": summarize_ensemble(temperature, percentiles),
+                "unit": TEMPERATURE_PROFILE_UNIT[0]}
+    if buildings is not None:
+        ensemble.update(bids=buildings["bid"].to_numpy(), pv_capacity=pv_capacity,
+                        pv_capacity_statistics=summarize_ensemble(pv_capacity, percentiles))
+    return ensemble
@@ -10,42 +10,134 @@ To run the example use the following command with the venv activated:
 
 
 """
-import sys
 
-import geopandas as gpd
+from __future__ import annotations
+
+import sys
 
 from acept import plz_shape
 from acept.acept_utils import absolute_path_from_relative_posix
+from acept.artifact_store import get_artifact_store
 from acept.bbd_plz_preprocessing import build_plz_munc_id_db, query_bbd_for_plz
 from acept.demand_profiles import run_uhp_for_selected_buildings_year
+from acept.lazy_imports import lazy_import
+from acept.pipeline import Stage, run_pipeline
 from acept.pv_cap_api import PVQuery, PVCapacityFactorCreator
 from acept.temperature_profiles import build_temperature_profile_for_year
 
+gpd = lazy_import("geopandas")
+
 
-def build_scenario_profiles_for_plz_year(plz: int, year: int = 2011) -> dict:
+def load_valid_temperature_profile(plz_or_region: int, selected_shape: gpd.GeoDataFrame,
+                                   year: int | None) -> dict | None:
     """
-    Build the scenario profiles for the given input
+    Return the stored DWD TRY temperature profile for the PLZ and year from the artifact store.
 
-    The scenario profiles are built for the temperature profile and the PV capacity factor profiles
-    The scenario profiles are saved in the :py:const:`acept.acept_constants.TEMP_PATH` directory
+    :param plz_or_region: PLZ of the temperature profile.
+    :param selected_shape: GeoDataFrame of the PLZ (unused, same inputs as the temperature stage).
+    :param year: Year of the temperature profile.
+    :return: Dictionary with the path of the temperature profile, or None if it has to be created.
+    """
+    if year is None:
+        return None
+    store = get_artifact_store()
+    key = store.resolve_reference(f"temperature_{plz_or_region}_{year}")
+    if key is None:
+        return None
+    temperature_profile = store.lookup_file(key, f"DWD_TRY_{plz_or_region}_{year}.csv")
+    return {"temperature_profile": temperature_profile} if temperature_profile is not None else None
 
-    :param plz: PLZ to search
-    :param year: year to use for the scenario profiles
-    :return: The paths to the created scenario profiles in a dictionary
+
+def load_valid_pv_profile(plz: int, year: int) -> dict | None:
     """
-    print("Building the scenario profiles for the given input")
-    selected_shape = plz_shape.get_single_plz_shape(str(plz))
-    print("Selected PLZ shape read.")
-    temp_profile = build_temperature_profile_for_year(plz, selected_shape=selected_shape, year=year, debug=True)
+    Return the stored PV capacity factor profile for the PLZ and year from the artifact store.
+
+    :param plz: PLZ of the PV capacity factor profile.
+    :param year: Year of the PV capacity factor profile.
+    :return: Dictionary with the path of the PV capacity factor profile, or None if it has to be created.
+    """
+    store = get_artifact_store()
+    key = store.resolve_reference(f"pv_cap_{plz}_{year}")
+    if key is None:
+        return None
+    pv_profile = store.lookup_file(key, f"{plz}_pv_cap_{year}.csv")
+    return {"pv_profile": pv_profile} if pv_profile is not None else None
 
-    # Using the PV capacity profile API of renewables.ninja for the PLZ region
-    # Comment out the following two lines if you have set the renewables_token in personal_settings.py,
-    # and you want to use the Renewables.ninja API
+
+def build_pv_profile(plz: int, year: int) -> str:
+    """
+    Build the PV capacity factor profile with the PV capacity profile API of renewables.ninja for the PLZ region.
+
+    :param plz: PLZ of the PV capacity factor profile.
+    :param year: Year of the PV capacity factor profile.
+    :return: Path to the created PV capacity factor profile.
+    """
     pv_query = PVQuery(plz=str(plz), year=year)
     pcfc = PVCapacityFactorCreator()
-    pv_profile = pcfc.create_pv_api_query(pv_query)
+    return pcfc.get_pv_profile(pv_query)
 
-    return {"temperature_profile": temp_profile, "pv_profile": pv_profile}
+
+def build_demand_profiles(plz: int, buildings: gpd.GeoDataFrame, year: int | None, temperature_profile: str) -> dict:
+    """
+    Run UrbanHeatPro for the buildings with the created temperature profile.
+
+    :param plz: PLZ of the buildings.
+    :param buildings: GeoDataFrame of the buildings.
+    :param year: Year of the scenario. Set to None for UHP, if the TMY is used as temperature profile.
+    :param temperature_profile: Path to the temperature profile.
+    :return: The result of :py:func:`acept.demand_profiles.run_uhp_for_selected_buildings_year`.
+    """
+    if "temperature_tmy" in temperature_profile:
+        print("TMY used instead of DWD TRY for", year)
+        year = None
+    return run_uhp_for_selected_buildings_year(plz, buildings, year, temperature_profile, demand_unit='W')
+
+
+def build_scenario_profiles_for_plz_year(plz: int, year: int = 2011, buildings: gpd.GeoDataFrame = None,
+                                         max_workers: int | None = None) -> dict:
+    """
+    Build the scenario profiles for the given input
+
+    The scenario profiles are built for the temperature profile and the PV capacity factor profiles, and the demand
+    profiles if buildings are given.
+    The scenario profiles are saved in the artifact store, see :py:mod:`acept.artifact_store`.
+
+    The profiles are built as stages of a :py:mod:`acept.pipeline`: the temperature profile (CPU-bound, in a separate
+    process) and the PV capacity factor profile (API query, in a thread) are built at the same time.
+    Profiles that are already in the artifact store are not built again.
+
+    :param plz: PLZ to search
+    :param year: year to use for the scenario profiles
+    :param buildings: GeoDataFrame of the buildings to build the demand profiles for. If None, no demand profiles are
+        built.
+    :param max_workers: Maximum number of threads and processes each to build the profiles.
+    :return: The paths to the created scenario profiles in a dictionary, and the result of the demand profiles with the
+        key "demand" if buildings are given
+    """
+    print("Building the scenario profiles for the given input")
+    stages = [
+        Stage("shape", plz_shape.get_single_plz_shape, inputs={"plz": "plz_str"}, outputs=["selected_shape"]),
+        Stage("temperature", build_temperature_profile_for_year,
+              inputs={"plz_or_region": "plz", "selected_shape": "selected_shape", "year": "year"},
+              outputs=["temperature_profile"], executor="process",
+              load_valid_outputs=load_valid_temperature_profile),
+        # Using the PV capacity profile API of renewables.ninja for the PLZ region
+        # Remove this stage if you have not set the renewables_token in personal_settings.py
+        Stage("pv", build_pv_profile, inputs=["plz", "year"], outputs=["pv_profile"],
+              load_valid_outputs=load_valid_pv_profile),
+    ]
+    initial_values = {"plz": plz, "plz_str": str(plz), "year": year}
+    if buildings is not None:
+        # UHP uses its own process pool, so the stage only waits for it in a thread
+        stages.append(Stage("demand", build_demand_profiles,
+                            inputs=["plz", "buildings", "year", "temperature_profile"], outputs=["demand"]))
+        initial_values["buildings"] = buildings
+
+    values = run_pipeline(stages, initial_values, max_workers=max_workers)
+    scenario_profiles = {"temperature_profile": values["temperature_profile"], "pv_profile": values["pv_profile"]}
+    if buildings is not None:
+        scenario_profiles["demand"] = values["demand"]
+    return scenario_profiles
 
 
 if __name__ == "__main__":
@@ -75,18 +167,13 @@ if __name__ == "__main__":
     buildings_example = gpd.read_file(
         absolute_path_from_relative_posix("../../data/bbd/TestBezirk/Res_9565000_10_buildings.shp"))
 
-    scenarios = build_scenario_profiles_for_plz_year(plz_cli, year_cli)
+    scenarios = build_scenario_profiles_for_plz_year(plz_cli, year_cli, buildings=buildings_example)
     if scenarios["temperature_profile"] is not None:
         print("Temperature profile successfully created")
-        if "temperature_tmy" in scenarios["temperature_profile"]:
-            print("TMY used instead of DWD TRY for", year_cli)
-            # set the year to None for UHP
-            year_cli = None
     if scenarios["pv_profile"] is not None:
         print("PV profile successfully created")
-
-    run_uhp_for_selected_buildings_year(plz_cli, buildings_example, year_cli, scenarios["temperature_profile"],
-                                        demand_unit='W')
+    if scenarios["demand"] is not None:
+        print("Demand profiles successfully created")
 
     # -----
     print("Finished running acept")
@@ -9,7 +9,6 @@ Also shows how to combine the downloaded DWD TRY data into a single file per mon
 """
 
 import geopandas as gpd
-from shapely.geometry import Point
 
 from acept.acept_utils import absolute_path_from_relative_posix
 from acept.dwd_try_data_handling import combine_dwd_try_data_and_save, \
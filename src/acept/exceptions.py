@@ -18,3 +18,21 @@ class ValueOutsideRangeError(ValueError):
         self.max_value = max_value
         self.message = f"{data_type} data has max range: year_start={self.min_value}, year_end={self.max_value}."
         super().__init__(self.message)
+
+
+class PipelineStageError(RuntimeError):
+    """
+    Exception raised when a stage of a pipeline fails.
+    """
+
+    def __init__(self, stage_name: str, cause: Exception | str):
+        """
+        Initialize the exception, that will be raised when a stage of a pipeline fails.
+
+        :param stage_name: name of the stage that failed
+        :param cause: the exception raised by the stage or a description of the error
+        """
+        self.stage_name = stage_name
+        self.cause = cause
+        self.message = f"Stage '{stage_name}' of the pipeline failed: {cause}"
+        super().__init__(self.message)
@@ -0,0 +1,327 @@
+"""Module for timing and memory instrumentation of the profile builders.
+
+The profile builders are divided into stages, e.g. read, preprocess, clip, reduce, model and write. Each stage is
+recorded as a span with:
+    - the wall time and the CPU time of the stage,
+    - the resident set size (RSS) of the process at the start and the end and the peak RSS of the process during the
+      stage, sampled by a background thread every :py:const:`PEAK_RSS_SAMPLING_INTERVAL` seconds,
+    - the bytes read and written by the process during the stage, including reads served from the page cache.
+
+Spans can be nested and are recorded for all threads of the process. Spans of child processes (e.g. the pipeline
+stages run in a process pool) are recorded in the child processes.
+
+The instrumentation is disabled by default and costs almost nothing then. Enable it with
+:py:func:`enable_instrumentation` or by setting the environment variable ``ACEPT_INSTRUMENTATION=1``.
+
+Use this module to:
+    - Record a stage with the context manager :py:func:`span` or the decorator :py:func:`instrumented`
+    - Summarize the recorded spans per stage with :py:func:`summarize_spans`
+    - Export the recorded spans as JSON with :py:func:`export_spans_json` or in the Chrome trace format with
+      :py:func:`export_chrome_trace` (open in ``chrome://tracing`` or https://ui.perfetto.dev)
+
+Example:
+
+.. code-block:: python
+
+    enable_instrumentation()
+    with span("read", feature="temperature", month=1):
+        wd_data = read_dwd_netcdf_file("temperature", year=2011, month=1)
+    print(summarize_spans())
+    export_chrome_trace("trace.json")
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from acept.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+psutil = lazy_import("psutil")
+
+PEAK_RSS_SAMPLING_INTERVAL = 0.01
+"""Interval in seconds in which the RSS of the process is sampled for the peak RSS of the active spans."""
+
+_enabled = os.environ.get("ACEPT_INSTRUMENTATION", "") not in ("", "0")
+_spans: list[dict[str, Any]] = []
+_spans_lock = threading.Lock()
+_local = threading.local()
+_process = None
+_active_spans: set[_Span] = set()
+_sampler_thread = None
+
+
+def enable_instrumentation():
+    """
+    Enables the recording of spans.
+    """
+    global _enabled
+    _enabled = True
+
+
+def disable_instrumentation():
+    """
+    Disables the recording of spans. Already recorded spans are kept.
+    """
+    global _enabled
+    _enabled = False
+
+
+def instrumentation_enabled() -> bool:
+    """
+    Returns whether spans are recorded.
+
+    :return: True if the instrumentation is enabled.
+    """
+    return _enabled
+
+
+def _get_process() -> psutil.Process:
+    """
+    Returns the psutil process of the current process, which is created again in forked child processes.
+
+    :return: The current process.
+    """
+    global _process
+    if _process is None or _process.pid != os.getpid():
+        _process = psutil.Process()
+    return _process
+
+
+def _sample_peak_rss():
+    """
+    Samples the RSS of the process and updates the peak RSS of the active spans until no span is active anymore.
+    """
+    global _sampler_thread
+    process = _get_process()
+    while True:
+        with _spans_lock:
+            if not _active_spans:
+                _sampler_thread = None
+                return
+            active_spans = list(_active_spans)
+        rss = process.memory_info().rss
+        for active_span in active_spans:
+            if rss > active_span.peak_rss:
+                active_span.peak_rss = rss
+        time.sleep(PEAK_RSS_SAMPLING_INTERVAL)
+
+
+def _io_counters(process: psutil.Process) -> tuple[int | None, int | None]:
+    """
+    Returns the bytes read and written by the process so far.
+
+    The characters passed to read and write system calls are used where available (Linux), so reads served from the page
+    cache are included. Otherwise, the bytes read from and written to the storage are used.
+
+    :param process: The process.
+    :return: The bytes read and written, or None if the counters are not available on this platform.
+    """
+    try:
+        io_counters = process.io_counters()
+    except (AttributeError, psutil.Error):
+        return None, None
+    return (getattr(io_counters, "read_chars", io_counters.read_bytes),
+            getattr(io_counters, "write_chars", io_counters.write_bytes))
+
+
+class _Span:
+    """
+    Context manager that records a single span.
+    """
+
+    __slots__ = ("name", "attributes", "record", "peak_rss", "_start_wall", "_start_cpu", "_start_rss",
+                 "_start_read", "_start_write")
+
+    def __init__(self, name: str, attributes: dict[str, Any]):
+        """
+        Constructor for the _Span class.
+
+        :param name: The name of the stage.
+        :param attributes: Additional information on the span, e.g. the year and month.
+        """
+        self.name = name
+        self.attributes = attributes
+        self.record = None
+        self.peak_rss = 0
+
+    def __enter__(self):
+        process = _get_process()
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self.name)
+        self._start_rss = self.peak_rss = process.memory_info().rss
+        global _sampler_thread
+        with _spans_lock:
+            _active_spans.add(self)
+            # the sampler thread of the parent process does not exist in forked child processes
+            if _sampler_thread is None or not _sampler_thread.is_alive():
+                _sampler_thread = threading.Thread(target=_sample_peak_rss, name="acept-peak-rss", daemon=True)
+                _sampler_thread.start()
+        self._start_read, self._start_write = _io_counters(process)
+        self._start_cpu = time.thread_time()
+        self._start_wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_wall = time.perf_counter()
+        end_cpu = time.thread_time()
+        process = _get_process()
+        end_read, end_write = _io_counters(process)
+        end_rss = process.memory_info().rss
+        with _spans_lock:
+            _active_spans.discard(self)
+        stack = _local.stack
+        stack.pop()
+        self.record = {
+            "name": self.name,
+            "parent": stack[-1] if stack else None,
+            "start": self._start_wall,
+            "wall_time": end_wall - self._start_wall,
+            "cpu_time": end_cpu - self._start_cpu,
+            "rss_start": self._start_rss,
+            "rss_end": end_rss,
+            "peak_rss": max(self.peak_rss, end_rss),
+            "read_bytes": end_read - self._start_read if end_read is not None else None,
+            "write_bytes": end_write - self._start_write if end_write is not None else None,
+            "pid": os.getpid(),
+            "thread_id": threading.get_ident(),
+            "error": exc_type.__name__ if exc_type is not None else None,
+            "attributes": self.attributes,
+        }
+        with _spans_lock:
+            _spans.append(self.record)
+        return False
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def span(name: str, **attributes) -> contextlib.AbstractContextManager:
+    """
+    Context manager that records the wall time, the CPU time, the RSS and the bytes read and written of a stage.
+
+    If the instrumentation is disabled, a shared context manager that does nothing is returned.
+    The CPU time is the CPU time of the current thread, the RSS and the bytes read and written are those of the whole
+    process, so they include other threads running at the same time. The peak RSS is sampled every
+    :py:const:`PEAK_RSS_SAMPLING_INTERVAL` seconds, shorter peaks between two samples are missed.
+
+    :param name: The name of the stage, e.g. ``read``, ``preprocess``, ``clip``, ``reduce``, ``model`` or ``write``.
+    :param attributes: Additional JSON serializable information on the span, e.g. the year and month.
+    :return: The context manager.
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, attributes)
+
+
+def instrumented(name: str | None = None) -> Callable:
+    """
+    Decorator that records each call of a function as a span, see :py:func:`span`.
+
+    :param name: The name of the stage. Defaults to the qualified name of the function.
+    :return: The decorator.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        span_name = name if name is not None else f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(span_name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_spans() -> list[dict[str, Any]]:
+    """
+    Returns the recorded spans of the current process.
+
+    :return: A copy of the list of the recorded spans, see :py:func:`export_spans_json` for the fields.
+    """
+    with _spans_lock:
+        return list(_spans)
+
+
+def clear_spans():
+    """
+    Removes all recorded spans.
+    """
+    with _spans_lock:
+        _spans.clear()
+
+
+def summarize_spans(spans: list[dict[str, Any]] | None = None) -> pd.DataFrame:
+    """
+    Summarizes the spans per stage.
+
+    :param spans: The spans. Defaults to the recorded spans, see :py:func:`get_spans`.
+    :return: A DataFrame with one row per stage name and the columns ``count``, ``wall_time``, ``cpu_time`` (sums in
+        seconds), ``peak_rss`` (maximum in bytes), ``read_bytes`` and ``write_bytes`` (sums), sorted by the wall time.
+    """
+    if spans is None:
+        spans = get_spans()
+    columns = ["count", "wall_time", "cpu_time", "peak_rss", "read_bytes", "write_bytes"]
+    if not spans:
+        return pd.DataFrame(columns=columns)
+    spans_df = pd.DataFrame(spans)
+    summary = spans_df.groupby("name").agg(count=("name", "size"), wall_time=("wall_time", "sum"),
+                                           cpu_time=("cpu_time", "sum"), peak_rss=("peak_rss", "max"),
+                                           read_bytes=("read_bytes", "sum"), write_bytes=("write_bytes", "sum"))
+    return summary.sort_values("wall_time", ascending=False)
+
+
+def export_spans_json(file_path: str, spans: list[dict[str, Any]] | None = None) -> str:
+    """
+    Exports the spans as JSON list.
+
+    Each span has the fields ``name``, ``parent`` (name of the enclosing span of the same thread), ``start``
+    (:py:func:`time.perf_counter` in seconds), ``wall_time`` and ``cpu_time`` (in seconds), ``rss_start``, ``rss_end``,
+    ``peak_rss`` (peak RSS during the span), ``read_bytes`` and ``write_bytes`` (in bytes, None if not available on the
+    platform), ``pid``, ``thread_id``, ``error`` (name of the exception raised in the span) and ``attributes``.
+
+    :param file_path: Path to the JSON file.
+    :param spans: The spans. Defaults to the recorded spans, see :py:func:`get_spans`.
+    :return: The path to the JSON file.
+    """
+    if spans is None:
+        spans = get_spans()
+    with open(file_path, "w") as f:
+        json.dump(spans, f, indent=1, default=str)
+    return file_path
+
+
+def export_chrome_trace(file_path: str, spans: list[dict[str, Any]] | None = None) -> str:
+    """
+    Exports the spans in the Chrome trace event format, which can be opened in ``chrome://tracing`` or
+    https://ui.perfetto.dev.
+
+    :param file_path: Path to the JSON file.
+    :param spans: The spans. Defaults to the recorded spans, see :py:func:`get_spans`.
+    :return: The path to the JSON file.
+    """
+    if spans is None:
+        spans = get_spans()
+    trace_events = []
+    for recorded_span in spans:
+        args = {key: value for key, value in recorded_span.items()
+                if key not in ("name", "start", "wall_time", "pid", "thread_id", "attributes")}
+        args.update(recorded_span["attributes"])
+        trace_events.append({"name": recorded_span["name"], "ph": "X", "ts": recorded_span["start"] * 1e6,
+                             "dur": recorded_span["wall_time"] * 1e6, "pid": recorded_span["pid"],
+                             "tid": recorded_span["thread_id"], "args": args})
+    with open(file_path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, default=str)
+    return file_path
@@ -0,0 +1,116 @@
+"""Module for importing heavy dependencies on first use.
+
+Importing pandas, geopandas, xarray, rioxarray, gsee and pvlib takes seconds. Most calls of acept only need some of
+them, e.g. a worker process that only reads a CSV file or a CLI call that only prints the help. The modules of acept
+therefore import these dependencies with :py:func:`lazy_import`, which returns a placeholder module. The dependency is
+imported when an attribute of the placeholder is accessed for the first time, e.g. ``pd.DataFrame``.
+
+Type annotations with the lazy modules are not evaluated at import time, as the modules using them start with
+``from __future__ import annotations``.
+
+Use this module to:
+    - Import a module on first use with :py:func:`lazy_import`
+    - Check if a lazy module was already imported with :py:func:`is_imported`
+
+Example:
+
+.. code-block:: python
+
+    from acept.lazy_imports import lazy_import
+
+    gpd = lazy_import("geopandas")
+    # rioxarray registers the rio accessor of the xarray Datasets, so it is imported together with xarray
+    xr = lazy_import("xarray", companions=("rioxarray",))
+
+    def read_shapes(path: str) -> gpd.GeoDataFrame:
+        return gpd.read_file(path)  # geopandas is imported here
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+_import_lock = threading.RLock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder of a module that imports the module on the first access of one of its attributes.
+    """
+
+    def __init__(self, name: str, companions: tuple[str, ...] = ()):
+        """
+        Constructor for the LazyModule class.
+
+        :param name: The name of the module, e.g. ``geopandas`` or ``pvlib.iotools``.
+        :param companions: Names of modules imported together with the module, e.g. modules that register accessors.
+        """
+        super().__init__(name)
+        self.__dict__["_lazy_companions"] = companions
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        """
+        Imports the module and its companions if not done yet.
+
+        :return: The imported module.
+        """
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with _import_lock:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    for companion in self.__dict__["_lazy_companions"]:
+                        importlib.import_module(companion)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name: str):
+        # only called for attributes that are not set on the placeholder itself
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "imported" if self.__dict__["_lazy_module"] is not None else "not imported"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str, companions: tuple[str, ...] = ()) -> types.ModuleType:
+    """
+    Returns a placeholder of the module that imports the module on first use.
+
+    If the module was already imported, the module itself is returned. Whether the top-level package of the module is
+    installed is checked immediately, so that missing dependencies still raise an error on import.
+
+    :param name: The name of the module, e.g. ``geopandas`` or ``pvlib.iotools``.
+    :param companions: Names of modules imported together with the module, e.g. ``rioxarray``, which registers the
+        ``rio`` accessor of xarray.
+    :raises ModuleNotFoundError: If the top-level package of the module or of a companion is not installed.
+    :return: The placeholder of the module, or the module if it was already imported.
+    """
+    for module_name in (name, *companions):
+        top_level_name = module_name.partition(".")[0]
+        if importlib.util.find_spec(top_level_name) is None:
+            raise ModuleNotFoundError(f"No module named '{top_level_name}'", name=top_level_name)
+
+    module = sys.modules.get(name)
+    if module is not None and all(companion in sys.modules for companion in companions):
+        return module
+    return LazyModule(name, companions)
+
+
+def is_imported(module: types.ModuleType) -> bool:
+    """
+    Returns whether the module of a placeholder was already imported.
+
+    :param module: The placeholder returned by :py:func:`lazy_import` or a module.
+    :return: True if the module was imported.
+    """
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazy_module"] is not None
+    return True
@@ -0,0 +1,204 @@
+"""Module for running the stages of a scenario as a pipeline.
+
+A pipeline consists of stages that declare the values they need as inputs and the values they create as outputs.
+The stages form a directed acyclic graph: a stage is started as soon as all its inputs are available, so that
+independent stages run at the same time.
+I/O-bound stages (e.g. API queries) run in threads, CPU-bound stages run in separate processes.
+Stages whose outputs already exist are skipped.
+
+Use this module to:
+    - Declare the stages of a scenario with :py:class:`Stage`
+    - Run the stages with :py:func:`run_pipeline`
+
+Example of a pipeline, where the temperature and the PV profile are created at the same time:
+
+.. code-block:: python
+
+    stages = [
+        Stage("shape", plz_shape.get_single_plz_shape, inputs={"plz": "plz"}, outputs=["selected_shape"]),
+        Stage("temperature", build_temperature_profile_for_year,
+              inputs={"plz_or_region": "plz", "selected_shape": "selected_shape", "year": "year"},
+              outputs=["temperature_profile"], executor="process"),
+        Stage("pv", build_pv_profile, inputs={"plz": "plz", "year": "year"}, outputs=["pv_profile"]),
+    ]
+    results = run_pipeline(stages, {"plz": "91126", "year": 2011})
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable
+
+from acept.exceptions import PipelineStageError
+
+STAGE_EXECUTORS = ("thread", "process", "main")
+"""Executors of the stages: 'thread' for I/O-bound stages, 'process' for CPU-bound stages and 'main' for stages that
+have to run in the main thread."""
+
+
+class Stage:
+    """
+    Class for a single stage of a pipeline.
+    """
+
+    def __init__(self, name: str, function: Callable, inputs: dict[str, str] | list[str] = None,
+                 outputs: list[str] = None, executor: str = "thread",
+                 load_valid_outputs: Callable[..., dict[str, Any] | None] = None):
+        """
+        Constructor for the Stage class.
+
+        :param name: The name of the stage.
+        :param function: The function of the stage. It is called with the inputs as keyword arguments. If the stage has
+            one output, the return value is the output. If the stage has multiple outputs, the function has to return a
+            dictionary with the names of the outputs as keys. Functions of stages with the 'process' executor have to
+            be defined at module level.
+        :param inputs: The inputs of the stage, either as dictionary of the parameter names of the function and the
+            names of the values in the pipeline, or as list of names if they are the same. Defaults to no inputs.
+        :param outputs: The names of the values created by the stage. Defaults to the name of the stage.
+        :param executor: Where to run the stage, one of :py:const:`STAGE_EXECUTORS`. Defaults to 'thread'.
+        :param load_valid_outputs: Optional function that is called with the same inputs as the function before the
+            stage is run. If it returns a dictionary with the outputs, the outputs already exist and the stage is
+            skipped. If it returns None, the stage is run.
+        :raises ValueError: If the executor is unknown.
+        """
+        if executor not in STAGE_EXECUTORS:
+            raise ValueError(f"executor must be one of {STAGE_EXECUTORS}, is: {executor}")
+        self.name = name
+        self.function = function
+        if inputs is None:
+            inputs = {}
+        self.inputs = inputs if isinstance(inputs, dict) else {name_of_input: name_of_input for name_of_input in inputs}
+        self.outputs = outputs if outputs is not None else [name]
+        self.executor = executor
+        self.load_valid_outputs = load_valid_outputs
+
+    def input_values(self, values: dict[str, Any]) -> dict[str, Any]:
+        """
+        Select the inputs of the stage from the values of the pipeline.
+
+        :param values: The values of the pipeline.
+        :return: The keyword arguments for the function of the stage.
+        """
+        return {parameter: values[value_name] for parameter, value_name in self.inputs.items()}
+
+    def output_values(self, result: Any) -> dict[str, Any]:
+        """
+        Map the result of the function of the stage to its outputs.
+
+        :param result: The return value of the function of the stage.
+        :raises PipelineStageError: If an output is missing in the result of a stage with multiple outputs.
+        :return: The outputs of the stage as dictionary.
+        """
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        missing_outputs = [output for output in self.outputs if output not in result]
+        if missing_outputs:
+            raise PipelineStageError(self.name, f"missing outputs {missing_outputs}")
+        return {output: result[output] for output in self.outputs}
+
+
+def _check_stages(stages: list[Stage], initial_values: dict[str, Any]):
+    """
+    Check that the names and outputs of the stages are unique and all inputs can be created without cycles.
+
+    :param stages: The stages of the pipeline.
+    :param initial_values: The values available at the start of the pipeline.
+    :raises ValueError: If the stages do not form a valid pipeline.
+    """
+    stage_names = [stage.name for stage in stages]
+    if len(set(stage_names)) != len(stage_names):
+        raise ValueError(f"Stage names must be unique: {stage_names}")
+    outputs = [output for stage in stages for output in stage.outputs]
+    if len(set(outputs)) != len(outputs) or set(outputs) & set(initial_values):
+        raise ValueError(f"Each value must be created by a single stage or be an initial value: {outputs}")
+
+    available = set(initial_values)
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if set(stage.inputs.values()) <= available]
+        if not ready:
+            missing = {stage.name: sorted(set(stage.inputs.values()) - available) for stage in remaining}
+            raise ValueError(f"Inputs of the stages are never created or depend on each other: {missing}")
+        for stage in ready:
+            available.update(stage.outputs)
+            remaining.remove(stage)
+
+
+def run_pipeline(stages: list[Stage], initial_values: dict[str, Any] = None, max_workers: int | None = None,
+                 debug: bool = True) -> dict[str, Any]:
+    """
+    Run the stages of a pipeline.
+
+    Each stage is started as soon as all its inputs are available. Independent stages run at the same time in a thread
+    pool or a process pool, depending on their executor. If a stage fails, the stages that are already running are
+    finished, no new stages are started and the error is raised.
+
+    :param stages: The stages of the pipeline.
+    :param initial_values: The values available at the start of the pipeline, e.g. the PLZ and the year.
+    :param max_workers: Maximum number of threads and processes each. If None, the defaults of
+        :py:class:`concurrent.futures.ThreadPoolExecutor` and :py:class:`concurrent.futures.ProcessPoolExecutor`
+        are used.
+    :param debug: If True, print when stages are started, skipped and finished.
+    :raises ValueError: If the stages do not form a valid pipeline.
+    :raises PipelineStageError: If a stage fails.
+    :return: All values of the pipeline: the initial values and the outputs of all stages.
+    """
+    values = dict(initial_values) if initial_values is not None else {}
+    _check_stages(stages, values)
+
+    pending = list(stages)
+    running = {}
+    start_times = {}
+    thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+    process_pool = None
+    try:
+        while pending or running:
+            # start all stages whose inputs are available
+            for stage in [stage for stage in pending if set(stage.inputs.values()) <= set(values)]:
+                pending.remove(stage)
+                kwargs = stage.input_values(values)
+                if stage.load_valid_outputs is not None:
+                    valid_outputs = stage.load_valid_outputs(**kwargs)
+                    if valid_outputs is not None:
+                        values.update(stage.output_values(valid_outputs if len(stage.outputs) > 1 else
+                                                          valid_outputs[stage.outputs[0]]))
+                        if debug:
+                            print(f"Stage {stage.name}: outputs are valid, skipped")
+                        continue
+                if debug:
+                    print(f"Stage {stage.name}: started")
+                start_times[stage.name] = time.perf_counter()
+                if stage.executor == "main":
+                    try:
+                        values.update(stage.output_values(stage.function(**kwargs)))
+                    except PipelineStageError:
+                        raise
+                    except Exception as e:
+                        raise PipelineStageError(stage.name, e) from e
+                    if debug:
+                        print(f"Stage {stage.name}: finished in {time.perf_counter() - start_times[stage.name]:.1f} s")
+                    break  # new values may be available, check the pending stages again
+                if stage.executor == "process":
+                    if process_pool is None:
+                        process_pool = ProcessPoolExecutor(max_workers=max_workers)
+                    running[process_pool.submit(stage.function, **kwargs)] = stage
+                else:
+                    running[thread_pool.submit(stage.function, **kwargs)] = stage
+            else:
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        values.update(stage.output_values(future.result()))
+                    except PipelineStageError:
+                        raise
+                    except Exception as e:
+                        raise PipelineStageError(stage.name, e) from e
+                    if debug:
+                        print(f"Stage {stage.name}: finished in {time.perf_counter() - start_times[stage.name]:.1f} s")
+    finally:
+        thread_pool.shutdown(wait=True, cancel_futures=True)
+        if process_pool is not None:
+            process_pool.shutdown(wait=True, cancel_futures=True)
+    return values
@@ -5,15 +5,19 @@ Use this module to
     - calculate the centroid of the PLZ area for a given PLZ.
     - read the shape file containing the PLZ areas.
     - get the PLZ shape for a given PLZ.
+    - get all PLZ of a region, e.g. all PLZ starting with 911.
 
 Note:
     The path to the shape file is defined in :py:const:`accept.config.PLZ_PATH`
 """
 
-import geopandas as gpd
-from shapely import Point
+from __future__ import annotations
 
 from acept.acept_constants import PLZ_PATH
+from acept.lazy_imports import lazy_import
+
+gpd = lazy_import("geopandas")
+shapely = lazy_import("shapely")
 
 
 def read_plz_shapefile(plz_path: str = PLZ_PATH) -> gpd.GeoDataFrame:
@@ -39,12 +43,27 @@ def get_single_plz_shape(plz: str) -> gpd.GeoDataFrame:
     plz_mask: gpd.GeoDataFrame = plz_df.loc[plz_df["plz"] == plz]
     return plz_mask
 
+
+def get_plz_in_region(region: str, plz_path: str = PLZ_PATH) -> list[str]:
+    """
+    Returns all PLZ of a region, given as the leading digits of its PLZ, e.g. ``911`` for all PLZ from 91100 to 91199.
+
+    :param region: The leading digits of the PLZ of the region.
+    :param plz_path: path to the shapefile defining the PLZ areas. Default: :py:const:`accept.config.PLZ_PATH`
+    :raises ValueError: If the region is not a string of up to 5 digits.
+    :return: The sorted PLZ of the region.
+    """
+    if not region.isdigit() or len(region) > 5:
+        raise ValueError(f"region must be the leading digits of the PLZ, is: {region}")
+    plz_df = read_plz_shapefile(plz_path)
+    return sorted(plz_df.loc[plz_df["plz"].str.startswith(region), "plz"].unique().tolist())
+
 # ---------
 # ## Calculate lon, lat of PLZ
 # MAYBE use centroids in data/plz-5stellig-daten.csv
 
 
-def calculate_centroid_of_plz(plz: str) -> Point:
+def calculate_centroid_of_plz(plz: str) -> shapely.Point:
     """
     Calculates the centroid of the PLZ area.
 
@@ -17,19 +17,24 @@ Raises:
 
 """
 
+from __future__ import annotations
+
 import io
 import json
 import os
 
-import pandas as pd
-import requests
 from ratelimit import limits, sleep_and_retry
 
 import acept.plz_shape as plz_shape
 from acept.acept_utils import absolute_path_from_relative_posix
 from acept.acept_constants import TEMP_PATH, RENEWABLES_NINJA_API_BASE
+from acept.artifact_store import ArtifactStore, artifact_key, get_artifact_store
+from acept.lazy_imports import lazy_import
 from acept.uhp_csv_io import write_geopandas_to_uhp_csv
 
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+
 if os.path.isfile(absolute_path_from_relative_posix("personal_settings.py")):
     import acept.personal_settings as secret
 else:
@@ -162,3 +167,27 @@ class PVCapacityFactorCreator:
         # add header row and unit info
         # MAYBE add timestamp? cap_fac_data.to_csv(pv_cap_csv_path, index=True, index_label="timestamp")
         return write_geopandas_to_uhp_csv(pv_cap_csv_path, cap_fac_data, ['PV Capacity Factor'], ['unitless'])
+
+    def get_pv_profile(self, pv_query: PVQuery, store: ArtifactStore | None = None) -> str:
+        """
+        Get the PV capacity factor profile for the given query from the artifact store (see
+        :py:mod:`acept.artifact_store`), or query the API with :py:meth:`create_pv_api_query` and save the result in
+        the store with the reference ``pv_cap_{plz}_{year}``. Stored profiles do not count towards the rate limit of the
+        API.
+
+        :param pv_query: The PV capacity factor query.
+        :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
+        :return: Path to the CSV file of the PV capacity factor profile.
+        """
+        if store is None:
+            store = get_artifact_store()
+        file_name = f"{pv_query.queried_plz}_pv_cap_{pv_query.year}.csv"
+        key = artifact_key("create_pv_api_query", **pv_query.to_args_dict())
+        stored_profile = store.lookup_file(key, file_name)
+        if stored_profile is not None:
+            return stored_profile
+        pv_cap_csv_path = self.create_pv_api_query(pv_query)
+        store.put_files(key, {file_name: pv_cap_csv_path})
+        store.set_reference(f"pv_cap_{pv_query.queried_plz}_{pv_query.year}", key)
+        store.collect_garbage()
+        return os.path.join(store.entry_path(key), file_name)
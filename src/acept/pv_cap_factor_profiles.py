@@ -19,60 +19,81 @@ Use this module to:
     - Build PV capacity factor profiles for the typical meteorological year for all given buildings
     - Build PV capacity factor profiles for a single year for all given buildings from the DWD TRY data
     - Build PV capacity factor profiles for multiple years for all given buildings from the DWD TRY data
+    - Compute PV capacity factor profiles in memory without saving them, and save them separately
 
 Use the :py:func:`build_pv_capacity_profile_for_year()` function to build a PV capacity factor profile for a single
 year. This function builds PV capacity factor profiles based on the available weather data (DWD TRY or TMY) for the
-selected region.
+selected region. Use :py:func:`compute_pv_capacity_profile_for_year()` to get the profiles of all buildings as one
+pandas DataFrame with their metadata instead.
 """
 
-import datetime
+from __future__ import annotations
+
 import gc
 import os
+import tempfile
 from calendar import isleap
 
-import geopandas as gpd
-import gsee
-import pandas as pd
-import psutil
-import xarray as xr
-
-from acept import acept_utils
 from acept.acept_constants import TEMP_PATH
+from acept.artifact_store import ArtifactStore, artifact_key, geometry_digest, get_artifact_store
 from acept.dwd_try_data_handling import DWD_MIN_YEAR, DWD_MAX_YEAR, read_dwd_netcdf_file, preprocess_dwd_try_dataset, \
     preprocess_combined_dwd_try_dataset, check_for_un_compressed_dwd_try_data, check_for_dwd_try_data_year
 from acept.exceptions import ValueOutsideRangeError
+from acept.instrumentation import span
+from acept.lazy_imports import lazy_import
 from acept.uhp_csv_io import write_geopandas_to_uhp_csv
 from acept.weather_profile_api import build_weather_profile_for_typical_meteorological_year
 
+gpd = lazy_import("geopandas")
+gsee = lazy_import("gsee")
+pd = lazy_import("pandas")
+xr = lazy_import("xarray", companions=("rioxarray",))
+
 
 # ----- Building PV capacity factor profiles without using the renewables.ninja rate-limited API
 
 
-def build_pv_capacity_for_selected_years(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
-                                         year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
-                                         building_specific_weather: bool = False,
-                                         debug: bool = True) -> str:
+PV_WEATHER_SOURCES = ("try", "combined_try", "combined_try_uncompressed", "tmy")
+"""Weather data the PV capacity factor profiles are calculated from: the DWD TRY files of the single features (``try``),
+the combined DWD TRY files (``combined_try``, ``combined_try_uncompressed``) or the TMY of the PVGIS API (``tmy``)."""
+PV_CAPACITY_HEADER = ['PV Capacity Factor']
+"""Header of the PV capacity factor profiles in the UHP format. The second row contains the column ``bid_{bid}``."""
+
+
+def run_pv_model(input_weather: pd.DataFrame, lat: float, lon: float) -> pd.Series:
     """
-    Build PV capacity factor profiles for all years between year_start and year_end for all given buildings from the
-    DWD TRY data. The weather data is expected as downloaded from the DWD OPENDATA portal. The profiles will be saved in
-    a temporary directory in the :py:const:`acept.acept_constants.TEMP_PATH` directory as one CSV file per building per year.
+    Runs the GSEE PV model for a fixed PV system with 1 W capacity at the location.
+    """
+    return gsee.pv.run_model(
+        input_weather,
+        coords=(lat, lon),  # Latitude and longitude
+        tilt=30,  # 30 degrees tilt angle
+        azim=180,  # facing towards the equator,
+        tracking=0,  # fixed - no tracking
+        capacity=1.0,  # 1 W
+        system_loss=0.1,  # 10% loss
+    )
+
+
+def _iter_monthly_pv_capacity_profiles(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
+                                       year_start: int, year_end: int, weather_source: str,
+                                       building_specific_weather: bool = False, debug: bool = True):
+    """
+    Yields the hourly PV capacity factor profiles of all buildings calculated from the DWD TRY data month by month.
+
+    The data of the single DWD TRY files (``try``) is clipped to the selected shape, the combined files are not clipped
+    to save the runtime of the clipping.
 
     :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
     :param buildings: GeoDataFrame containing the buildings.
-    :param year_start: Start year of the PV capacity factor profiles. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
-    :param year_end: End year of the PV capacity factor profiles. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
+    :param year_start: First year.
+    :param year_end: Last year.
+    :param weather_source: ``try``, ``combined_try`` or ``combined_try_uncompressed``.
     :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
     :param debug: Whether to print debug messages. Defaults to True.
-    :raises ValueOutsideRangeError: If year_start or year_end are outside the valid range (see DWD_MAX_RANGE)
-    :return: Path to the directory containing the created CSV files.
+    :return: Generator of the year, the month and a DataFrame with the profiles of the month as columns
+        ``bid_{bid}`` sorted by bid.
     """
-    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
-        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
-    # Use the current time as an identifier
-    current_time = datetime.datetime.now()
-    run_id = current_time.strftime("%Y%m%d%H%M%S")
-
-    # ---------
     dwd_features = ['temperature', 'rad_direct', 'rad_global']
     # buildings needs gpd.GeoDataFrame(buildings, columns=['bid', 'lat', 'lon', 'geometry'])
     buildings.sort_values('bid', inplace=True)
@@ -82,55 +103,60 @@ def build_pv_capacity_for_selected_years(selected_shape: gpd.GeoDataFrame, build
     buildings.to_crs(epsg=3034, inplace=True)
     if debug:
         print("selected_shape.crs:", selected_shape.crs)
+        print("buildings.crs:", buildings.crs)
 
     for year_spec in range(year_start, year_end + 1):
         for month_spec in range(1, 13):
-            if debug:
-                print("Free Memory @ begin of month:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-
-            # collect data for all relevant DWD TRY features: temperature, SID, SIS
-            try_clipped: xr.Dataset = None
-            for try_feature in dwd_features:
-                wd_data = read_dwd_netcdf_file(try_feature, year=year_spec, month=month_spec, debug=debug)
-
-                wd_data = preprocess_dwd_try_dataset(wd_data, try_feature, debug=debug)
-
-                # ---------
-                # ### Clipping
-                # all_touched – If True, all pixels touched by geometries will be burned in.
-                # If false, only pixels whose center is within the polygon or that are selected by Bresenham’s line
-                # algorithm will be burned in.
-                wd_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs,
-                                                          all_touched=True)
-
-                # free up memory
+            span_attributes = {"builder": "pv_capacity", "year": year_spec, "month": month_spec}
+            if weather_source == "try":
+                # collect data for all relevant DWD TRY features: temperature, SID, SIS
+                wd_clipped: xr.Dataset = None
+                for try_feature in dwd_features:
+                    with span("read", **span_attributes):
+                        wd_data = read_dwd_netcdf_file(try_feature, year=year_spec, month=month_spec, debug=debug)
+
+                    with span("preprocess", **span_attributes):
+                        wd_data = preprocess_dwd_try_dataset(wd_data, try_feature, debug=debug)
+
+                    # ---------
+                    # ### Clipping
+                    # all_touched – If True, all pixels touched by geometries will be burned in.
+                    # If false, only pixels whose center is within the polygon or that are selected by Bresenham’s
+                    # line algorithm will be burned in.
+                    with span("clip", **span_attributes):
+                        feature_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values,
+                                                                       selected_shape.crs, all_touched=True)
+
+                    # free up memory
+                    del wd_data
+
+                    # collect clipped data in one dataset
+                    if wd_clipped is None:
+                        wd_clipped = feature_clipped
+                    else:
+                        wd_clipped[try_feature] = feature_clipped[try_feature]
+                    del feature_clipped
+            else:
+                with span("read", **span_attributes):
+                    wd_data = read_dwd_netcdf_file(weather_source, year=year_spec, month=month_spec, debug=debug)
+
+                with span("preprocess", **span_attributes):
+                    wd_data = preprocess_combined_dwd_try_dataset(wd_data, debug=debug)
+                # ### Clipping: only use to trade of saving memory for a longer runtime
+                # wd_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs,
+                #                                           all_touched=True)
+                wd_clipped = wd_data
                 del wd_data
-                if debug:
-                    print("Free Memory w/o wd_data:",
-                          psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-                # ---------
-
-                # collect clipped data in one dataset
-                if try_clipped is None:
-                    try_clipped = wd_clipped
-                else:
-                    try_clipped[try_feature] = wd_clipped[try_feature]
-
-                del wd_clipped
-                if debug:
-                    print("Free Memory w/o wd_clipped:",
-                          psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
 
             if not building_specific_weather:
                 x = selected_shape.iloc[0].geometry.centroid.x
                 y = selected_shape.iloc[0].geometry.centroid.y
-                weather = try_clipped.sel(X=x, Y=y, method="nearest")
+                weather = wd_clipped.sel(X=x, Y=y, method="nearest")
                 input_weather = calculate_gsee_input_weather_from_raw_weather(weather)
 
             # ---------
-            # calculate PV capacity per hour for each building in the month year, append to csv per building
-            # maybe use one csv with buildings as columns, rows as hourly timestamps and values as PV capacity?
+            # calculate PV capacity per hour for each building in the month
+            monthly_profiles = {}
             for building in buildings.index:
                 # try_crs = ccrs.epsg(3034)
                 lon, lat = buildings.loc[building, 'lon'], buildings.loc[building, 'lat']
@@ -139,63 +165,101 @@ def build_pv_capacity_for_selected_years(selected_shape: gpd.GeoDataFrame, build
                 if building_specific_weather:
                     x = buildings.loc[building, "geometry"].centroid.x
                     y = buildings.loc[building, "geometry"].centroid.y
-                    weather = try_clipped.sel(X=x, Y=y, method="nearest")
+                    weather = wd_clipped.sel(X=x, Y=y, method="nearest")
                     input_weather = calculate_gsee_input_weather_from_raw_weather(weather)
 
-                pv_capacity_result: pd.Series = gsee.pv.run_model(
-                    input_weather,
-                    coords=(lat, lon),  # Latitude and longitude
-                    tilt=30,  # 30 degrees tilt angle
-                    azim=180,  # facing towards the equator,
-                    tracking=0,  # fixed - no tracking
-                    capacity=1.0,  # 1 W
-                    system_loss=0.1,  # 10% loss
-                )
+                with span("model", **span_attributes):
+                    monthly_profiles[f"bid_{buildings.loc[building, 'bid']}"] = run_pv_model(input_weather, lat, lon)
 
                 if building_specific_weather:
                     del input_weather
 
-                # write result to csv file
-                temp_csv_output_path = os.path.join(TEMP_PATH, run_id,
-                                                    f"building_{buildings.loc[building, 'bid']}_pv_capacity_{year_spec}.csv")
-                os.makedirs(acept_utils.uppath(temp_csv_output_path, 1), exist_ok=True)
-
-                # add unit info and header according to UHP only at the beginning of the file
-                if not os.path.exists(temp_csv_output_path):
-                    header_temp = ['PV Capacity Factor']
-                    unit_info = pd.DataFrame([[f"bid_{buildings.loc[building, 'bid']}"]], columns=header_temp)
-                    unit_info.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, columns=header_temp,
-                                     header=True)
-
-                with open(temp_csv_output_path) as f:
-                    hours_in_year = (366 if isleap(year_spec) else 365) * 24
-                    if sum(1 for _ in f) < hours_in_year + 2:
-                        # append to csv
-                        pv_capacity_result.to_csv(temp_csv_output_path, mode='a', sep=";", index=False,
-                                                  header=False)
-                    else:
-                        print("already 8760 time steps (hours) in the csv file of the temperature profile for ",
-                              year_spec, buildings.loc[building, 'bid'])
-
-                del pv_capacity_result
-                if debug:
-                    print("Free Memory @ end of building w/o pv_capacity_result:",
-                          psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-                pass
-            del try_clipped
-            if debug:
-                print("Free Memory @ end of month:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
+            del wd_clipped
+            yield year_spec, month_spec, pd.DataFrame(monthly_profiles)
+
+            del monthly_profiles
             # force garbage collection to keep the memory usage acceptable
             gc.collect()
-    return acept_utils.uppath(temp_csv_output_path, 1)
+
+
+def _append_pv_capacity_profiles_to_csv(monthly_profiles: pd.DataFrame, output_dir: str, year: int):
+    """
+    Appends the PV capacity factor profiles of a month to the CSV files of the buildings for the year. The header and
+    the row with the building ID are written to new files.
+
+    :param monthly_profiles: The profiles of the month as columns ``bid_{bid}``.
+    :param output_dir: Directory of the CSV files.
+    :param year: Year of the profiles.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    hours_in_year = (366 if isleap(year) else 365) * 24
+    for column in monthly_profiles.columns:
+        temp_csv_output_path = os.path.join(output_dir,
+                                            f"building_{column.removeprefix('bid_')}_pv_capacity_{year}.csv")
+
+        # add unit info and header according to UHP only at the beginning of the file
+        if not os.path.exists(temp_csv_output_path):
+            unit_info = pd.DataFrame([[column]], columns=PV_CAPACITY_HEADER)
+            unit_info.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, columns=PV_CAPACITY_HEADER,
+                             header=True)
+
+        with open(temp_csv_output_path) as f:
+            if sum(1 for _ in f) < hours_in_year + 2:
+                # append to csv
+                monthly_profiles[column].to_csv(temp_csv_output_path, mode='a', sep=";", index=False, header=False)
+            else:
+                print("already 8760 time steps (hours) in the csv file of the PV capacity factor profile for ", year,
+                      column)
+
+
+def _with_pv_capacity_metadata(pv_capacity_profiles: pd.DataFrame, year: int | None, weather_source: str,
+                               building_specific_weather: bool) -> pd.DataFrame:
+    """
+    Adds the metadata of the PV capacity factor profiles to their ``attrs``.
+    """
+    pv_capacity_profiles.attrs.update(year=year, weather_source=weather_source,
+                                      building_specific_weather=building_specific_weather)
+    return pv_capacity_profiles
+
+
+def build_pv_capacity_for_selected_years(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
+                                         year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
+                                         building_specific_weather: bool = False,
+                                         debug: bool = True, output_dir: str | None = None) -> str:
+    """
+    Build PV capacity factor profiles for all years between year_start and year_end for all given buildings from the
+    DWD TRY data. The weather data is expected as downloaded from the DWD OPENDATA portal. The profiles will be saved in
+    a temporary directory in the :py:const:`acept.acept_constants.TEMP_PATH` directory as one CSV file per building per year.
+
+    :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
+    :param buildings: GeoDataFrame containing the buildings.
+    :param year_start: Start year of the PV capacity factor profiles. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
+    :param year_end: End year of the PV capacity factor profiles. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
+    :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
+    :param debug: Whether to print debug messages. Defaults to True.
+    :param output_dir: Directory to save the CSV files in. Defaults to a new directory in the
+        :py:const:`acept.acept_constants.TEMP_PATH` directory.
+    :raises ValueOutsideRangeError: If year_start or year_end are outside the valid range (see DWD_MAX_RANGE)
+    :return: Path to the directory containing the created CSV files.
+    """
+    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
+        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
+    if output_dir is None:
+        os.makedirs(TEMP_PATH, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix="pv_capacity_", dir=TEMP_PATH)
+
+    for year_spec, month_spec, monthly_profiles in _iter_monthly_pv_capacity_profiles(
+            selected_shape, buildings, year_start, year_end, "try", building_specific_weather, debug):
+        with span("write", builder="pv_capacity", year=year_spec, month=month_spec):
+            _append_pv_capacity_profiles_to_csv(monthly_profiles, output_dir, year_spec)
+    return output_dir
 
 
 def build_pv_capacity_for_selected_year_with_combined_data(selected_shape: gpd.GeoDataFrame,
                                                            buildings: gpd.GeoDataFrame, year: int = 2011,
                                                            uncompressed: bool = False,
                                                            building_specific_weather: bool = False,
-                                                           debug: bool = True) -> str:
+                                                           debug: bool = True, output_dir: str | None = None) -> str:
     """
     Build PV capacity factor profiles for a single year between for all given buildings from the
     DWD TRY data. The weather data is expected as combined files for the different features - use the
@@ -208,20 +272,22 @@ def build_pv_capacity_for_selected_year_with_combined_data(selected_shape: gpd.G
     :param uncompressed: Whether to use uncompressed DWD TRY data files. Defaults to False.
     :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
     :param debug: Whether to print debug messages. Defaults to True.
+    :param output_dir: Directory to save the CSV files in. Defaults to a new directory in the
+        :py:const:`acept.acept_constants.TEMP_PATH` directory.
     :return: Path to the directory containing the created CSV files.
     """
     return build_pv_capacity_for_selected_years_with_combined_data(selected_shape=selected_shape, buildings=buildings,
                                                                    year_start=year, year_end=year,
                                                                    uncompressed=uncompressed,
                                                                    building_specific_weather=building_specific_weather,
-                                                                   debug=debug)
+                                                                   debug=debug, output_dir=output_dir)
 
 
 def build_pv_capacity_for_selected_years_with_combined_data(selected_shape: gpd.GeoDataFrame,
                                                             buildings: gpd.GeoDataFrame, year_start: int = DWD_MIN_YEAR,
                                                             year_end: int = DWD_MAX_YEAR, uncompressed: bool = False,
                                                             building_specific_weather: bool = False,
-                                                            debug: bool = True):
+                                                            debug: bool = True, output_dir: str | None = None) -> str:
     """
     Build PV capacity factor profiles for all years between year_start and year_end for all given buildings from the
     DWD TRY data. The weather data is expected as combined files for the different features - use the
@@ -237,125 +303,67 @@ def build_pv_capacity_for_selected_years_with_combined_data(selected_shape: gpd.
     :param uncompressed: Whether to use uncompressed DWD TRY data files. Defaults to False.
     :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
     :param debug: Whether to print debug messages. Defaults to True.
+    :param output_dir: Directory to save the CSV files in. Defaults to a new directory in the
+        :py:const:`acept.acept_constants.TEMP_PATH` directory.
     :raises ValueOutsideRangeError: If year_start or year_end is outside the allowed range (see DWD_MAX_RANGE).
     :return: Path to the directory containing the created CSV files.
     """
     if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
         raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
-    # Use the current time as an identifier
-    current_time = datetime.datetime.now()
-    run_id = current_time.strftime("%Y%m%d%H%M%S")
-
-    # ---------
-
-    # buildings needs gpd.GeoDataFrame(buildings, columns=['bid', 'lat', 'lon', 'geometry'])
-    buildings.sort_values('bid', inplace=True)
-
-    # convert to projection of DWD try data
-    selected_shape.to_crs(epsg=3034, inplace=True)
-    buildings.to_crs(epsg=3034, inplace=True)
-    if debug:
-        print("selected_shape.crs:", selected_shape.crs)
-        print("buildings.crs:", buildings.crs)
-
-    for year_spec in range(year_start, year_end + 1):
-        for month_spec in range(1, 13):
-            if debug:
-                print("Free Memory @ begin of month:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-
-            if uncompressed:
-                wd_data = read_dwd_netcdf_file("combined_try_uncompressed", year=year_spec, month=month_spec,
-                                               debug=debug)
-            else:
-                wd_data = read_dwd_netcdf_file("combined_try", year=year_spec, month=month_spec, debug=debug)
-
-            wd_data = preprocess_combined_dwd_try_dataset(wd_data, debug=debug)
-            wd_clipped = wd_data
-
-            # ---------
-            # ### Clipping: only use to trade of saving memory for a longer runtime
-            # wd_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs,
-            #                                           all_touched=True)
-
-            # free up memory
-            del wd_data
-            if debug:
-                print("Free Memory w/o wd_data:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-
-            if not building_specific_weather:
-                x = selected_shape.iloc[0].geometry.centroid.x
-                y = selected_shape.iloc[0].geometry.centroid.y
-                weather = wd_clipped.sel(X=x, Y=y, method="nearest")
-                input_weather = calculate_gsee_input_weather_from_raw_weather(weather)
-
-            # ---------
-            # calculate PV capacity per hour for each building in the month year, append to csv per building
-            # maybe use one csv with buildings as columns, rows as hourly timestamps and values as PV capacity?
-            for building in buildings.index:
-                # all buildings to one file or each building to its own file?
-                # try_crs = ccrs.epsg(3034)
-                lon, lat = buildings.loc[building, 'lon'], buildings.loc[building, 'lat']
-                # # Transform the location from src_crs for lat/lon grid to try_crs
-                # x, y = try_crs.transform_point(lon, lat, src_crs=ccrs.Geodetic())
-
-                if building_specific_weather:
-                    x = buildings.loc[building, "geometry"].centroid.x
-                    y = buildings.loc[building, "geometry"].centroid.y
-                    weather = wd_clipped.sel(X=x, Y=y, method="nearest")
-                    input_weather = calculate_gsee_input_weather_from_raw_weather(weather)
-                # -----
-
-                pv_capacity_result: pd.Series = gsee.pv.run_model(
-                    input_weather,
-                    coords=(lat, lon),  # Latitude and longitude
-                    tilt=30,  # 30 degrees tilt angle
-                    azim=180,  # facing towards the equator,
-                    tracking=0,  # fixed - no tracking
-                    capacity=1.0,  # 1 W
-                    system_loss=0.1,  # 10% loss
-                )
-
-                if building_specific_weather:
-                    del input_weather
+    if output_dir is None:
+        os.makedirs(TEMP_PATH, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix="pv_capacity_", dir=TEMP_PATH)
+
+    weather_source = "combined_try_uncompressed" if uncompressed else "combined_try"
+    for year_spec, month_spec, monthly_profiles in _iter_monthly_pv_capacity_profiles(
+            selected_shape, buildings, year_start, year_end, weather_source, building_specific_weather, debug):
+        with span("write", builder="pv_capacity", year=year_spec, month=month_spec):
+            _append_pv_capacity_profiles_to_csv(monthly_profiles, output_dir, year_spec)
+    return output_dir
+
+
+def compute_pv_capacity_for_selected_years(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
+                                           year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
+                                           weather_source: str = "combined_try_uncompressed",
+                                           building_specific_weather: bool = False,
+                                           debug: bool = True) -> dict[int, pd.DataFrame]:
+    """
+    Compute PV capacity factor profiles for all years between year_start and year_end for all given buildings from the
+    DWD TRY data without saving them.
 
-                # write result to csv file
-                # TODO find suitable file naming scheme
-                temp_csv_output_path = os.path.join(TEMP_PATH, run_id,
-                                                    f"building_{buildings.loc[building, 'bid']}_pv_capacity_{year_spec}.csv")
-                os.makedirs(acept_utils.uppath(temp_csv_output_path, 1), exist_ok=True)
-
-                # add unit info and header according to UHP only at the beginning of the file
-                if not os.path.exists(temp_csv_output_path):
-                    header_temp = ['PV Capacity Factor']
-                    unit_info = pd.DataFrame([[f"bid_{buildings.loc[building, 'bid']}"]], columns=header_temp)
-                    unit_info.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, columns=header_temp,
-                                     header=True)
-
-                with open(temp_csv_output_path) as f:
-                    hours_in_year = (366 if isleap(year_spec) else 365) * 24
-                    if sum(1 for _ in f) < hours_in_year + 2:
-                        # append to csv
-                        pv_capacity_result.to_csv(temp_csv_output_path, mode='a', sep=";", index=False,
-                                                  header=False)
-                    else:
-                        print("already 8760 time steps (hours) in the csv file of the temperature profile for ",
-                              year_spec, buildings.loc[building, 'bid'])
+    Each result is a DataFrame with the hourly PV capacity factor of each building as column ``bid_{bid}`` (sorted by
+    bid) and the time steps as index. Its ``attrs`` contain the metadata of the profiles: ``year``,
+    ``weather_source`` and ``building_specific_weather``. Use :py:func:`save_pv_capacity_profiles` to save the profiles
+    as one CSV file per building.
 
-                del pv_capacity_result
-                if debug:
-                    print("Free Memory w/o pv_capacity_result:",
-                          psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-                pass
+    :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
+    :param buildings: GeoDataFrame containing the buildings.
+    :param year_start: First year the PV capacity factor profiles are calculated for. Must be between DWD_MIN_YEAR and
+        DWD_MAX_YEAR.
+    :param year_end: Last year the PV capacity factor profiles are calculated for. Must be between DWD_MIN_YEAR and
+        DWD_MAX_YEAR.
+    :param weather_source: The DWD TRY data to use: ``try``, ``combined_try`` or ``combined_try_uncompressed``.
+        Defaults to ``combined_try_uncompressed``.
+    :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
+    :param debug: Whether to print debug messages. Defaults to True.
+    :raises ValueOutsideRangeError: If year_start or year_end is outside the allowed range (see DWD_MAX_RANGE).
+    :raises ValueError: If weather_source is not a DWD TRY weather source.
+    :return: The PV capacity factor profiles by year.
+    """
+    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
+        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
+    if weather_source not in PV_WEATHER_SOURCES[:3]:
+        raise ValueError(f"Invalid weather_source {weather_source}. Valid values are "
+                         f"{', '.join(PV_WEATHER_SOURCES[:3])}.")
 
-            del wd_clipped
-            if debug:
-                print("Free Memory @ end of month:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-            # force garbage collection to keep the memory usage acceptable
-            gc.collect()
-    return acept_utils.uppath(temp_csv_output_path, 1)
+    monthly_profiles = {}
+    for year_spec, _, profiles in _iter_monthly_pv_capacity_profiles(selected_shape, buildings, year_start, year_end,
+                                                                     weather_source, building_specific_weather,
+                                                                     debug):
+        monthly_profiles.setdefault(year_spec, []).append(profiles)
+    return {year_spec: _with_pv_capacity_metadata(pd.concat(profiles), year_spec, weather_source,
+                                                  building_specific_weather)
+            for year_spec, profiles in monthly_profiles.items()}
 
 
 def calculate_gsee_input_weather_from_raw_weather(weather: xr.Dataset | pd.DataFrame,
@@ -381,60 +389,145 @@ def calculate_gsee_input_weather_from_raw_weather(weather: xr.Dataset | pd.DataF
     return input_weather
 
 
+def select_pv_weather_source(year: int | None) -> str:
+    """
+    Selects the weather data for PV capacity factor profiles of the selected year from the downloaded DWD TRY data.
+
+    The uncompressed combined DWD TRY data is preferred over the compressed combined data and the single DWD TRY
+    files. If the year is None or no DWD TRY data is downloaded for the year, the TMY is used.
+
+    :param year: Year of the PV capacity factor profiles, or None for the TMY.
+    :return: The weather source, one of :py:const:`PV_WEATHER_SOURCES`.
+    """
+    if year is None:
+        return "tmy"
+    if check_for_un_compressed_dwd_try_data(compressed=False, year_start=year, year_end=year):
+        return "combined_try_uncompressed"
+    if check_for_un_compressed_dwd_try_data(compressed=True, year_start=year, year_end=year):
+        print("The weather data is compressed. Combine and uncompress the data for year", year, "to get a better "
+                                                                                                "response time.")
+        return "combined_try"
+    if check_for_dwd_try_data_year(year, ['temperature', 'rad_direct', 'rad_global']):
+        print("The weather data is compressed and not combined to a single file per month. Combine and uncompress the "
+              "data for year", year, "to get a better response time.")
+        return "try"
+    # fall back to use TMY weather if the data is not downloaded
+    return "tmy"
+
+
+def compute_pv_capacity_profile_for_year(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
+                                         year: int | None, debug: bool = True) -> pd.DataFrame:
+    """
+    Compute PV capacity factor profiles for a single year for all given buildings without saving them.
+
+    The weather data is selected like in :py:func:`build_pv_capacity_profile_for_year`, see
+    :py:func:`select_pv_weather_source`. The profiles and their metadata are described in
+    :py:func:`compute_pv_capacity_for_selected_years`. The year in the metadata is None if the TMY is used.
+
+    :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
+    :param buildings: GeoDataFrame containing the buildings.
+    :param year: Year the PV capacity factor profiles are calculated for. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
+        If None, the PV capacity factor profiles are calculated for the typical meteorological year (TMY).
+    :param debug: Whether to print debug messages. Defaults to True.
+    :return: The PV capacity factor profiles as columns ``bid_{bid}``.
+    """
+    weather_source = select_pv_weather_source(year)
+    if weather_source == "tmy":
+        return compute_pv_capacity_profile_based_on_tmy_weather(selected_shape, buildings, debug=debug)
+    return compute_pv_capacity_for_selected_years(selected_shape, buildings, year, year, weather_source,
+                                                  debug=debug)[year]
+
+
 def build_pv_capacity_profile_for_year(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame, year: int | None,
-                                       debug: bool = True):
+                                       debug: bool = True, store: ArtifactStore | None = None) -> str:
     """
     Build PV capacity factor profiles for a single year for all given buildings from the DWD TRY data. The profiles are
-    saved in a temporary directory in the :py:const:`acept.acept_constants.TEMP_PATH` directory as one CSV file per building.
+    saved in the artifact store (see :py:mod:`acept.artifact_store`) as one CSV file per building. If the profiles were
+    already built for the same shape, buildings, year and weather data, the stored profiles are used.
+    Use :py:func:`compute_pv_capacity_profile_for_year` to get the profiles as DataFrame without saving them.
 
     :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
     :param buildings: GeoDataFrame containing the buildings.
     :param year: Year the PV capacity factor profiles are calculated for. Must be between DWD_MIN_YEAR and DWD_MAX_YEAR.
         If None, the PV capacity factor profiles are calculated for the typical meteorological year (TMY).
     :param debug: Whether to print debug messages. Defaults to True.
+    :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
     :return: Path to the directory containing the created CSV files.
     """
-    if year is None:
-        return calculate_pv_capacity_profile_based_on_tmy_weather(selected_shape, buildings, debug=debug)
-    if check_for_un_compressed_dwd_try_data(compressed=False, year_start=year, year_end=year):
-        temp_dir = build_pv_capacity_for_selected_year_with_combined_data(selected_shape, buildings, year,
-                                                                          uncompressed=True, debug=debug)
-    elif check_for_un_compressed_dwd_try_data(compressed=True, year_start=year, year_end=year):
-        print("The weather data is compressed. Combine and uncompress the data for year", year, "to get a better "
-                                                                                                "response time.")
-        temp_dir = build_pv_capacity_for_selected_year_with_combined_data(selected_shape, buildings, year,
-                                                                          uncompressed=False, debug=debug)
-    elif check_for_dwd_try_data_year(year, ['temperature', 'rad_direct', 'rad_global']):
-        print("The weather data is compressed and not combined to a single file per month. Combine and uncompress the "
-              "data for year", year, "to get a better response time.")
-        temp_dir = build_pv_capacity_for_selected_years(selected_shape, buildings, year, year, debug=debug)
-    else:
-        # fall back to use TMY weather if the data is not downloaded
-        return calculate_pv_capacity_profile_based_on_tmy_weather(selected_shape, buildings, debug=debug)
-    return temp_dir
+    weather_source = select_pv_weather_source(year)
+
+    if store is None:
+        store = get_artifact_store()
+    # the builders change the crs of the inputs, so the geometries are compared independent of their crs
+    key = artifact_key("build_pv_capacity_profile_for_year", selected_shape=geometry_digest(selected_shape),
+                       bids=buildings["bid"].to_numpy(), buildings=geometry_digest(buildings),
+                       year=year if weather_source != "tmy" else None, weather_source=weather_source)
+    temp_dir = store.lookup(key)
+    if temp_dir is not None:
+        if debug:
+            print("Using stored PV capacity factor profiles", key)
+        return temp_dir
+
+    # the DWD TRY builders append the profiles month by month, so the profiles of all buildings are not kept in memory
+    with store.write(key) as output_dir:
+        if weather_source == "tmy":
+            calculate_pv_capacity_profile_based_on_tmy_weather(selected_shape, buildings, debug=debug,
+                                                               output_dir=output_dir)
+        elif weather_source == "try":
+            build_pv_capacity_for_selected_years(selected_shape, buildings, year, year, debug=debug,
+                                                 output_dir=output_dir)
+        else:
+            build_pv_capacity_for_selected_year_with_combined_data(
+                selected_shape, buildings, year, uncompressed=weather_source == "combined_try_uncompressed",
+                debug=debug, output_dir=output_dir)
+    store.collect_garbage()
+    return store.entry_path(key)
+
+
+def save_pv_capacity_profiles(pv_capacity_profiles: pd.DataFrame, output_dir: str | None = None) -> str:
+    """
+    Saves PV capacity factor profiles as one CSV file per building, in the same format as the builders of this module:
+    ``building_{bid}_pv_capacity_{year}.csv``, or ``building_{bid}_pv_capacity_tmy_weather.csv`` if the year in the
+    metadata of the profiles is None.
+
+    :param pv_capacity_profiles: The profiles as columns ``bid_{bid}``, e.g. from
+        :py:func:`compute_pv_capacity_profile_for_year`.
+    :param output_dir: Directory to save the CSV files in. Defaults to a new directory in the
+        :py:const:`acept.acept_constants.TEMP_PATH` directory.
+    :return: Path to the directory containing the created CSV files.
+    """
+    if output_dir is None:
+        os.makedirs(TEMP_PATH, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix="pv_capacity_", dir=TEMP_PATH)
+    year = pv_capacity_profiles.attrs.get("year")
+    file_suffix = "tmy_weather" if year is None else str(year)
+    with span("write", builder="pv_capacity", year=year):
+        for column in pv_capacity_profiles.columns:
+            temp_csv_output_path = os.path.join(output_dir,
+                                                f"building_{column.removeprefix('bid_')}_pv_capacity_{file_suffix}.csv")
+            write_geopandas_to_uhp_csv(temp_csv_output_path, pv_capacity_profiles[column],
+                                       first_row_header=PV_CAPACITY_HEADER, second_row_info=[column], sep=";")
+    return output_dir
 
 
 #####################################################################################################
 
 # Use weather API of PVGIS to get the input weather data
 
-def calculate_pv_capacity_profile_based_on_tmy_weather(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
-                                                       building_specific_weather: bool = False,
-                                                       debug: bool = True):
+def compute_pv_capacity_profile_based_on_tmy_weather(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
+                                                     building_specific_weather: bool = False,
+                                                     debug: bool = True) -> pd.DataFrame:
     """
-    Build PV capacity factor profiles for a typical meteorological year (TMY) for all given buildings from the
-    using the PVGIS weather API. The profiles will be saved in a temporary directory in the :py:const:`acept.acept_constants.TEMP_PATH` directory as
-    one CSV file per building.
+    Compute PV capacity factor profiles for a typical meteorological year (TMY) for all given buildings using the PVGIS
+    weather API without saving them. The profiles and their metadata are described in
+    :py:func:`compute_pv_capacity_for_selected_years`, the year in the metadata is None.
 
     :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
     :param buildings: GeoDataFrame containing the buildings.
     :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
     :param debug: Whether to print debug messages. Defaults to True.
+    :return: The PV capacity factor profiles as columns ``bid_{bid}``.
     """
-    # Use the current time as an identifier
-    current_time = datetime.datetime.now()
-    run_id = current_time.strftime("%Y%m%d%H%M%S")
-
     # buildings needs gpd.GeoDataFrame(buildings, columns=['bid', 'lat', 'lon', 'geometry'])
     buildings.sort_values('bid', inplace=True)
 
@@ -446,50 +539,60 @@ def calculate_pv_capacity_profile_based_on_tmy_weather(selected_shape: gpd.GeoDa
         print("selected_shape.crs:", selected_shape.crs)
         print("buildings.crs:", buildings.crs)
 
+    span_attributes = {"builder": "pv_capacity", "year": None}
     if not building_specific_weather:
         lon_center = selected_shape.iloc[0].geometry.centroid.x
         lat_center = selected_shape.iloc[0].geometry.centroid.y
-        input_weather = get_tmy_as_input_weather_for_gsee_pv_cap(lat_center, lon_center)
+        with span("read", **span_attributes):
+            input_weather = get_tmy_as_input_weather_for_gsee_pv_cap(lat_center, lon_center)
 
     # ---------
-    # calculate PV capacity per hour for each building in the month year, append to csv per building
-    # maybe use one csv with buildings as columns, rows as hourly timestamps and values as PV capacity?
+    # calculate PV capacity per hour for each building
     if 'lat' not in buildings.columns or 'lon' not in buildings.columns:
         buildings["lat"] = buildings["geometry"].centroid.x
         buildings["lon"] = buildings["geometry"].centroid.y
 
+    pv_capacity_profiles = {}
     for building in buildings.index:
         lon, lat = buildings.loc[building, 'lon'], buildings.loc[building, 'lat']
 
         if building_specific_weather:
-            input_weather = get_tmy_as_input_weather_for_gsee_pv_cap(lat, lon)
+            with span("read", **span_attributes):
+                input_weather = get_tmy_as_input_weather_for_gsee_pv_cap(lat, lon)
         # -----
 
-        pv_capacity_result: pd.Series = gsee.pv.run_model(
-            input_weather,
-            coords=(lat, lon),  # Latitude and longitude
-            tilt=30,  # 30 degrees tilt angle
-            azim=180,  # facing towards the equator,
-            tracking=0,  # fixed - no tracking
-            capacity=1.0,  # 1 W
-            system_loss=0.1,  # 10% loss
-        )
+        with span("model", **span_attributes):
+            pv_capacity_profiles[f"bid_{buildings.loc[building, 'bid']}"] = run_pv_model(input_weather, lat, lon)
 
         if building_specific_weather:
             del input_weather
 
-        # write result to csv file
-        temp_csv_output_path = os.path.join(TEMP_PATH, run_id,
-                                            f"building_{buildings.loc[building, 'bid']}_pv_capacity_tmy_weather.csv")
-        os.makedirs(acept_utils.uppath(temp_csv_output_path, 1), exist_ok=True)
-        write_geopandas_to_uhp_csv(temp_csv_output_path, pv_capacity_result, first_row_header=['PV Capacity Factor'],
-                                   second_row_info=[f"bid_{buildings.loc[building, 'bid']}"], sep=";")
-
     # restore original crs for buildings
     buildings.to_crs(saved_crs, inplace=True)
     if debug:
         print("buildings.crs restored:", buildings.crs)
-    return acept_utils.uppath(temp_csv_output_path, 1)
+    return _with_pv_capacity_metadata(pd.DataFrame(pv_capacity_profiles), None, "tmy", building_specific_weather)
+
+
+def calculate_pv_capacity_profile_based_on_tmy_weather(selected_shape: gpd.GeoDataFrame, buildings: gpd.GeoDataFrame,
+                                                       building_specific_weather: bool = False,
+                                                       debug: bool = True, output_dir: str | None = None) -> str:
+    """
+    Build PV capacity factor profiles for a typical meteorological year (TMY) for all given buildings from the
+    using the PVGIS weather API. The profiles will be saved in a temporary directory in the :py:const:`acept.acept_constants.TEMP_PATH` directory as
+    one CSV file per building.
+
+    :param selected_shape: GeoDataFrame containing the shape of the area around the buildings.
+    :param buildings: GeoDataFrame containing the buildings.
+    :param building_specific_weather: Whether to use building specific weather data. Defaults to False.
+    :param debug: Whether to print debug messages. Defaults to True.
+    :param output_dir: Directory to save the CSV files in. Defaults to a new directory in the
+        :py:const:`acept.acept_constants.TEMP_PATH` directory.
+    :return: Path to the directory containing the created CSV files.
+    """
+    pv_capacity_profiles = compute_pv_capacity_profile_based_on_tmy_weather(selected_shape, buildings,
+                                                                            building_specific_weather, debug)
+    return save_pv_capacity_profiles(pv_capacity_profiles, output_dir)
 
 
 def get_tmy_as_input_weather_for_gsee_pv_cap(lat: float, lon: float) -> pd.DataFrame:
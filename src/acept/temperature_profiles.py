@@ -14,49 +14,86 @@ Use this module to:
     - Create a temperature profile for the selected area for a single year
     - Create a temperature profile for the TMY for the center of the selected area
     - Create a temperature profile for the selected area for multiple years
+    - Compute temperature profiles in memory without saving them, and save or read them separately
+    - Look up temperature profiles in the artifact store by area and year
+    - Find typical days of a temperature profile
 
 Use the :py:func:`acept.temperature_profiles.build_temperature_profile_for_year` function to build a temperature profile for a single
 year. This function builds temperature profiles based on the available weather data (DWD TRY or TMY) for the
-selected area.
+selected area. Use :py:func:`acept.temperature_profiles.compute_temperature_profile_for_year` to get the profile as
+pandas Series with its metadata instead, e.g. to pass it to the next step without writing and reading a CSV file.
 """
 
+from __future__ import annotations
+
 import gc
 import os
 from calendar import monthrange, isleap
 
-import geopandas as gpd
-import pandas as pd
-import psutil
-import rioxarray
-import xarray as xr
+import numpy as np
 
 from acept import acept_utils
 from acept import plz_shape
 from acept.acept_constants import TEMP_PATH
+from acept.artifact_store import ArtifactStore, artifact_key, geometry_digest, get_artifact_store
 from acept.dwd_try_data_handling import read_dwd_netcdf_file, preprocess_dwd_try_dataset, DWD_MIN_YEAR, DWD_MAX_YEAR, \
     preprocess_combined_dwd_try_dataset, check_for_un_compressed_dwd_try_data, check_for_dwd_try_data_year
 from acept.exceptions import ValueOutsideRangeError
-from acept.weather_profile_api import build_temperature_profile_for_tmy_to_uhp_csv
+from acept.instrumentation import span
+from acept.lazy_imports import lazy_import
+from acept.uhp_csv_io import read_uhp_csv_to_dataframe, write_geopandas_to_uhp_csv
+from acept.weather_profile_api import build_temperature_profile_for_tmy
 
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+rioxarray = lazy_import("rioxarray")
+xr = lazy_import("xarray", companions=("rioxarray",))
 
-def build_temperature_profiles_for_selected_years(plz_or_region: int | str, selected_shape: gpd.GeoDataFrame,
-                                                  year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
-                                                  debug: bool = True) -> str:
+
+TEMPERATURE_WEATHER_SOURCES = ("try", "combined_try", "combined_try_uncompressed", "tmy")
+"""Weather data the temperature profiles are created from: the DWD TRY temperature files (``try``), the combined DWD
+TRY files (``combined_try``, ``combined_try_uncompressed``) or the TMY of the PVGIS API (``tmy``)."""
+TEMPERATURE_PROFILE_HEADER = ['AMBIENT TEMPERATURE']
+"""Header of the temperature profiles in the UHP format."""
+TEMPERATURE_PROFILE_UNIT = ['degC']
+"""Unit row of the temperature profiles in the UHP format."""
+
+
+def select_temperature_weather_source(year: int | None) -> str:
     """
-    Creates a temperature profile for the selected year and the selected PLZ or Region using DWD TRY temperature data.
+    Selects the weather data for a temperature profile of the selected year from the downloaded DWD TRY data.
 
-    :param plz_or_region: PLZ or Region for which the temperature profile should be created (area ID).
+    The uncompressed combined DWD TRY data is preferred over the compressed combined data and the single DWD TRY
+    temperature files. If the year is None or no DWD TRY data is downloaded for the year, the TMY is used.
+
+    :param year: Year of the temperature profile, or None for the TMY.
+    :return: The weather source, one of :py:const:`TEMPERATURE_WEATHER_SOURCES`.
+    """
+    if year is None:
+        return "tmy"
+    if check_for_un_compressed_dwd_try_data(compressed=False, year_start=year, year_end=year):
+        return "combined_try_uncompressed"
+    if check_for_un_compressed_dwd_try_data(compressed=True, year_start=year, year_end=year):
+        return "combined_try"
+    if check_for_dwd_try_data_year(year, ["temperature"]):
+        return "try"
+    # Fall back to use the TMY if no data is downloaded for the selected year
+    return "tmy"
+
+
+def _iter_monthly_temperature_profiles(plz_or_region: str, selected_shape: gpd.GeoDataFrame, year_start: int,
+                                       year_end: int, weather_source: str, debug: bool = True):
+    """
+    Yields the hourly average temperature over the selected area from the DWD TRY data month by month.
+
+    :param plz_or_region: PLZ or Region of the selected area (area ID).
     :param selected_shape: GeoDataFrame of the selected area.
-    :param year_start: First year for which the temperature profile should be created. Defaults to 1995.
-    :param year_end: Last year for which the temperature profile should be created. Defaults to 2012.
+    :param year_start: First year.
+    :param year_end: Last year.
+    :param weather_source: ``try``, ``combined_try`` or ``combined_try_uncompressed``.
     :param debug: If True, print debug information.
-    :raises ValueOutsideRangeError: if year_start or year_end is outside the allowed range (1995-2012).
-    :return: Path to the directory where the created CSV files are stored.
+    :return: Generator of the year, the month and the hourly temperature profile of the month.
     """
-    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
-        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
-
-    plz_or_region = str(plz_or_region)
     if selected_shape is None and plz_or_region.isdigit() and len(plz_or_region) == 5:
         # get shape of queried plz
         selected_shape = plz_shape.get_single_plz_shape(plz_or_region)
@@ -64,33 +101,41 @@ def build_temperature_profiles_for_selected_years(plz_or_region: int | str, sele
     # convert to projection of DWD try data
     selected_shape = selected_shape.to_crs(epsg=3034)
     if debug:
-        print("plz_mask.crs:", selected_shape.crs)
+        print("selected_shape.crs:", selected_shape.crs)
 
     for year_spec in range(year_start, year_end + 1):
         for month_spec in range(1, 13):
-            if debug:
-                print("Free Memory 1:", psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-
-            wd_data = read_dwd_netcdf_file("temperature", year=year_spec, month=month_spec, debug=True)
+            span_attributes = {"builder": "temperature", "area": plz_or_region, "year": year_spec, "month": month_spec}
+            with span("read", **span_attributes):
+                if weather_source == "try":
+                    wd_data = read_dwd_netcdf_file("temperature", year=year_spec, month=month_spec, debug=True)
+                else:
+                    wd_data = read_dwd_netcdf_file(weather_source, year=year_spec, month=month_spec, debug=debug)
 
-            wd_data = preprocess_dwd_try_dataset(wd_data, "temperature")
+            with span("preprocess", **span_attributes):
+                if weather_source == "try":
+                    wd_data = preprocess_dwd_try_dataset(wd_data, "temperature")
+                else:
+                    wd_data = preprocess_combined_dwd_try_dataset(wd_data, debug)
+                    # reduce the dataset to the temperature data
+                    wd_data = wd_data.drop_vars(["rad_direct", "rad_global"])
 
             # ---------
             # ### Clipping
             # all_touched – If True, all pixels touched by geometries will be burned in.
             # If false, only pixels whose center is within the polygon or that are selected by Bresenham’s line
             # algorithm will be burned in.
-            wd_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs,
-                                                      all_touched=True)
+            with span("clip", **span_attributes):
+                wd_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs,
+                                                          all_touched=True)
 
             # free up memory
             del wd_data
-            if debug:
-                print("Free Memory 2:", psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
             # ---------
             # Create timeseries of average temperature for each hour over the PLZ area (clipped xarray)
-            avg_temp_over_hours = wd_clipped.mean(("X", "Y"))
-            avg_temp_over_hours_ds = avg_temp_over_hours.temperature.to_pandas()
+            with span("reduce", **span_attributes):
+                avg_temp_over_hours = wd_clipped.mean(("X", "Y"))
+                avg_temp_over_hours_ds = avg_temp_over_hours.temperature.to_pandas()
 
             hours_in_month = 24 * monthrange(year_spec, month_spec)[1]
             if avg_temp_over_hours_ds.shape[0] != hours_in_month:
@@ -99,37 +144,75 @@ def build_temperature_profiles_for_selected_years(plz_or_region: int | str, sele
 
             del wd_clipped
             del avg_temp_over_hours
-            if debug:
-                print("Free Memory w/o wd_clipped, avg_temp_over_hours:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-            # ---------
-            # append timeseries to csv
-            temp_csv_output_path = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}",
-                                                f"DWD_TRY_{plz_or_region}_{year_spec}.csv")
-            os.makedirs(acept_utils.uppath(temp_csv_output_path, 1), exist_ok=True)
-
-            # add unit info and header according to UHP only at the beginning of the file
-            if not os.path.exists(temp_csv_output_path):
-                header_temp = ['AMBIENT TEMPERATURE']
-                unit_info = pd.DataFrame([['degC']], columns=header_temp)
-                unit_info.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, columns=header_temp,
-                                 header=True)
-
-            with open(temp_csv_output_path) as f:
-                hours_in_year = (366 if isleap(year_spec) else 365) * 24
-                if sum(1 for _ in f) < hours_in_year + 2:
-                    # append to csv
-                    avg_temp_over_hours_ds.to_csv(temp_csv_output_path, mode='a', sep=";", index=False,
-                                                  header=False)
-                else:
-                    print("already 8760 time steps (hours) in the csv file of the temperature profile for ",
-                          year_spec, plz_or_region)
+            yield year_spec, month_spec, avg_temp_over_hours_ds
 
-            if debug:
-                print("Free Memory @ end of month:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
             # force garbage collection to keep the memory usage acceptable
             gc.collect()
+
+
+def _append_temperature_profile_to_csv(monthly_profile: pd.Series, plz_or_region: str, year: int) -> str:
+    """
+    Appends the temperature profile of a month to the CSV file of the year in the
+    :py:const:`acept.acept_constants.TEMP_PATH` directory. The header and the unit row are written to new files.
+
+    :param monthly_profile: The hourly temperature profile of the month.
+    :param plz_or_region: PLZ or Region of the profile (area ID).
+    :param year: Year of the profile.
+    :return: Path to the CSV file.
+    """
+    temp_csv_output_path = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}", f"DWD_TRY_{plz_or_region}_{year}.csv")
+    os.makedirs(acept_utils.uppath(temp_csv_output_path, 1), exist_ok=True)
+
+    # add unit info and header according to UHP only at the beginning of the file
+    if not os.path.exists(temp_csv_output_path):
+        unit_info = pd.DataFrame([TEMPERATURE_PROFILE_UNIT], columns=TEMPERATURE_PROFILE_HEADER)
+        unit_info.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, columns=TEMPERATURE_PROFILE_HEADER,
+                         header=True)
+
+    with open(temp_csv_output_path) as f:
+        hours_in_year = (366 if isleap(year) else 365) * 24
+        if sum(1 for _ in f) < hours_in_year + 2:
+            # append to csv
+            monthly_profile.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, header=False)
+        else:
+            print("already 8760 time steps (hours) in the csv file of the temperature profile for ", year,
+                  plz_or_region)
+    return temp_csv_output_path
+
+
+def _with_temperature_metadata(temperature_profile: pd.Series, plz_or_region: str, year: int | None,
+                               weather_source: str) -> pd.Series:
+    """
+    Names the temperature profile ``temperature`` and adds the metadata of the profile to its ``attrs``.
+    """
+    temperature_profile = temperature_profile.rename("temperature")
+    temperature_profile.attrs.update(area=plz_or_region, year=year, weather_source=weather_source,
+                                     unit=TEMPERATURE_PROFILE_UNIT[0])
+    return temperature_profile
+
+
+def build_temperature_profiles_for_selected_years(plz_or_region: int | str, selected_shape: gpd.GeoDataFrame,
+                                                  year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
+                                                  debug: bool = True) -> str:
+    """
+    Creates a temperature profile for the selected year and the selected PLZ or Region using DWD TRY temperature data.
+
+    :param plz_or_region: PLZ or Region for which the temperature profile should be created (area ID).
+    :param selected_shape: GeoDataFrame of the selected area.
+    :param year_start: First year for which the temperature profile should be created. Defaults to 1995.
+    :param year_end: Last year for which the temperature profile should be created. Defaults to 2012.
+    :param debug: If True, print debug information.
+    :raises ValueOutsideRangeError: if year_start or year_end is outside the allowed range (1995-2012).
+    :return: Path to the directory where the created CSV files are stored.
+    """
+    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
+        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
+
+    plz_or_region = str(plz_or_region)
+    for year_spec, month_spec, monthly_profile in _iter_monthly_temperature_profiles(
+            plz_or_region, selected_shape, year_start, year_end, "try", debug):
+        with span("write", builder="temperature", area=plz_or_region, year=year_spec, month=month_spec):
+            temp_csv_output_path = _append_temperature_profile_to_csv(monthly_profile, plz_or_region, year_spec)
     return acept_utils.uppath(temp_csv_output_path, 1)
 
 
@@ -155,84 +238,11 @@ def build_temperature_profiles_for_selected_years_with_combined_data(plz_or_regi
         raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
 
     plz_or_region = str(plz_or_region)
-
-    # convert to projection of DWD try data
-    selected_shape = selected_shape.to_crs(epsg=3034)
-    if debug:
-        print("selected_shape.crs:", selected_shape.crs)
-
-    for year_spec in range(year_start, year_end + 1):
-        for month_spec in range(1, 13):
-            if debug:
-                print("Free Memory 1:", psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-
-            if uncompressed:
-                wd_data = read_dwd_netcdf_file("combined_try_uncompressed", year=year_spec, month=month_spec,
-                                               debug=debug)
-            else:
-                wd_data = read_dwd_netcdf_file("combined_try", year=year_spec, month=month_spec, debug=debug)
-
-            wd_data = preprocess_combined_dwd_try_dataset(wd_data, debug)
-
-            # reduce the dataset to the temperature data
-            wd_data = wd_data.drop_vars(["rad_direct", "rad_global"])
-
-            # ---------
-            # ### Clipping
-            # all_touched – If True, all pixels touched by geometries will be burned in.
-            # If false, only pixels whose center is within the polygon or that are selected by Bresenham’s line
-            # algorithm will be burned in.
-            wd_clipped: xr.Dataset = wd_data.rio.clip(selected_shape.geometry.values, selected_shape.crs,
-                                                      all_touched=True)
-
-            # free up memory
-            del wd_data
-            if debug:
-                print("Free Memory w/o wd_data:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-            # ---------
-            # Create timeseries of average temperature for each hour over the PLZ area (clipped xarray)
-            avg_temp_over_hours = wd_clipped.mean(("X", "Y"))
-            avg_temp_over_hours_ds = avg_temp_over_hours.temperature.to_pandas()
-
-            hours_in_month = 24 * monthrange(year_spec, month_spec)[1]
-            if avg_temp_over_hours_ds.shape[0] != hours_in_month:
-                raise Exception("month:", month_spec, "/", year_spec, " -----  avg_temp_over_hours_ds.shape[0] =",
-                                avg_temp_over_hours_ds.shape[0], "not 720")
-
-            del wd_clipped
-            del avg_temp_over_hours
-            if debug:
-                print("Free Memory w/o wd_clipped:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-            # ---------
-            # append timeseries to csv
-            temp_csv_output_path = os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}",
-                                                f"DWD_TRY_{plz_or_region}_{year_spec}.csv")
-            os.makedirs(acept_utils.uppath(temp_csv_output_path, 1), exist_ok=True)
-
-            # add unit info and header according to UHP only at the beginning of the file
-            if not os.path.exists(temp_csv_output_path):
-                header_temp = ['AMBIENT TEMPERATURE']
-                unit_info = pd.DataFrame([['degC']], columns=header_temp)
-                unit_info.to_csv(temp_csv_output_path, mode='a', sep=";", index=False, columns=header_temp,
-                                 header=True)
-
-            with open(temp_csv_output_path) as f:
-                hours_in_year = (366 if isleap(year_spec) else 365) * 24
-                if sum(1 for _ in f) < hours_in_year + 2:
-                    # append to csv
-                    avg_temp_over_hours_ds.to_csv(temp_csv_output_path, mode='a', sep=";", index=False,
-                                                  header=False)
-                else:
-                    print("already 8760 time steps (hours) in the csv file of the temperature profile for ",
-                          year_spec, plz_or_region)
-
-            if debug:
-                print("Free Memory @ end of month:",
-                      psutil.virtual_memory().available * 100 / psutil.virtual_memory().total)
-            # force garbage collection to keep the memory usage acceptable
-            gc.collect()
+    weather_source = "combined_try_uncompressed" if uncompressed else "combined_try"
+    for year_spec, month_spec, monthly_profile in _iter_monthly_temperature_profiles(
+            plz_or_region, selected_shape, year_start, year_end, weather_source, debug):
+        with span("write", builder="temperature", area=plz_or_region, year=year_spec, month=month_spec):
+            temp_csv_output_path = _append_temperature_profile_to_csv(monthly_profile, plz_or_region, year_spec)
     return acept_utils.uppath(temp_csv_output_path, 1)
 
 
@@ -258,49 +268,147 @@ def build_temperature_profile_for_selected_year_with_combined_data(plz_or_region
     return os.path.join(dir_path, file_name)
 
 
-def build_temperature_profile_for_year(plz_or_region: str | int, selected_shape: gpd.GeoDataFrame, year: int | None,
-                                       debug: bool = True) -> str:
+def compute_temperature_profiles_for_selected_years(plz_or_region: int | str, selected_shape: gpd.GeoDataFrame,
+                                                    year_start: int = DWD_MIN_YEAR, year_end: int = DWD_MAX_YEAR,
+                                                    weather_source: str = "try",
+                                                    debug: bool = True) -> dict[int, pd.Series]:
     """
-    Creates a temperature profile for the selected year and the selected PLZ or Region. 
-    
-    If the selected year is None or no DWD TRY data is available, this function uses the TMY data 
-    from the PVGIS API.
+    Computes the temperature profiles for the selected years and the selected PLZ or Region from the DWD TRY data
+    without saving them.
+
+    Each profile is a Series named ``temperature`` with the hourly temperature in degrees Celsius and the time steps as
+    index. Its ``attrs`` contain the metadata of the profile: ``area``, ``year``, ``weather_source`` and ``unit``.
+    Use :py:func:`save_temperature_profile` to save a profile in the UHP format.
+
+    :param plz_or_region: PLZ or Region for which the temperature profiles should be created (area ID).
+    :param selected_shape: GeoDataFrame of the selected area.
+    :param year_start: First year for which the temperature profile should be created. Defaults to 1995.
+    :param year_end: Last year for which the temperature profile should be created. Defaults to 2012.
+    :param weather_source: The DWD TRY data to use: ``try``, ``combined_try`` or ``combined_try_uncompressed``.
+        Defaults to ``try``.
+    :param debug: If True, print debug information.
+    :raises ValueOutsideRangeError: If year_start or year_end is outside the allowed range (1995-2012).
+    :raises ValueError: If weather_source is not a DWD TRY weather source.
+    :return: The temperature profiles by year.
+    """
+    if year_start > year_end or year_start < DWD_MIN_YEAR or year_end > DWD_MAX_YEAR:
+        raise ValueOutsideRangeError(DWD_MIN_YEAR, DWD_MAX_YEAR)
+    if weather_source not in TEMPERATURE_WEATHER_SOURCES[:3]:
+        raise ValueError(f"Invalid weather_source {weather_source}. Valid values are "
+                         f"{', '.join(TEMPERATURE_WEATHER_SOURCES[:3])}.")
+
+    plz_or_region = str(plz_or_region)
+    monthly_profiles = {}
+    for year_spec, _, monthly_profile in _iter_monthly_temperature_profiles(plz_or_region, selected_shape,
+                                                                            year_start, year_end, weather_source,
+                                                                            debug):
+        monthly_profiles.setdefault(year_spec, []).append(monthly_profile)
+    return {year_spec: _with_temperature_metadata(pd.concat(profiles), plz_or_region, year_spec, weather_source)
+            for year_spec, profiles in monthly_profiles.items()}
+
+
+def compute_temperature_profile_for_year(plz_or_region: str | int, selected_shape: gpd.GeoDataFrame, year: int | None,
+                                         debug: bool = True) -> pd.Series:
+    """
+    Computes the temperature profile for the selected year and the selected PLZ or Region without saving it.
+
+    The weather data is selected like in :py:func:`build_temperature_profile_for_year`, see
+    :py:func:`select_temperature_weather_source`. The profile and its metadata are described in
+    :py:func:`compute_temperature_profiles_for_selected_years`. The year in the metadata is None if the TMY is used.
 
     :param plz_or_region: PLZ or Region for which the temperature profile should be created (area ID).
     :param selected_shape: GeoDataFrame of the selected area.
     :param year: Year for which the temperature profile should be created. If None, uses the TMY data from the PVGIS API.
     :param debug: If True, print debug information.
-    :return: Path to the created CSV file.
+    :return: The hourly temperature profile.
     """
-    if year is None:
-        return build_temperature_profile_for_tmy_for_shape(plz_or_region, selected_shape, debug)
+    weather_source = select_temperature_weather_source(year)
+    if weather_source == "tmy":
+        return compute_temperature_profile_for_tmy_for_shape(plz_or_region, selected_shape, debug)
     if debug:
         print("Creating a temperature profile for year", year, "for", plz_or_region)
-    if check_for_un_compressed_dwd_try_data(compressed=False, year_start=year, year_end=year):
-        return build_temperature_profile_for_selected_year_with_combined_data(plz_or_region, selected_shape, year,
-                                                                              uncompressed=True, debug=debug)
-    elif check_for_un_compressed_dwd_try_data(compressed=True, year_start=year, year_end=year):
-        return build_temperature_profile_for_selected_year_with_combined_data(plz_or_region, selected_shape, year,
-                                                                              uncompressed=False, debug=debug)
-    elif check_for_dwd_try_data_year(year, ["temperature"]):
-        dir_path = build_temperature_profiles_for_selected_years(plz_or_region, selected_shape, year, year, debug)
-        file_name = f"DWD_TRY_{plz_or_region}_{year}.csv"
-        return os.path.join(dir_path, file_name)
-    else:
-        # Fall back to use the TMY if no data is downloaded for the selected year
-        return build_temperature_profile_for_tmy_for_shape(plz_or_region, selected_shape, debug)
+    return compute_temperature_profiles_for_selected_years(plz_or_region, selected_shape, year, year, weather_source,
+                                                           debug)[year]
 
 
-def build_temperature_profile_for_tmy_for_shape(plz_or_region: str | int, selected_shape: gpd.GeoDataFrame,
-                                                debug: bool = True) -> str:
+def build_temperature_profile_for_year(plz_or_region: str | int, selected_shape: gpd.GeoDataFrame, year: int | None,
+                                       debug: bool = True, store: ArtifactStore | None = None) -> str:
     """
-    Creates a temperature profile for the TMY for the center of the selected PLZ or Region, using the PVGIS API.
+    Creates a temperature profile for the selected year and the selected PLZ or Region.
+
+    If the selected year is None or no DWD TRY data is available, this function uses the TMY data
+    from the PVGIS API.
+    The temperature profile is saved in the artifact store (see :py:mod:`acept.artifact_store`) with the reference
+    ``temperature_{plz_or_region}_{year}``. If the profile was already created for the same area, year and weather
+    data, the stored profile is used.
+    Use :py:func:`compute_temperature_profile_for_year` to get the profile as Series without saving it.
 
     :param plz_or_region: PLZ or Region for which the temperature profile should be created (area ID).
     :param selected_shape: GeoDataFrame of the selected area.
+    :param year: Year for which the temperature profile should be created. If None, uses the TMY data from the PVGIS API.
     :param debug: If True, print debug information.
+    :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
     :return: Path to the created CSV file.
     """
+    weather_source = select_temperature_weather_source(year)
+    if weather_source == "tmy":
+        year = None
+
+    if store is None:
+        store = get_artifact_store()
+    # the builders change the crs of the shape, so the shape is compared independent of its crs
+    key = artifact_key("build_temperature_profile_for_year", plz_or_region=str(plz_or_region),
+                       selected_shape=geometry_digest(selected_shape), year=year,
+                       weather_source=weather_source)
+    file_name = f"temperature_tmy_{plz_or_region}.csv" if year is None else f"DWD_TRY_{plz_or_region}_{year}.csv"
+    stored_profile = store.lookup_file(key, file_name)
+    if stored_profile is not None:
+        if debug:
+            print("Using stored temperature profile", stored_profile)
+        return stored_profile
+
+    temperature_profile = compute_temperature_profile_for_year(plz_or_region, selected_shape, year, debug)
+    # the profile is written to the store directly instead of being copied from the temporary directory
+    with store.write(key) as entry_dir:
+        save_temperature_profile(temperature_profile, os.path.join(entry_dir, file_name))
+    store.set_reference(f"temperature_{plz_or_region}_{year if year is not None else 'tmy'}", key,
+                        {"plz_or_region": str(plz_or_region), "year": year, "weather_source": weather_source})
+    store.collect_garbage()
+    return os.path.join(store.entry_path(key), file_name)
+
+
+def lookup_temperature_profile_for_year(plz_or_region: str | int, year: int | None,
+                                        store: ArtifactStore | None = None) -> str | None:
+    """
+    Returns the stored temperature profile for the selected year and the selected PLZ or Region, using the reference
+    ``temperature_{plz_or_region}_{year}`` set by :py:func:`build_temperature_profile_for_year`.
+
+    :param plz_or_region: PLZ or Region of the temperature profile (area ID).
+    :param year: Year of the temperature profile. If None, the profile for the TMY is returned.
+    :param store: The artifact store. Defaults to :py:func:`acept.artifact_store.get_artifact_store`.
+    :return: Path to the stored CSV file, or None if the profile was not created yet.
+    """
+    if store is None:
+        store = get_artifact_store()
+    key = store.resolve_reference(f"temperature_{plz_or_region}_{year if year is not None else 'tmy'}")
+    if key is None:
+        return None
+    file_name = f"temperature_tmy_{plz_or_region}.csv" if year is None else f"DWD_TRY_{plz_or_region}_{year}.csv"
+    return store.lookup_file(key, file_name)
+
+
+def compute_temperature_profile_for_tmy_for_shape(plz_or_region: str | int, selected_shape: gpd.GeoDataFrame,
+                                                  debug: bool = True) -> pd.Series:
+    """
+    Computes the temperature profile for the TMY for the center of the selected PLZ or Region, using the PVGIS API,
+    without saving it. The profile and its metadata are described in
+    :py:func:`compute_temperature_profiles_for_selected_years`, the year in the metadata is None.
+
+    :param plz_or_region: PLZ or Region for which the temperature profile should be created (area ID).
+    :param selected_shape: GeoDataFrame of the selected area.
+    :param debug: If True, print debug information.
+    :return: The hourly temperature profile.
+    """
     if debug:
         print("Creating a temperature profile for the TMY", "for", plz_or_region)
     plz_or_region = str(plz_or_region)
@@ -310,8 +418,124 @@ def build_temperature_profile_for_tmy_for_shape(plz_or_region: str | int, select
 
     lon_center = selected_shape.iloc[0].geometry.centroid.x
     lat_center = selected_shape.iloc[0].geometry.centroid.y
-    file_path, _ = build_temperature_profile_for_tmy_to_uhp_csv(lat_center, lon_center, plz_or_region)
-    return file_path
+    with span("read", builder="temperature", area=plz_or_region, year=None):
+        temperature_profile = build_temperature_profile_for_tmy(lat_center, lon_center)["temperature"]
+    return _with_temperature_metadata(temperature_profile, plz_or_region, None, "tmy")
+
+
+def build_temperature_profile_for_tmy_for_shape(plz_or_region: str | int, selected_shape: gpd.GeoDataFrame,
+                                                debug: bool = True) -> str:
+    """
+    Creates a temperature profile for the TMY for the center of the selected PLZ or Region, using the PVGIS API.
+
+    :param plz_or_region: PLZ or Region for which the temperature profile should be created (area ID).
+    :param selected_shape: GeoDataFrame of the selected area.
+    :param debug: If True, print debug information.
+    :return: Path to the created CSV file.
+    """
+    temperature_profile = compute_temperature_profile_for_tmy_for_shape(plz_or_region, selected_shape, debug)
+    return save_temperature_profile(temperature_profile, os.path.join(TEMP_PATH, f"PLZ_{plz_or_region}",
+                                                                      f"temperature_tmy_{plz_or_region}.csv"))
+
+
+def save_temperature_profile(temperature_profile: pd.Series, file_path: str) -> str:
+    """
+    Saves a temperature profile as CSV file in the format expected by UHP, with the header ``AMBIENT TEMPERATURE`` and
+    the unit row ``degC``.
+
+    :param temperature_profile: The hourly temperature profile, e.g. from
+        :py:func:`compute_temperature_profile_for_year`.
+    :param file_path: Path of the CSV file.
+    :return: Path to the saved file.
+    """
+    return write_geopandas_to_uhp_csv(file_path, temperature_profile, TEMPERATURE_PROFILE_HEADER,
+                                      TEMPERATURE_PROFILE_UNIT, sep=";")
+
+
+def read_temperature_profile(file_path: str) -> pd.Series:
+    """
+    Reads a temperature profile saved in the UHP format, e.g. by :py:func:`build_temperature_profile_for_year`.
+
+    The metadata of the profile is not saved in the file, so only the ``unit`` is added to the ``attrs`` of the
+    returned Series.
+
+    :param file_path: Path of the CSV file.
+    :return: The hourly temperature profile as Series named ``temperature``.
+    """
+    profile_df, unit_info = read_uhp_csv_to_dataframe(file_path, header_row=0, additional_info=1, sep=";")
+    temperature_profile = profile_df.iloc[:, 0].astype(np.float64).rename("temperature")
+    temperature_profile.attrs["unit"] = unit_info[0] if unit_info else TEMPERATURE_PROFILE_UNIT[0]
+    return temperature_profile
+
+
+HOURS_PER_DAY = 24
+"""Number of hourly time steps per day."""
+
+
+def find_typical_days(temperature_profile: pd.Series | np.ndarray, number_of_typical_days: int,
+                      max_iterations: int = 100, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds typical days of an hourly temperature profile by k-medoids clustering of the daily temperature profiles.
+
+    The daily profiles are compared by their euclidean distance. The clustering starts with the most central day and
+    further days chosen by k-means++ seeding, then the medoids and the assignment of the days are updated alternately.
+    Hours after the last full day of the profile are ignored.
+
+    :param temperature_profile: The hourly temperature profile.
+    :param number_of_typical_days: The number of typical days (clusters).
+    :param max_iterations: The maximum number of iterations of the clustering. Defaults to 100.
+    :param seed: Seed of the random number generator for the initialization. Defaults to 0.
+    :raises ValueError: If number_of_typical_days is not between 1 and the number of days of the profile.
+    :return: The days of the year (starting at 0) that are the typical days in ascending order, and for each day of the
+        profile the position of its typical day in the first array.
+    """
+    temperature = np.asarray(temperature_profile, dtype=np.float64)
+    number_of_days = len(temperature) // HOURS_PER_DAY
+    if not 1 <= number_of_typical_days <= number_of_days:
+        raise ValueError(f"number_of_typical_days must be between 1 and {number_of_days}")
+
+    days = temperature[:number_of_days * HOURS_PER_DAY].reshape(number_of_days, HOURS_PER_DAY)
+    squared_norms = (days ** 2).sum(axis=1)
+    distances = np.sqrt(np.maximum(squared_norms[:, None] + squared_norms[None, :] - 2 * days @ days.T, 0))
+
+    rng = np.random.default_rng(seed)
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    for _ in range(1, number_of_typical_days):
+        squared_distance_to_medoids = distances[:, medoids].min(axis=1) ** 2
+        if squared_distance_to_medoids.sum() > 0:
+            medoids.append(int(rng.choice(number_of_days, p=squared_distance_to_medoids /
+                                                            squared_distance_to_medoids.sum())))
+        else:
+            medoids.append(int(np.setdiff1d(np.arange(number_of_days), medoids)[0]))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iterations):
+        day_to_cluster = np.argmin(distances[:, medoids], axis=1)
+        new_medoids = medoids.copy()
+        for cluster in range(number_of_typical_days):
+            members = np.flatnonzero(day_to_cluster == cluster)
+            if len(members) > 0:
+                new_medoids[cluster] = members[np.argmin(distances[np.ix_(members, members)].sum(axis=1))]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+
+    day_to_cluster = np.argmin(distances[:, medoids], axis=1)
+    # sort the typical days by their day of the year
+    order = np.argsort(medoids)
+    cluster_position = np.empty(number_of_typical_days, dtype=np.int64)
+    cluster_position[order] = np.arange(number_of_typical_days)
+    return medoids[order], cluster_position[day_to_cluster]
+
+
+def typical_day_hours(days: np.ndarray) -> np.ndarray:
+    """
+    Hourly time steps of the given days.
+
+    :param days: Days of the year (starting at 0).
+    :return: The positions of the hours of the days in an hourly profile, day after day.
+    """
+    return (np.asarray(days)[:, None] * HOURS_PER_DAY + np.arange(HOURS_PER_DAY)).ravel()
 
 
 # ###################################################################################################################
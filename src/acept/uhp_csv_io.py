@@ -19,7 +19,10 @@ UHP expects .csv files in one of the following two formats:
 Use this module to:
     - Write a DataFrame to a .csv file in the UHP format.
     - Read a .csv file in the UHP format and return a DataFrame.
+    - Save the content of a .csv file in a binary sidecar file, which is read instead of the .csv file while it is up
+      to date.
     - Prepare the input .csv file with the buildings for UHP from a GeoDataFrame.
+    - Prepare the input file with the buildings for UHP chunk by chunk for large building sets.
     - Save a GeoDataFrame with the buildings or a BBD query result to a .csv file in the format expected by UHP.
 
 For buildings the format of the .csv file is:
@@ -55,23 +58,34 @@ The refurbishment level is a number from 1 to 3:
 
 """
 
+from __future__ import annotations
+
+import csv
+import json
 import os
+import tempfile
 from typing import Any
 
-import geopandas as gpd
-import pandas as pd
-from pandas import DataFrame
+import numpy as np
 
 from acept import acept_utils
 from acept.acept_constants import TEMP_PATH
-from acept.buildings_information import calculate_missing_uhp_building_fields
-from acept.uhp_input_formatting import map_building_use_types_to_numbers, map_building_types_to_numeric_size_class, \
-    map_construction_year_to_tabular_construction_year_class, map_tabular_construction_year_class_to_numbers, \
-    map_refurbishment_levels_to_uhp_format
+from acept.buildings_information import calculate_missing_uhp_building_fields, iter_enriched_building_chunks
+from acept.lazy_imports import lazy_import
+from acept.uhp_input_formatting import UHP_BUILDING_ID_FIELDS, UHP_BUILDING_SCHEMA, format_buildings_for_uhp, \
+    enforce_uhp_building_schema
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+
+UHP_BUILDING_COLUMNS = ['bid', 'area', 'use', 'free_walls', 'lat', 'lon', 'dist2hp', 'year_class', 'size_class',
+                        'floors', 'dwellings', 'occupants', 'ref_level_roof', 'ref_level_wall', 'ref_level_floor',
+                        'ref_level_window']
+"""Columns of the buildings .csv file for UHP. The first seven columns are required."""
 
 
 def write_geopandas_to_uhp_csv(filepath: str, values_df: pd.DataFrame, first_row_header: list,
-                               second_row_info: list = [], sep: str = ";") -> str:
+                               second_row_info: list = [], sep: str = ";", sidecar: bool = False) -> str:
     """ Writes a DataFrame to a .csv file in the format expected by UHP.
 
     Writes a .csv file to the given path with a header row, an optional second row with additional information on the
@@ -83,6 +97,8 @@ def write_geopandas_to_uhp_csv(filepath: str, values_df: pd.DataFrame, first_row
     :param first_row_header: List of column names to be written to the first line of the file.
     :param second_row_info: Optional list of information for each column written to the second line of the file.
     :param sep: Column seperator in the .csv file. Default: ';'.
+    :param sidecar: If True, the data is also saved in the binary sidecar format next to the .csv file, see
+        :py:func:`write_uhp_sidecar`. Default: False.
     :return: Path to the saved file.
     """
     os.makedirs(acept_utils.uppath(filepath, 1), exist_ok=True)
@@ -96,17 +112,151 @@ def write_geopandas_to_uhp_csv(filepath: str, values_df: pd.DataFrame, first_row
 
     column_info_df.to_csv(filepath, mode='w', sep=sep, index=False, columns=first_row_header, header=True)
     values_df.to_csv(filepath, mode='a', sep=sep, index=False, header=False)
+    if sidecar:
+        header_rows = [[str(value) for value in first_row_header]]
+        if second_row_info:
+            header_rows.append([str(value) for value in second_row_info])
+        write_uhp_sidecar(filepath, header_rows, values_df)
     return filepath
 
 
+UHP_SIDECAR_SUFFIX = ".npz"
+"""Suffix of the binary sidecar files, which are saved as ``{csv file name}.npz`` next to the .csv files."""
+
+
+def uhp_sidecar_path(filepath: str) -> str:
+    """
+    Path of the binary sidecar file of a .csv file in the UHP format.
+
+    :param filepath: Path to the .csv file.
+    :return: Path to the sidecar file.
+    """
+    return filepath + UHP_SIDECAR_SUFFIX
+
+
+def write_uhp_sidecar(filepath: str, header_rows: list[list[str]] | None = None, values_df: pd.DataFrame = None,
+                      sep: str = ";") -> str | None:
+    """
+    Saves the content of a .csv file in the UHP format in a binary sidecar file next to it.
+
+    The sidecar is a NumPy ``.npz`` file with one array per column and a JSON header with the header rows of the
+    .csv file. It also records the size and modification time of the .csv file, so that
+    :py:func:`read_uhp_csv_to_dataframe` only uses the sidecar as long as the .csv file is not changed.
+    The columns keep the dtypes of values_df. Columns with other objects than strings cannot be saved, in this case
+    no sidecar is written.
+
+    :param filepath: Path to the existing .csv file.
+    :param header_rows: The rows of the .csv file before the data, e.g. the header and the units. If None, the header
+        rows and the data are read from the .csv file (two header rows).
+    :param values_df: The data of the .csv file. If None, the data is read from the .csv file.
+    :param sep: Column seperator in the .csv file, used if the .csv file is read. Default: ';'.
+    :return: Path to the sidecar file, or None if the data cannot be saved in the sidecar format.
+    """
+    if header_rows is None or values_df is None:
+        header_rows, values_df = _read_uhp_csv_single_pass(filepath, 2, True, sep)
+    if isinstance(values_df, pd.Series):
+        values_df = values_df.to_frame()
+
+    arrays = {}
+    for position in range(values_df.shape[1]):
+        values = values_df.iloc[:, position].to_numpy()
+        if values.dtype == object:
+            if not all(isinstance(value, str) for value in values):
+                return None
+            values = values.astype(str)
+        arrays[f"column_{position}"] = values
+
+    csv_stat = os.stat(filepath)
+    metadata = {"header_rows": header_rows, "columns": values_df.shape[1],
+                "csv_size": csv_stat.st_size, "csv_mtime_ns": csv_stat.st_mtime_ns}
+    sidecar_path = uhp_sidecar_path(filepath)
+    # write to a temporary file first, so that readers never see a partially written sidecar
+    with tempfile.NamedTemporaryFile(dir=acept_utils.uppath(sidecar_path, 1), prefix=".",
+                                     suffix=UHP_SIDECAR_SUFFIX, delete=False) as f:
+        np.savez(f, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(f.name, sidecar_path)
+    return sidecar_path
+
+
+def _read_uhp_sidecar(filepath: str, number_of_header_rows: int) -> tuple[list[list[str]], pd.DataFrame] | None:
+    """
+    Reads the binary sidecar of a .csv file in the UHP format if it is up to date.
+
+    :param filepath: Path to the .csv file.
+    :param number_of_header_rows: The number of rows before the data in the .csv file.
+    :return: The header rows and the data with integer column positions, or None if there is no sidecar, the .csv file
+        was changed after the sidecar was written or the sidecar has a different number of header rows.
+    """
+    sidecar_path = uhp_sidecar_path(filepath)
+    try:
+        csv_stat = os.stat(filepath)
+        with np.load(sidecar_path, allow_pickle=False) as sidecar:
+            metadata = json.loads(str(sidecar["metadata"]))
+            if (metadata["csv_size"] != csv_stat.st_size or metadata["csv_mtime_ns"] != csv_stat.st_mtime_ns
+                    or len(metadata["header_rows"]) != number_of_header_rows):
+                return None
+            columns = {}
+            for position in range(metadata["columns"]):
+                values = sidecar[f"column_{position}"]
+                columns[position] = values.astype(object) if values.dtype.kind == "U" else values
+    except (OSError, KeyError, ValueError):
+        return None
+    return metadata["header_rows"], pd.DataFrame(columns)
+
+
+def _read_uhp_csv_single_pass(filepath: str, number_of_header_rows: int, ignore_index: bool,
+                              sep: str) -> tuple[list[list[str]], pd.DataFrame]:
+    """
+    Reads the header rows and the data of a .csv file in the UHP format in a single pass over the file.
+
+    :param filepath: Path to the .csv file.
+    :param number_of_header_rows: The number of rows before the data.
+    :param ignore_index: If True, the first column is not used as index.
+    :param sep: Column seperator in the .csv file.
+    :return: The header rows as lists of strings and the data with integer column positions.
+    """
+    with open(filepath, newline="") as f:
+        header_rows = [next(csv.reader([f.readline().rstrip("\r\n")], delimiter=sep), [])
+                       for _ in range(number_of_header_rows)]
+        try:
+            df = pd.read_csv(f, sep=sep, header=None, index_col=False if ignore_index else None)
+        except pd.errors.EmptyDataError:
+            # no data rows
+            df = pd.DataFrame()
+    return header_rows, df
+
+
+def _column_names_from_header(header: list[str]) -> list[str]:
+    """
+    Column names of a header row like pandas creates them: empty names become ``Unnamed: {position}`` and repeated
+    names get the suffix ``.{count}``.
+    """
+    column_names = []
+    counts = {}
+    for position, name in enumerate(header):
+        name = name if name != "" else f"Unnamed: {position}"
+        if name in counts:
+            counts[name] += 1
+            name = f"{name}.{counts[name]}"
+        else:
+            counts[name] = 0
+        column_names.append(name)
+    return column_names
+
+
 def read_uhp_csv_to_dataframe(filepath: str, header_row: int | tuple[int, list] = 0, ignore_index: bool = True,
-                              additional_info: int | None = -1, sep: str = ";") -> tuple[DataFrame, list[Any]]:
+                              additional_info: int | None = -1, sep: str = ";",
+                              use_sidecar: bool = True) -> tuple[pd.DataFrame, list[Any]]:
     """Reads a .csv file in the format expected by UHP.
 
     Reads a .csv file with a header row, an optional second row with additional information on the data (e.g. units),
     and returns a DataFrame with the data and a list of additional information if requested.
     The column names are optionally renamed.
 
+    The header rows and the data are read in a single pass over the file. If the binary sidecar of the file (see
+    :py:func:`write_uhp_sidecar`) exists and the file was not changed since the sidecar was written, the sidecar is
+    read instead.
+
     :param filepath: Path to the .csv file.
     :param header_row: Row number of the header row, or a tuple with the row number and a list of new column names.
         Default: 0.
@@ -114,59 +264,213 @@ def read_uhp_csv_to_dataframe(filepath: str, header_row: int | tuple[int, list]
     :param additional_info: Optional Integer indicating the row number of the row with additional information.
         If negative, the additional information is ignored. If None, no additional information exists. Default: -1.
     :param sep: Column seperator in the .csv file. Default: ';'.
+    :param use_sidecar: If True, an up-to-date binary sidecar of the file is used. Default: True.
     :raises ValueError: If header_row is not an int or a tuple of the form (int, list)
     :return: DataFrame with the data, and a list of additional information if requested.
     """
     if type(header_row) is int:
-        df = pd.read_csv(filepath, sep=sep, header=header_row,
-                         skiprows=[abs(additional_info)] if additional_info is not None else None,
-                         index_col=False if ignore_index else None)
+        header_row_number, names = header_row, None
     elif type(header_row) is tuple and type(header_row[0]) is int and type(header_row[1]) is list:
-        df = pd.read_csv(filepath, sep=sep,
-                         skiprows=[header_row[0], abs(additional_info)] if additional_info is not None else [
-                             header_row[0]],
-                         names=header_row[1],
-                         index_col=False if ignore_index else None)
+        header_row_number, names = header_row
     else:
         raise ValueError("header_row must be an int or a tuple of (int, list) is: " + str(type(header_row)))
-    if additional_info < 0:
+    # the data starts after the header row and the row with additional information
+    number_of_header_rows = max(header_row_number, abs(additional_info) if additional_info is not None else 0) + 1
+
+    sidecar = _read_uhp_sidecar(filepath, number_of_header_rows) if use_sidecar else None
+    if sidecar is not None:
+        header_rows, df = sidecar
+    else:
+        header_rows, df = _read_uhp_csv_single_pass(filepath, number_of_header_rows, ignore_index, sep)
+    if names is None:
+        names = _column_names_from_header(header_rows[header_row_number])
+    # like pandas.read_csv: a first data column without a name is the index, unless the index is ignored, further data
+    # columns without a name are dropped and names without data are filled with NaN
+    if not ignore_index and df.shape[1] == len(names) + 1:
+        df = df.set_index(df.columns[0])
+        df.index.name = None
+        df.columns = range(df.shape[1])
+    if df.shape[1] != len(names):
+        df = df.iloc[:, :len(names)].reindex(columns=range(len(names)))
+    df.columns = names
+
+    if additional_info is None or additional_info < 0:
         additional_info_val = []
     else:
-        additional_info_val = pd.read_csv(filepath, sep=sep, header=additional_info,
-                                          index_col=False if ignore_index else None).columns.to_list()
+        additional_info_val = list(header_rows[additional_info])
     return df, additional_info_val
 
 
-def prepare_buildings_for_uhp_csv(area_id: str | int, buildings: gpd.GeoDataFrame, debug: bool = True) -> str:
+def prepare_buildings_for_uhp_csv(area_id: str | int, buildings: gpd.GeoDataFrame, debug: bool = True,
+                                  file_path: str | None = None) -> str:
     """Prepare buildings GeoDataFrame as input CSV for UrbanHeatPro.
 
-    Add missing fields and map the values to the UHP format.
+    Add missing fields, map the values to the UHP format and convert them to the compact dtypes of
+    :py:const:`acept.uhp_input_formatting.UHP_BUILDING_SCHEMA`.
     Writes the result to a .csv file in the format used by UrbanHeatPro in the respective /temp directory.
 
     :param area_id: The area ID e.g. PLZ.
     :param buildings: The GeoDataFrame of buildings.
     :param debug: Whether to enable debug mode and print debug messages. Default: True.
+    :param file_path: Path of the CSV file. Defaults to :py:func:`path_to_temp_uhp_buildings_csv`.
     :raises ValueError: If the required column names are not in the buildings GeoDataFrame
     :return: The path to the saved UHP CSV file.
     """
     buildings, _ = calculate_missing_uhp_building_fields(buildings, debug)
-    column_names = ['bid', 'area', 'use', 'free_walls', 'lat', 'lon', 'dist2hp']
-    if not set(column_names).issubset(buildings.columns.to_list()):
+    body_df = format_enriched_buildings_for_uhp(buildings)
+
+    return save_buildings_to_temp_uhp_csv(str(area_id), body_df, "All", debug, file_path)
+
+
+def uhp_buildings_parquet_schema():
+    """
+    The fixed schema of the Parquet file with the buildings for UHP: the columns :py:const:`UHP_BUILDING_COLUMNS` with
+    the types of :py:const:`acept.uhp_input_formatting.UHP_BUILDING_SCHEMA`. Requires the optional dependency
+    ``pyarrow``.
+
+    :return: The schema as ``pyarrow.Schema``.
+    """
+    import pyarrow as pa
+
+    arrow_types = {"int64": pa.int64(), "Int8": pa.int8(), "Int16": pa.int16(), "Int32": pa.int32(),
+                   "float32": pa.float32(), "float64": pa.float64()}
+    return pa.schema([pa.field(column, arrow_types[UHP_BUILDING_SCHEMA[column]],
+                               nullable=column not in UHP_BUILDING_ID_FIELDS)
+                      for column in UHP_BUILDING_COLUMNS])
+
+
+def _check_integer_columns_for_parquet(body_df: pd.DataFrame, schema, chunk_number: int):
+    """
+    Checks that the values of the integer columns of the schema are integers, so that a chunk can be converted to the
+    fixed schema of the Parquet file without loss.
+
+    :raises ValueError: If an integer column has fractional values.
+    """
+    import pyarrow as pa
+
+    for field in schema:
+        if not pa.types.is_integer(field.type) or body_df[field.name].dtype.kind != "f":
+            continue
+        values = body_df[field.name].dropna()
+        fractional = values[values != np.round(values)]
+        if not fractional.empty:
+            raise ValueError(f"The field '{field.name}' of chunk {chunk_number} has fractional values, which can not "
+                             f"be stored as {field.type} in the Parquet file: {fractional.head().to_list()}")
+
+
+def prepare_buildings_for_uhp_csv_chunked(area_id: str | int, buildings: gpd.GeoDataFrame, chunk_size: int = 10000,
+                                          halo_distance: float = 1.0, output_format: str = "csv",
+                                          debug: bool = True) -> str:
+    """Prepare a large buildings GeoDataFrame as input for UrbanHeatPro chunk by chunk.
+
+    Same as :py:func:`prepare_buildings_for_uhp_csv`, but the missing fields are added in spatially coherent chunks
+    (see :py:func:`acept.buildings_information.iter_enriched_building_chunks`) and each chunk is appended to the
+    output file as soon as it is formatted. The peak memory is bounded by the chunk size instead of the number of
+    buildings. The input GeoDataFrame is not modified. The chunks are appended to a temporary file, which replaces the
+    output file only after all chunks are written. If a chunk raises an error, no partial output file is left behind.
+
+    The output is either the .csv file in the format used by UrbanHeatPro or a columnar Parquet file with the same
+    columns next to it. The Parquet file has the fixed schema of :py:func:`uhp_buildings_parquet_schema` for all chunks.
+    Writing Parquet files requires the optional dependency ``pyarrow``.
+
+    :param area_id: The area ID e.g. PLZ.
+    :param buildings: The GeoDataFrame of buildings.
+    :param chunk_size: Maximum number of buildings per chunk. Default: 10000.
+    :param halo_distance: Distance in m around each chunk in which neighbouring buildings are included for the
+        detection of free walls. Default: 1.0.
+    :param output_format: Format of the output file, 'csv' or 'parquet'. Default: 'csv'.
+    :param debug: Whether to enable debug mode and print debug messages. Default: True.
+    :raises ValueError: If the output_format is unknown, the required column names are not in the buildings, or an
+        integer field has fractional values in the Parquet output.
+    :return: The path to the saved file.
+    """
+    if output_format not in ["csv", "parquet"]:
+        raise ValueError("output_format must be 'csv' or 'parquet' is: " + str(output_format))
+    area_id = str(area_id)
+    filepath = path_to_temp_uhp_buildings_csv(area_id)
+    if output_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        filepath = filepath.removesuffix(".csv") + ".parquet"
+        parquet_schema = uhp_buildings_parquet_schema()
+    parquet_writer = None
+
+    # write to a temporary file first, so that readers never see a partially written file
+    os.makedirs(acept_utils.uppath(filepath, 1), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=acept_utils.uppath(filepath, 1), prefix=".",
+                                     suffix=os.path.splitext(filepath)[1], delete=False) as f:
+        tmp_filepath = f.name
+    try:
+        for i, chunk in enumerate(iter_enriched_building_chunks(buildings, chunk_size, halo_distance, debug)):
+            body_df = format_enriched_buildings_for_uhp(chunk)
+            if output_format == "csv":
+                if i == 0:
+                    write_geopandas_to_uhp_csv(tmp_filepath, body_df, UHP_BUILDING_COLUMNS)
+                else:
+                    body_df.to_csv(tmp_filepath, mode='a', sep=";", index=False, header=False)
+            else:
+                # all chunks are converted to the same fixed schema, independent of the dtypes of the single chunks
+                _check_integer_columns_for_parquet(body_df, parquet_schema, i)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(tmp_filepath, parquet_schema)
+                parquet_writer.write_table(pa.Table.from_pandas(body_df, schema=parquet_schema, preserve_index=False))
+            del chunk, body_df
+
+        if parquet_writer is not None:
+            parquet_writer.close()
+            parquet_writer = None
+        if os.path.getsize(tmp_filepath) > 0:
+            os.replace(tmp_filepath, filepath)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+
+    if debug:
+        print('  buildings as UHP input file saved chunk by chunk at: ' + filepath)
+    return filepath
+
+
+def format_enriched_buildings_for_uhp(buildings: gpd.GeoDataFrame) -> pd.DataFrame:
+    """Map the values of the buildings GeoDataFrame with all missing fields added to the UHP format.
+
+    The values are mapped in place. The returned copy of the columns :py:const:`UHP_BUILDING_COLUMNS` is converted to
+    the compact dtypes of :py:const:`acept.uhp_input_formatting.UHP_BUILDING_SCHEMA`, the dtypes of the buildings
+    GeoDataFrame are kept.
+
+    :param buildings: The GeoDataFrame of buildings, e.g. as returned by
+        :py:func:`acept.buildings_information.calculate_missing_uhp_building_fields`.
+    :raises ValueError: If the required column names are not in the buildings GeoDataFrame
+    :return: The DataFrame with the columns to write to the UHP input file.
+    """
+    if not set(UHP_BUILDING_COLUMNS[0:7]).issubset(buildings.columns.to_list()):
         raise ValueError("Something is wrong with the input buildings. The required column names are not in "
                          "buildings.columns")
 
-    # add optional fields and map the values to the UHP format
-    map_building_use_types_to_numbers(buildings)
-    map_building_types_to_numeric_size_class(buildings)
-    map_construction_year_to_tabular_construction_year_class(buildings)
-    map_tabular_construction_year_class_to_numbers(buildings)
-    map_refurbishment_levels_to_uhp_format(buildings)
+    # add optional fields and map the values to the UHP format in a single pass per field
+    format_buildings_for_uhp(buildings)
 
-    return save_buildings_to_temp_uhp_csv(str(area_id), buildings, "All", debug)
+    body_df = pd.DataFrame(buildings[UHP_BUILDING_COLUMNS])
+    enforce_uhp_building_schema(body_df)
+    return body_df
+
+
+def path_to_temp_uhp_buildings_csv(plz_or_area_id: str, building_use: str = "All") -> str:
+    """
+    Path to the .csv file with the buildings in the format used by UrbanHeatPro in the /temp directory.
+
+    :param plz_or_area_id: The queried PLZ or the ID of the area the buildings belong to.
+    :param building_use: Use type of the buildings, default: 'All' selects all use types.
+    :return: File path to the CSV file with the buildings.
+    """
+    if building_use == "All":
+        return os.path.join(TEMP_PATH, f"PLZ_{plz_or_area_id}", f"buildings_{plz_or_area_id}.csv")
+    return os.path.join(TEMP_PATH, f"PLZ_{plz_or_area_id}", f"buildings_{plz_or_area_id}_{building_use}.csv")
 
 
 def save_buildings_to_temp_uhp_csv(plz_or_area_id: str, result_gdf: gpd.GeoDataFrame, building_use: str = "All",
-                                   debug: bool = True) -> str:
+                                   debug: bool = True, file_path: str | None = None) -> str:
     """
     Save the buildings or a BBD query result to a .csv file in the format used by UrbanHeatPro in the /temp directory.
 
@@ -175,20 +479,16 @@ def save_buildings_to_temp_uhp_csv(plz_or_area_id: str, result_gdf: gpd.GeoDataF
         'Residential', 'Industrial', 'Commercial', 'Public', 'Non-Residential'.
     :param result_gdf: GeoDataFrame with all buildings in result_gdf.
     :param debug: Whether to enable debug mode and print debug messages. Default: True.
+    :param file_path: Path of the CSV file. Defaults to :py:func:`path_to_temp_uhp_buildings_csv`.
     :raises ValueError: if the required column names are not in the result_gdf
     :return: File path to the CSV file with the buildings.
     """
     # save result to file
-    if building_use == "All":
-        combined_filepath = os.path.join(TEMP_PATH, f"PLZ_{plz_or_area_id}", f"buildings_{plz_or_area_id}.csv")
-    else:
-        combined_filepath = os.path.join(TEMP_PATH, f"PLZ_{plz_or_area_id}",
-                                         f"buildings_{plz_or_area_id}_{building_use}.csv")
+    combined_filepath = file_path or path_to_temp_uhp_buildings_csv(plz_or_area_id, building_use)
     # recursively create output directory
     os.makedirs(acept_utils.uppath(combined_filepath, 1), exist_ok=True)
     # header of the csv file
-    column_names = ['bid', 'area', 'use', 'free_walls', 'lat', 'lon', 'dist2hp', 'year_class', 'size_class', 'floors',
-                    'dwellings', 'occupants', 'ref_level_roof', 'ref_level_wall', 'ref_level_floor', 'ref_level_window']
+    column_names = UHP_BUILDING_COLUMNS
     # note: all column names are lowercase in the (PLZ) modified BBD
     print(result_gdf.columns.to_list())
     if not set(column_names[0:7]).issubset(result_gdf.columns.to_list()):
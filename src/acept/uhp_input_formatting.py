@@ -7,15 +7,95 @@ Use this module to prepare the input data for UHP. This includes:
     - mapping the tabular construction year class to their numerical values
     - mapping the size class to their numerical values
     - mapping the refurbishment levels to their numerical values as in UHP
+    - enforcing the compact schema of the buildings table for UHP (see :py:const:`UHP_BUILDING_SCHEMA`)
 
-When using this module, make sure to call:
+Use the function :py:func:`format_buildings_for_uhp` to do all of these mappings at once with precompiled lookup tables.
+Otherwise, when using this module, make sure to call:
     - the function :py:func:`map_building_use_types_to_numbers` before :py:func:`map_construction_year_to_tabular_construction_year_class`.
     - the function :py:func:`map_construction_year_to_tabular_construction_year_class` before :py:func:`map_tabular_construction_year_class_to_numbers`.
 """
 
-import geopandas as gpd
+from __future__ import annotations
+
+import functools
+
 import numpy as np
 
+from acept.lazy_imports import lazy_import
+
+gpd = lazy_import("geopandas")
+pd = lazy_import("pandas")
+
+USE_TYPE_MAPPING = {'Commercial': 0, 'Industrial': 1, 'Public': 2, 'Residential': 3, 0: 0, 1: 1, 2: 2, 3: 3}
+"""Mapping of the building use types to their numerical values as in UHP."""
+
+SIZE_CLASS_MAPPING = {'SFH': 0, 'TH': 1, 'MFH': 2, 'AB': 3}
+"""Mapping of the building types to their numerical size class as in UHP."""
+
+CONSTRUCTION_TO_TABULAR_YEAR_CLASS_MAPPING = {
+    "-1919": "<1859", "1919-1948": "1919-1948", "1949-1978": "1949-1957", "1979-1986": "1979-1983",
+    "1987-1990": "1984-1994", "1991-1995": "1984-1994", "1996-2000": "1995-2001", "2001-2004": "2002-2009",
+    "2005-2008": "2002-2009", "2009-": ">2009"}
+"""Mapping of the Zensus/BDB construction year classes to the nearest TABULAR year classes as used in UHP."""
+
+RESIDENTIAL_YEAR_CLASS_MAPPING = {
+    '<1859': 0,
+    '1860-1918': 1,
+    '1919-1948': 2,
+    '1949-1957': 3,
+    '1958-1968': 4,
+    '1969-1978': 5,
+    '1979-1983': 6,
+    '1984-1994': 7,
+    '1995-2001': 8,
+    '2002-2009': 9,
+    '>2009': 10
+}
+"""Mapping of the TABULAR year classes of residential buildings to their numerical values as in UHP."""
+
+NON_RESIDENTIAL_YEAR_CLASS_MAPPING = {
+    '<1918': 0,
+    '1919-1976': 1,
+    '1977-1983': 2,
+    '1984-1994': 3,
+    '>1995': 4
+}
+"""Mapping of the TABULAR year classes of non-residential buildings to their numerical values as in UHP."""
+
+REFURBISHMENT_LEVEL_MAPPING = {0: 1, 1: 2, 2: 3}
+"""Mapping of the refurbishment levels to their numerical values as in UHP."""
+
+UHP_BUILDING_SCHEMA = {
+    'bid': 'int64',
+    'area': 'float32',
+    'use': 'Int8',
+    'free_walls': 'Int8',
+    'lat': 'float32',
+    'lon': 'float32',
+    'dist2hp': 'float32',
+    'year_class': 'Int8',
+    'year_class_zensus': 'Int8',
+    'size_class': 'Int8',
+    'floors': 'Int16',
+    'dwellings': 'Int16',
+    'occupants': 'float32',
+    'ref_level_roof': 'Int8',
+    'ref_level_wall': 'Int8',
+    'ref_level_floor': 'Int8',
+    'ref_level_window': 'Int8',
+    'construction': 'category',
+    'construction_year': 'category',
+    'building_type': 'category',
+}
+"""Compact dtypes of the fields of the buildings table for UHP.
+
+Numerical codes and counts are stored as nullable small integers, areas, coordinates and distances as float32 and the
+source categories as pandas categoricals. The number of occupants can be fractional, e.g. an average from census
+data, and is stored as float32. See :py:func:`enforce_uhp_building_schema`.
+"""
+UHP_BUILDING_ID_FIELDS = ('bid',)
+"""Identifier fields of the buildings table for UHP, which are never coerced or stored as floats."""
+
 
 def map_building_use_types_to_numbers(buildings: gpd.GeoDataFrame):
     """
@@ -24,8 +104,7 @@ def map_building_use_types_to_numbers(buildings: gpd.GeoDataFrame):
 
     :param buildings: GeoDataFrame with the buildings
     """
-    mapping = {'Commercial': 0, 'Industrial': 1, 'Public': 2, 'Residential': 3, 0: 0, 1: 1, 2: 2, 3: 3}
-    buildings["use"] = buildings["use"].map(mapping).fillna(np.nan)
+    buildings["use"] = buildings["use"].map(USE_TYPE_MAPPING).fillna(np.nan)
 
 
 def map_building_types_to_numeric_size_class(buildings: gpd.GeoDataFrame):
@@ -35,8 +114,7 @@ def map_building_types_to_numeric_size_class(buildings: gpd.GeoDataFrame):
 
     :param buildings: GeoDataFrame with the buildings
     """
-    mapping = {'SFH': 0, 'TH': 1, 'MFH': 2, 'AB': 3}
-    buildings["size_class"] = buildings["building_type"].map(mapping)
+    buildings["size_class"] = buildings["building_type"].map(SIZE_CLASS_MAPPING)
 
 
 def map_construction_year_to_tabular_construction_year_class(buildings: gpd.GeoDataFrame):
@@ -47,11 +125,7 @@ def map_construction_year_to_tabular_construction_year_class(buildings: gpd.GeoD
 
     :param buildings: GeoDataFrame with the buildings
     """
-    mapping = {"-1919": "<1859", "1919-1948": "1919-1948", "1949-1978": "1949-1957", "1979-1986": "1979-1983",
-               "1987-1990": "1984-1994", "1991-1995": "1984-1994", "1996-2000": "1995-2001", "2001-2004": "2002-2009",
-               "2005-2008": "2002-2009", "2009-": ">2009"}
-
-    buildings["construction_year"] = buildings["construction"].map(mapping)
+    buildings["construction_year"] = buildings["construction"].map(CONSTRUCTION_TO_TABULAR_YEAR_CLASS_MAPPING)
     return buildings
 
 
@@ -62,27 +136,8 @@ def map_tabular_construction_year_class_to_numbers(buildings: gpd.GeoDataFrame):
 
     :param buildings: GeoDataFrame with the buildings
     """
-    residential_year_class = {
-        '<1859': 0,
-        '1860-1918': 1,
-        '1919-1948': 2,
-        '1949-1957': 3,
-        '1958-1968': 4,
-        '1969-1978': 5,
-        '1979-1983': 6,
-        '1984-1994': 7,
-        '1995-2001': 8,
-        '2002-2009': 9,
-        '>2009': 10
-    }
-
-    non_residential_year_class = {
-        '<1918': 0,
-        '1919-1976': 1,
-        '1977-1983': 2,
-        '1984-1994': 3,
-        '>1995': 4
-    }
+    residential_year_class = RESIDENTIAL_YEAR_CLASS_MAPPING
+    non_residential_year_class = NON_RESIDENTIAL_YEAR_CLASS_MAPPING
 
     # remove the existing year class field
     if 'year_class' in buildings.columns:
@@ -104,6 +159,176 @@ def map_refurbishment_levels_to_uhp_format(buildings: gpd.GeoDataFrame):
 
     :param buildings: GeoDataFrame with the buildings
     """
-    mapping = {0: 1, 1: 2, 2: 3}
     for feature_name in ['floor', 'wall', 'roof', 'window']:
-        buildings[f'ref_level_{feature_name}'] = buildings[f'ref_level_{feature_name}'].map(mapping).fillna(np.NaN)
+        buildings[f'ref_level_{feature_name}'] = buildings[f'ref_level_{feature_name}'].map(
+            REFURBISHMENT_LEVEL_MAPPING).fillna(np.NaN)
+
+
+def enforce_uhp_building_schema(buildings: gpd.GeoDataFrame):
+    """
+    Converts the fields of the buildings GeoDataFrame to the compact dtypes in :py:const:`UHP_BUILDING_SCHEMA`.
+
+    Use this function once after the missing fields are calculated and the values are mapped to the UHP format.
+    Fields that are not in the GeoDataFrame are ignored. Values of the numerical fields that are not numbers become nan.
+    If the values of a field can not be stored as integers without loss, e.g. a fractional number of floors, the field
+    is stored as float64 instead. The identifier fields in :py:const:`UHP_BUILDING_ID_FIELDS` are never coerced.
+
+    :param buildings: GeoDataFrame with the buildings
+    :raises ValueError: If an identifier field contains values that are missing, not numbers or not integers.
+    """
+    for field, dtype in UHP_BUILDING_SCHEMA.items():
+        if field not in buildings.columns or buildings[field].dtype == dtype:
+            continue
+        if dtype == 'category':
+            buildings[field] = buildings[field].astype(dtype)
+            continue
+        if field in UHP_BUILDING_ID_FIELDS:
+            try:
+                values = pd.to_numeric(buildings[field], errors='raise')
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"The identifier field '{field}' contains values that are not numbers: {e}") from e
+            if values.isna().any() or not (values == np.round(values)).all():
+                invalid = buildings.loc[values.isna() | (values != np.round(values)), field]
+                raise ValueError(f"The identifier field '{field}' contains missing or non-integer values: "
+                                 f"{invalid.head().to_list()}")
+            buildings[field] = values.astype(dtype)
+            continue
+        values = pd.to_numeric(buildings[field], errors='coerce')
+        try:
+            buildings[field] = values.astype(dtype)
+        except (TypeError, ValueError):
+            # values that are not integral or nan in a non-nullable integer field
+            buildings[field] = values.astype('float64')
+
+
+def build_lookup_table(mapping: dict) -> tuple[pd.Index, np.ndarray, np.ndarray]:
+    """
+    Precompiles a mapping into an index of the keys and NumPy lookup arrays of the values.
+
+    The lookup array has one more entry than the mapping, which is nan. This way, the position -1 of keys that are not
+    in the mapping selects nan. The dense lookup array maps the non-negative integer keys directly by their value and
+    ends with nan as well.
+
+    :param mapping: Mapping of source values to numerical values.
+    :return: The index of the keys, the lookup array of the values, and the dense lookup array for integer keys.
+    """
+    integer_keys = [key for key in mapping if isinstance(key, (int, np.integer)) and key >= 0]
+    dense_lookup_table = np.full(max(integer_keys, default=-1) + 2, np.nan)
+    for key in integer_keys:
+        dense_lookup_table[key] = mapping[key]
+    return (pd.Index(list(mapping.keys()), dtype=object),
+            np.append(np.array(list(mapping.values()), dtype=float), np.nan),
+            dense_lookup_table)
+
+
+def lookup_positions(values: pd.Series, keys: pd.Index) -> np.ndarray:
+    """
+    Finds the positions of the values in the keys of a mapping precompiled with :py:func:`build_lookup_table`.
+
+    The values are factorized in a single pass and only the unique values (or the categories of categorical values)
+    are looked up in the keys.
+
+    :param values: The values to look up.
+    :param keys: The index of the keys of the mapping.
+    :return: The positions of the values in the keys, -1 for values that are not in the keys.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    # position -1 for missing values (code -1) and unique values that are not in the keys
+    unique_positions = np.append(keys.get_indexer(pd.Index(uniques, dtype=object)), -1)
+    return unique_positions[codes]
+
+
+def lookup_values(values: pd.Series, lookup: tuple[pd.Index, np.ndarray, np.ndarray]) -> np.ndarray:
+    """
+    Maps the values with a mapping precompiled with :py:func:`build_lookup_table`.
+
+    Gives the same result as ``values.map(mapping)`` as float values. Numerical values are mapped with the dense
+    lookup array by their value, all other values by their position in the keys (see :py:func:`lookup_positions`).
+
+    :param values: The values to map.
+    :param lookup: The precompiled mapping.
+    :return: The mapped values as a float array, nan for values that are not in the mapping.
+    """
+    keys, lookup_table, dense_lookup_table = lookup
+    if pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        in_table = (numbers >= 0) & (numbers < len(dense_lookup_table) - 1) & (numbers == np.floor(numbers))
+        # position -1 selects nan for missing values and values that are not in the mapping
+        return dense_lookup_table[np.where(in_table, numbers, -1).astype(np.intp)]
+    return lookup_table[lookup_positions(values, keys)]
+
+
+_LOOKUP_MAPPINGS = {
+    "USE_TYPE_LOOKUP": USE_TYPE_MAPPING,
+    "SIZE_CLASS_LOOKUP": SIZE_CLASS_MAPPING,
+    "RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP": {
+        construction: RESIDENTIAL_YEAR_CLASS_MAPPING.get(tabular, np.nan)
+        for construction, tabular in CONSTRUCTION_TO_TABULAR_YEAR_CLASS_MAPPING.items()},
+    "NON_RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP": {
+        construction: NON_RESIDENTIAL_YEAR_CLASS_MAPPING.get(tabular, np.nan)
+        for construction, tabular in CONSTRUCTION_TO_TABULAR_YEAR_CLASS_MAPPING.items()},
+    "REFURBISHMENT_LEVEL_LOOKUP": REFURBISHMENT_LEVEL_MAPPING,
+}
+
+
+@functools.cache
+def get_lookup_table(name: str) -> tuple[pd.Index, np.ndarray, np.ndarray]:
+    """
+    Returns a precompiled lookup table, see :py:func:`build_lookup_table`.
+
+    The lookup tables are built on first use, so that pandas is not imported with this module. They are also available
+    as module attributes with the same names.
+
+    :param name: The name of the lookup table:
+        - ``USE_TYPE_LOOKUP``: :py:const:`USE_TYPE_MAPPING`
+        - ``SIZE_CLASS_LOOKUP``: :py:const:`SIZE_CLASS_MAPPING`
+        - ``RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP``: the Zensus/BDB construction year classes to the numerical
+          TABULAR year classes of residential buildings
+        - ``NON_RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP``: the same for non-residential buildings, with the same
+          keys as ``RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP``
+        - ``REFURBISHMENT_LEVEL_LOOKUP``: :py:const:`REFURBISHMENT_LEVEL_MAPPING`
+    :raises KeyError: If the name is unknown.
+    :return: The precompiled lookup table.
+    """
+    return build_lookup_table(_LOOKUP_MAPPINGS[name])
+
+
+def __getattr__(name: str):
+    if name in _LOOKUP_MAPPINGS:
+        return get_lookup_table(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def format_buildings_for_uhp(buildings: gpd.GeoDataFrame):
+    """
+    Maps the source categories of the buildings to the numerical values as in UHP in a single pass per field.
+
+    Gives the same results as calling :py:func:`map_building_use_types_to_numbers`,
+    :py:func:`map_building_types_to_numeric_size_class`,
+    :py:func:`map_construction_year_to_tabular_construction_year_class`,
+    :py:func:`map_tabular_construction_year_class_to_numbers` and :py:func:`map_refurbishment_levels_to_uhp_format`
+    one after another, but uses precompiled lookup tables and does not add the intermediate "construction_year" field.
+    If the year_class field already exists, it is saved in the "year_class_zensus" field.
+
+    :param buildings: GeoDataFrame with the buildings
+    """
+    use = lookup_values(buildings["use"], get_lookup_table("USE_TYPE_LOOKUP"))
+    buildings["use"] = use
+    buildings["size_class"] = lookup_values(buildings["building_type"], get_lookup_table("SIZE_CLASS_LOOKUP"))
+
+    if 'year_class' in buildings.columns:
+        buildings['year_class_zensus'] = buildings['year_class'].copy()
+    residential_lookup = get_lookup_table("RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP")
+    non_residential_lookup = get_lookup_table("NON_RESIDENTIAL_CONSTRUCTION_YEAR_CLASS_LOOKUP")
+    # both year class lookup tables have the same keys, so the positions are only looked up once
+    construction_positions = lookup_positions(buildings["construction"], residential_lookup[0])
+    buildings["year_class"] = np.where(use == 3, residential_lookup[1][construction_positions],
+                                       non_residential_lookup[1][construction_positions])
+
+    refurbishment_level_lookup = get_lookup_table("REFURBISHMENT_LEVEL_LOOKUP")
+    for feature_name in ['floor', 'wall', 'roof', 'window']:
+        buildings[f'ref_level_{feature_name}'] = lookup_values(buildings[f'ref_level_{feature_name}'],
+                                                               refurbishment_level_lookup)
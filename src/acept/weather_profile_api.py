@@ -33,16 +33,19 @@ See Also:
     - PVGIS documentation: https://joint-research-centre.ec.europa.eu/photovoltaic-geographical-information-system-pvgis/pvgis-tools/pvgis-typical-meteorological-year-tmy-generator_en
 """
 
+from __future__ import annotations
+
 import os
 
-import pandas as pd
-import pvlib.iotools as iot
-from pandas import DataFrame
 from ratelimit import sleep_and_retry, limits
 
 from acept.acept_constants import TEMP_PATH, PVGIS_API_BASE_URL
+from acept.lazy_imports import lazy_import
 from acept.uhp_csv_io import write_geopandas_to_uhp_csv
 
+pd = lazy_import("pandas")
+iot = lazy_import("pvlib.iotools")
+
 PVGIS_MIN_YEAR = 2005
 """The minimum year for the typical meteorological year (TMY) is 2005."""
 PVGIS_MAX_YEAR = 2020
@@ -146,7 +149,7 @@ def build_temperature_profile_for_tmy(lat: float, lon: float) -> pd.DataFrame:
     return weather_df.drop(columns=cols_to_drop, inplace=False)
 
 
-def build_temperature_profile_for_tmy_to_uhp_csv(lat: float, lon: float, area_id: str) -> tuple[str, DataFrame]:
+def build_temperature_profile_for_tmy_to_uhp_csv(lat: float, lon: float, area_id: str) -> tuple[str, pd.DataFrame]:
     """
     Create CSV with temperature profile for a typical meteorological year (TMY) from the PVGIS API using the maximal
     time period of 2005 - 2020 (see :py:const:`PVGIS_MIN_YEAR` and :py:const:`PVGIS_MAX_YEAR`).
@@ -162,7 +165,7 @@ def build_temperature_profile_for_tmy_to_uhp_csv(lat: float, lon: float, area_id
     return output_path, weather_df["temperature"]
 
 
-def build_weather_profile_for_tmy_to_csv(lat: float, lon: float, area_id: str) -> tuple[str, DataFrame]:
+def build_weather_profile_for_tmy_to_csv(lat: float, lon: float, area_id: str) -> tuple[str, pd.DataFrame]:
     """
     Create CSV with weather profile for a typical meteorological year (TMY) from the PVGIS API using the maximal time
     period of 2005 - 2020 (see :py:const:`PVGIS_MIN_YEAR` and :py:const:`PVGIS_MAX_YEAR`).